@@ -0,0 +1,414 @@
+"""Chế độ phục vụ bất đồng bộ (ASGI / asyncio) cho web_app.
+
+- `application` là một ứng dụng ASGI 3: có thể chạy bằng uvicorn/hypercorn nếu có cài
+  (ví dụ: uvicorn asgi:application).
+- Không có server ASGI thì dùng server HTTP/1.1 tối giản dựng trên asyncio ở dưới:
+      python asgi.py --host 127.0.0.1 --port 8000
+  Server này kiểm tra Content-Length, nhận body chunked, giới hạn body ở EXPERT_MAX_BODY byte
+  (413) và đóng kết nối treo sau EXPERT_READ_TIMEOUT / EXPERT_IDLE_TIMEOUT giây; khi triển khai
+  thật vẫn nên dùng uvicorn/hypercorn.
+
+Flask là WSGI (đồng bộ), nên mỗi request được chạy trong thread pool có giới hạn thay vì
+trên event loop. Các request nặng (parse trang quốc gia lần đầu, /compare và /search/section,
+dựng lại bảng suy diễn của /expert/*, ghi / tải CSV của admin) dùng một pool riêng nhỏ hơn,
+để chúng không chiếm hết worker của các request nhẹ/đã cache (tìm kiếm có If-None-Match,
+trang tĩnh). Body của response được gửi theo từng khối, không gom cả response vào bộ nhớ.
+"""
+
+import argparse
+import asyncio
+import contextvars
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Dict, Iterator, List, Tuple
+from urllib.parse import unquote
+
+from web_app import app
+
+HEAVY_WORKERS = int(os.environ.get("EXPERT_HEAVY_WORKERS", "4"))
+LIGHT_WORKERS = int(os.environ.get("EXPERT_LIGHT_WORKERS", "16"))
+# Giới hạn kích thước body của một request (byte) và thời gian chờ của server tối giản (giây)
+MAX_BODY = int(os.environ.get("EXPERT_MAX_BODY", str(16 * 1024 * 1024)))
+READ_TIMEOUT = float(os.environ.get("EXPERT_READ_TIMEOUT", "30"))
+IDLE_TIMEOUT = float(os.environ.get("EXPERT_IDLE_TIMEOUT", "15"))
+# Response được gửi theo từng khối khoảng STREAM_BUFFER byte (không gom cả file export vào bộ nhớ)
+STREAM_BUFFER = 64 * 1024
+
+HEAVY_EXECUTOR = ThreadPoolExecutor(max_workers=HEAVY_WORKERS, thread_name_prefix="expert-heavy")
+LIGHT_EXECUTOR = ThreadPoolExecutor(max_workers=LIGHT_WORKERS, thread_name_prefix="expert-light")
+
+# (status, headers, iterable WSGI, iterator, khối body đầu tiên, đã hết body chưa)
+WsgiResult = Tuple[str, List[Tuple[str, str]], Any, Iterator[bytes], bytes, bool]
+
+# Route có thể parse mọi trang quốc gia (ma trận mục, chỉ mục mục) hoặc dựng lại bảng suy diễn
+HEAVY_PATHS = ("/compare", "/search/section", "/expert/live", "/expert/work", "/expert/travel", "/expert/range")
+
+
+def is_heavy(environ: Dict[str, Any]) -> bool:
+    """Request có thể phải đọc/parse trang HTML, dựng lại bảng dữ liệu, ghi CSV hoặc tải cả file CSV."""
+    path = environ.get("PATH_INFO", "")
+    method = environ.get("REQUEST_METHOD", "GET")
+    if path.startswith("/admin") and (method == "POST" or path.endswith("/export")):
+        return True
+    if path in HEAVY_PATHS:
+        return True
+    if path == "/search":
+        if method == "POST":
+            return True
+        # GET có If-None-Match thường chỉ trả về 304, không cần parse trang
+        return "country=" in environ.get("QUERY_STRING", "") and "HTTP_IF_NONE_MATCH" not in environ
+    return False
+
+
+def build_environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    """Chuyển ASGI scope + body thành WSGI environ (PEP 3333)."""
+    server = scope.get("server") or ("127.0.0.1", 80)
+    client = scope.get("client") or ("127.0.0.1", 0)
+    environ: Dict[str, Any] = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": str(client[0]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name == "CONTENT_LENGTH":
+            environ["CONTENT_LENGTH"] = value
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def read_body(iterator: Iterator[bytes], first: List[bytes] | None = None) -> Tuple[bytes, bool]:
+    """Gom các khối của iterable WSGI tới khoảng STREAM_BUFFER byte; trả về (dữ liệu, đã hết chưa)."""
+    parts = first or []
+    size = sum(len(part) for part in parts)
+    for chunk in iterator:
+        if chunk:
+            parts.append(chunk)
+            size += len(chunk)
+            if size >= STREAM_BUFFER:
+                return b"".join(parts), False
+    return b"".join(parts), True
+
+
+def call_wsgi(environ: Dict[str, Any]) -> WsgiResult:
+    """Chạy Flask app (đồng bộ) tới khối body đầu tiên; được gọi trong thread pool.
+
+    Phần còn lại của body được đọc tiếp bằng read_body, iterable phải được đóng (close) khi xong.
+    """
+    state: Dict[str, Any] = {}
+    written: List[bytes] = []
+
+    def start_response(status: str, headers: List[Tuple[str, str]], exc_info: Any = None):
+        state["status"] = status
+        state["headers"] = headers
+        return written.append
+
+    result = app(environ, start_response)
+    try:
+        iterator = iter(result)
+        data, done = read_body(iterator, written)
+    except BaseException:
+        close = getattr(result, "close", None)
+        if close is not None:
+            close()
+        raise
+    return state["status"], state["headers"], result, iterator, data, done
+
+
+async def application(scope: Dict[str, Any], receive, send) -> None:
+    """Ứng dụng ASGI 3 bọc Flask app."""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                HEAVY_EXECUTOR.shutdown(wait=False)
+                LIGHT_EXECUTOR.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    parts: List[bytes] = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        part = message.get("body", b"")
+        size += len(part)
+        if size > MAX_BODY:
+            await send({"type": "http.response.start", "status": 413, "headers": [(b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": b"Request body too large"})
+            return
+        parts.append(part)
+        more_body = message.get("more_body", False)
+
+    environ = build_environ(scope, b"".join(parts))
+    executor = HEAVY_EXECUTOR if is_heavy(environ) else LIGHT_EXECUTOR
+    loop = asyncio.get_running_loop()
+    # Mọi bước của một response (gọi app, đọc tiếp body, close) chạy trong cùng một context
+    ctx = contextvars.copy_context()
+    status, headers, result, iterator, data, done = await loop.run_in_executor(executor, ctx.run, call_wsgi, environ)
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+            }
+        )
+        while not done:
+            await send({"type": "http.response.body", "body": data, "more_body": True})
+            data, done = await loop.run_in_executor(executor, ctx.run, read_body, iterator)
+        await send({"type": "http.response.body", "body": data})
+    finally:
+        close = getattr(result, "close", None)
+        if close is not None:
+            await loop.run_in_executor(executor, ctx.run, close)
+
+
+# ----------------------
+# Server HTTP/1.1 tối giản trên asyncio (khi không có uvicorn/hypercorn)
+# ----------------------
+
+
+class _HttpError(Exception):
+    """Request không hợp lệ: trả về `status` rồi đóng kết nối."""
+
+    def __init__(self, status: int) -> None:
+        super().__init__(status)
+        self.status = status
+
+
+def _content_length(value: str, current: int | None) -> int:
+    # Chỉ nhận số nguyên không âm dạng ASCII; nhiều header Content-Length phải cùng giá trị
+    if not (value.isascii() and value.isdigit()):
+        raise _HttpError(400)
+    length = int(value)
+    if current is not None and current != length:
+        raise _HttpError(400)
+    if length > MAX_BODY:
+        raise _HttpError(413)
+    return length
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    """Đọc body dạng Transfer-Encoding: chunked (bỏ qua chunk extension và trailer)."""
+    parts: List[bytes] = []
+    size = 0
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        size_text = line[:-2].split(b";", 1)[0].strip()
+        if not size_text or size_text.strip(b"0123456789abcdefABCDEF"):
+            raise _HttpError(400)
+        n = int(size_text, 16)
+        if n == 0:
+            break
+        size += n
+        if size > MAX_BODY:
+            raise _HttpError(413)
+        parts.append(await reader.readexactly(n))
+        if await reader.readexactly(2) != b"\r\n":
+            raise _HttpError(400)
+    while await reader.readuntil(b"\r\n") != b"\r\n":
+        pass
+    return b"".join(parts)
+
+
+async def _reject(writer: asyncio.StreamWriter, status: int) -> None:
+    phrase = HTTPStatus(status).phrase
+    body = phrase.encode("latin-1")
+    try:
+        writer.write(
+            f"HTTP/1.1 {status} {phrase}\r\ncontent-type: text/plain\r\ncontent-length: {len(body)}\r\n"
+            f"connection: close\r\n\r\n".encode("latin-1")
+            + body
+        )
+        await writer.drain()
+    except ConnectionError:
+        pass
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    peer = writer.get_extra_info("peername")
+    sock = writer.get_extra_info("sockname")
+    timeout = READ_TIMEOUT
+    try:
+        while True:
+            # Request đầu tiên có READ_TIMEOUT; giữa các request keep-alive chỉ chờ IDLE_TIMEOUT
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                break
+            timeout = IDLE_TIMEOUT
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ", 2)
+            except ValueError:
+                await _reject(writer, 400)
+                break
+            headers: List[Tuple[bytes, bytes]] = []
+            length: int | None = None
+            codings: List[str] = []
+            keep_alive = version == "HTTP/1.1"
+            try:
+                for line in lines[1:]:
+                    if not line:
+                        continue
+                    name, _, value = line.partition(":")
+                    name, value = name.strip().lower(), value.strip()
+                    headers.append((name.encode("latin-1"), value.encode("latin-1")))
+                    if name == "content-length":
+                        length = _content_length(value, length)
+                    elif name == "transfer-encoding":
+                        codings += [c.strip().lower() for c in value.split(",") if c.strip()]
+                    elif name == "connection":
+                        keep_alive = value.lower() == "keep-alive" or (version == "HTTP/1.1" and value.lower() != "close")
+                if codings and length is not None:
+                    # Có cả hai header: dễ bị request smuggling qua proxy, từ chối
+                    raise _HttpError(400)
+                if codings and codings != ["chunked"]:
+                    raise _HttpError(501)
+                if codings:
+                    body = await asyncio.wait_for(_read_chunked(reader), READ_TIMEOUT)
+                    # Body đã được giải mã: Flask chỉ thấy Content-Length
+                    headers = [(k, v) for k, v in headers if k != b"transfer-encoding"]
+                    headers.append((b"content-length", str(len(body)).encode("latin-1")))
+                elif length:
+                    body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT)
+                else:
+                    body = b""
+            except _HttpError as exc:
+                await _reject(writer, exc.status)
+                break
+            except asyncio.TimeoutError:
+                await _reject(writer, 408)
+                break
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                break
+
+            path, _, query = target.partition("?")
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": version.split("/", 1)[-1],
+                "method": method.upper(),
+                "scheme": "http",
+                "path": unquote(path),
+                "raw_path": path.encode("latin-1"),
+                "query_string": query.encode("latin-1"),
+                "root_path": "",
+                "headers": headers,
+                "client": tuple(peer[:2]) if peer else None,
+                "server": tuple(sock[:2]) if sock else None,
+            }
+            sent_request = False
+
+            async def receive() -> Dict[str, Any]:
+                nonlocal sent_request
+                if sent_request:
+                    return {"type": "http.disconnect"}
+                sent_request = True
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            response: Dict[str, Any] = {"status": 500, "headers": [], "started": False, "chunked": False}
+
+            async def send(message: Dict[str, Any]) -> None:
+                nonlocal keep_alive
+                if message["type"] == "http.response.start":
+                    response["status"] = message["status"]
+                    response["headers"] = message.get("headers", [])
+                    return
+                if message["type"] != "http.response.body":
+                    return
+                data = message.get("body", b"")
+                more = message.get("more_body", False)
+                if not response["started"]:
+                    response["started"] = True
+                    status = response["status"]
+                    try:
+                        phrase = HTTPStatus(status).phrase
+                    except ValueError:
+                        phrase = ""
+                    out = [f"HTTP/1.1 {status} {phrase}\r\n".encode("latin-1")]
+                    has_length = False
+                    for name, value in response["headers"]:
+                        if name == b"content-length":
+                            has_length = True
+                        out.append(name + b": " + value + b"\r\n")
+                    if not has_length:
+                        if not more:
+                            out.append(f"content-length: {len(data)}\r\n".encode("latin-1"))
+                        elif version == "HTTP/1.1":
+                            response["chunked"] = True
+                            out.append(b"transfer-encoding: chunked\r\n")
+                        else:
+                            # HTTP/1.0 không có chunked: kết thúc body bằng cách đóng kết nối
+                            keep_alive = False
+                    out.append(b"connection: keep-alive\r\n\r\n" if keep_alive else b"connection: close\r\n\r\n")
+                    writer.write(b"".join(out))
+                if response["chunked"]:
+                    if data:
+                        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    if not more:
+                        writer.write(b"0\r\n\r\n")
+                elif data:
+                    writer.write(data)
+                await writer.drain()
+
+            try:
+                await application(scope, receive, send)
+            except Exception:
+                app.logger.exception("ASGI request failed: %s %s", method, path)
+                if not response["started"]:
+                    await _reject(writer, 500)
+                break
+            if not response["started"] or not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int) -> None:
+    server = await asyncio.start_server(_handle_connection, host, port, backlog=1024)
+    print(f"Serving on http://{host}:{port} (heavy={HEAVY_WORKERS}, light={LIGHT_WORKERS} workers)", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run web_app in async (asyncio/ASGI) serving mode.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""So sánh độ trễ đuôi (p50/p95/p99) giữa server threaded và chế độ async (asgi.py)
+khi có nhiều client đồng thời.
+
+Mỗi server chạy trong một tiến trình con trên bản sao dữ liệu (thư mục tạm, như
+benchmark.py). Client là coroutine asyncio dùng socket thô nên có thể mở 500 kết nối
+mà không cần 500 thread. Lưu lượng trộn:
+  - cold:   POST /search với quốc gia ngẫu nhiên (đọc + parse trang HTML)
+  - cached: GET /countries có If-None-Match (thường trả về 304)
+  - expert: POST /expert/live
+
+Ví dụ:
+    python bench_concurrency.py --clients 50,100,200,500 --requests 5 --out conc.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from benchmark import _prepare_workdir
+
+SERVERS = {
+    "threaded": "import web_app; web_app.app.run(host='127.0.0.1', port={port}, threaded=True)",
+    "async": "import asgi, asyncio; asyncio.run(asgi.serve('127.0.0.1', {port}))",
+}
+
+MIX = [("cold", 0.1), ("cached", 0.45), ("expert", 0.45)]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+async def _request(
+    port: int, method: str, path: str, headers: Dict[str, str], body: bytes = b""
+) -> Tuple[int, Dict[str, str], bytes]:
+    """Gửi một request HTTP/1.1 (Connection: close) và đọc hết response."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    lines = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1", "Connection: close", f"Content-Length: {len(body)}"]
+    lines += [f"{k}: {v}" for k, v in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    head_lines = head.decode("latin-1").split("\r\n")
+    status = int(head_lines[0].split(" ", 2)[1])
+    response_headers: Dict[str, str] = {}
+    for line in head_lines[1:]:
+        name, _, value = line.partition(":")
+        response_headers.setdefault(name.strip().lower(), value.strip())
+    return status, response_headers, payload
+
+
+async def _login(port: int) -> str:
+    body = urlencode({"username": "admin", "password": "admin123"}).encode()
+    _, headers, _ = await _request(
+        port, "POST", "/login", {"Content-Type": "application/x-www-form-urlencoded"}, body
+    )
+    return headers.get("set-cookie", "").split(";", 1)[0]
+
+
+def _countries(workdir: str) -> List[str]:
+    with open(os.path.join(workdir, "countryList.txt"), "r", encoding="utf-8") as fh:
+        return [line.strip()[3:] for line in fh if line.strip()]
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+    return {"count": len(ordered), "p50_ms": pct(0.5), "p95_ms": pct(0.95), "p99_ms": pct(0.99), "max_ms": ordered[-1]}
+
+
+async def run_level(port: int, clients: int, requests: int, countries: List[str], seed: int) -> Dict[str, Any]:
+    cookie = await _login(port)
+    form = {"Cookie": cookie, "Content-Type": "application/x-www-form-urlencoded"}
+    _, headers, _ = await _request(port, "GET", "/countries", {"Cookie": cookie})
+    etag = headers.get("etag", "")
+    live = urlencode({"density": "low", "climate": "cold", "government": "democracy", "religion": "christianity"})
+    rng = random.Random(seed)
+    samples: Dict[str, List[float]] = {kind: [] for kind, _ in MIX}
+    errors = 0
+
+    async def one(kind: str) -> None:
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            if kind == "cold":
+                body = urlencode({"country": rng.choice(countries), "query": ";lst"}).encode()
+                status, _, _ = await _request(port, "POST", "/search", form, body)
+            elif kind == "cached":
+                status, _, _ = await _request(port, "GET", "/countries", {"Cookie": cookie, "If-None-Match": etag})
+            else:
+                status, _, _ = await _request(port, "POST", "/expert/live", form, live.encode())
+        except (OSError, ValueError, IndexError):
+            errors += 1
+            return
+        if status >= 400:
+            errors += 1
+            return
+        samples[kind].append((time.perf_counter() - start) * 1000.0)
+
+    async def client() -> None:
+        for _ in range(requests):
+            kind = rng.choices([k for k, _ in MIX], weights=[w for _, w in MIX])[0]
+            await one(kind)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    total = sum(len(v) for v in samples.values())
+    return {
+        "clients": clients,
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "errors": errors,
+        "all": _percentiles([s for v in samples.values() for s in v]),
+        **{kind: _percentiles(values) for kind, values in samples.items()},
+    }
+
+
+def bench_server(kind: str, workdir: str, levels: List[int], requests: int, seed: int) -> List[Dict[str, Any]]:
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", SERVERS[kind].format(port=port)],
+        cwd=workdir,
+        env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__))),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_port(port)
+        countries = _countries(workdir)
+        results = []
+        for clients in levels:
+            result = asyncio.run(run_level(port, clients, requests, countries, seed))
+            results.append(result)
+            print(
+                f"{kind:9s} clients={clients:4d}  rps={result['throughput_rps']:8.1f}  "
+                f"p50={result['all'].get('p50_ms', 0):8.1f}  p95={result['all'].get('p95_ms', 0):8.1f}  "
+                f"p99={result['all'].get('p99_ms', 0):8.1f} ms  "
+                f"cached p99={result['cached'].get('p99_ms', 0):8.1f} ms  errors={result['errors']}",
+                flush=True,
+            )
+        return results
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare tail latency of threaded vs async serving modes.")
+    parser.add_argument("--clients", default="50,100,200,500", help="các mức client đồng thời, phân tách bằng dấu phẩy")
+    parser.add_argument("--requests", type=int, default=5, help="số request mỗi client")
+    parser.add_argument("--servers", default="threaded,async")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="ghi kết quả JSON ra file")
+    args = parser.parse_args(argv)
+
+    levels = [int(x) for x in args.clients.split(",") if x.strip()]
+    src = os.path.dirname(os.path.abspath(__file__))
+    workdir = _prepare_workdir(src)
+    try:
+        results = {
+            kind: bench_server(kind, workdir, levels, args.requests, args.seed)
+            for kind in args.servers.split(",")
+            if kind in SERVERS
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, ensure_ascii=False, indent=2)
+        print(f"Saved concurrency results to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
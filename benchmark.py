@@ -0,0 +1,276 @@
+"""Bộ benchmark cho các đường xử lý chính của web app.
+
+Chạy qua Flask test client trên một bản sao dữ liệu (thư mục tạm) để các route
+admin ghi CSV không làm thay đổi dữ liệu thật.
+
+Ví dụ:
+    python benchmark.py --out bench.json
+    python benchmark.py --compare bench.json --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from difflib import get_close_matches
+from typing import Any, Callable, Dict, List, Tuple
+
+import web_app
+from web_app import (
+    LIVE_PROVERS,
+    LIVE_RULES,
+    WORK_RULES,
+    app,
+    backward_chain_for_country,
+    compile_rules,
+    forward_chain_for_country,
+    get_country_table,
+    live_goals,
+    load_country_details,
+    order_by_selectivity,
+    parse_html,
+    rank_countries,
+    read_country_page,
+    term_id,
+)
+
+DATA_FILES = ["countries.csv", "Tourism.csv", "countryList.txt", "search_vi_cache.json", "countries.zip", "countries.pack"]
+
+BenchCase = Tuple[str, Callable[[], Any]]
+
+
+def _prepare_workdir(src: str) -> str:
+    """Sao chép dữ liệu sang thư mục tạm; thư mục countries/ được symlink (chỉ đọc)."""
+    workdir = tempfile.mkdtemp(prefix="expert-bench-")
+    for name in DATA_FILES:
+        path = os.path.join(src, name)
+        if os.path.exists(path):
+            shutil.copy2(path, os.path.join(workdir, name))
+    pages = os.path.join(src, "countries")
+    if os.path.isdir(pages):
+        os.symlink(pages, os.path.join(workdir, "countries"))
+    return workdir
+
+
+def _timed(fn: Callable[[], Any], iterations: int, warmup: int) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "iterations": len(samples),
+        "mean_ms": statistics.fmean(samples),
+        "median_ms": statistics.median(samples),
+        "p95_ms": p95,
+        "min_ms": ordered[0],
+        "max_ms": ordered[-1],
+    }
+
+
+def _check(resp, name: str) -> None:
+    if resp.status_code >= 400:
+        raise RuntimeError(f"{name}: HTTP {resp.status_code}")
+
+
+def http_cases(country: str) -> List[BenchCase]:
+    """Các kịch bản HTTP qua test client (đã đăng nhập bằng tài khoản manager)."""
+    client = app.test_client()
+    client.post("/login", data={"username": "admin", "password": "admin123"})
+
+    def post(path: str, data: Dict[str, str], name: str) -> Callable[[], None]:
+        def run() -> None:
+            _check(client.post(path, data=data), name)
+
+        return run
+
+    def get(path: str, params: Dict[str, str], name: str) -> Callable[[], None]:
+        def run() -> None:
+            _check(client.get(path, query_string=params), name)
+
+        return run
+
+    def admin_save_delete() -> None:
+        row = {
+            "Quốc gia": "Benchland",
+            "Hình thức chính phủ": "Dân chủ",
+            "Lĩnh vực": "Công nghệ",
+            "Tôn giáo chính": "Phật giáo",
+            "GDP": "1.00",
+            "Mật độ dân số": "1",
+            "Khí hậu trung bình": "ôn hòa",
+            "Nhập khẩu": "1",
+            "Xuất khẩu": "1",
+            "Loại thương mại": "Xuất khẩu",
+        }
+        _check(client.post("/admin/countries", data=row), "admin save")
+        _check(client.post("/admin/countries/delete", data={"key": "Benchland"}), "admin delete")
+
+    def tourism_save_delete() -> None:
+        row = {"Điểm đến": "Bench Bay", "Quốc gia": "Benchland", "Ngân sách": "30–60 triệu", "Loại địa điểm": "Biển"}
+        _check(client.post("/admin/tourism", data=row), "tourism save")
+        _check(client.post("/admin/tourism/delete", data={"key": "Bench Bay"}), "tourism delete")
+
+    return [
+        ("http.search.plain", post("/search", {"country": country, "query": "climate"}, "search plain")),
+        ("http.search.lst", post("/search", {"country": country, "query": ";lst"}, "search ;lst")),
+        ("http.search.keys", post("/search", {"country": country, "query": ";keys"}, "search ;keys")),
+        ("http.search.lst_preview", post("/search", {"country": country, "query": ";lst preview"}, "search ;lst preview")),
+        ("http.search.section", get("/search/section", {"country": country, "key": "Background"}, "search section")),
+        ("http.search.matches", post("/search", {"country": country, "query": ";matches economy"}, "search ;matches")),
+        (
+            "http.expert.live",
+            post(
+                "/expert/live",
+                {"density": "low", "climate": "cold", "government": "democracy", "religion": "christianity"},
+                "expert live",
+            ),
+        ),
+        (
+            "http.expert.work",
+            post("/expert/work", {"mode": "business", "trade": "import", "domain": "technology"}, "expert work"),
+        ),
+        (
+            "http.expert.travel",
+            post("/expert/travel", {"budget": "40000000", "place_type": "historical"}, "expert travel"),
+        ),
+        ("http.admin.countries.save_delete", admin_save_delete),
+        ("http.admin.tourism.save_delete", tourism_save_delete),
+    ]
+
+
+def micro_cases(country_code: str) -> List[BenchCase]:
+    """Microbenchmark các hàm lõi: parse_html, forward_chain_for_country, get_close_matches."""
+    page = read_country_page(country_code)
+    details = load_country_details()
+    keys = list(parse_html(page).keys())
+    live_ctx = {
+        "climate": term_id("climate", "cold"),
+        "government": term_id("government", "democracy"),
+        "religion": term_id("religion", "christianity"),
+    }
+    work_ctx = {"mode": "business", "trade": term_id("trade", "import"), "domain": term_id("domain", "technology")}
+
+    def chain_all(ctx: Dict[str, Any], rules) -> Callable[[], None]:
+        def run() -> None:
+            for name, info in details.items():
+                forward_chain_for_country(name, info, ctx, rules)
+
+        return run
+
+    def backward_all() -> None:
+        plan = order_by_selectivity(live_goals(live_ctx), live_ctx, get_country_table()["freq"])
+        for name, info in details.items():
+            backward_chain_for_country(name, info, live_ctx, plan, LIVE_PROVERS)
+
+    def compiled_all() -> None:
+        table = get_country_table()
+        predicate = compile_rules(live_goals, live_ctx, table["freq"])
+        for row in table["rows"]:
+            predicate(row)
+
+    return [
+        ("micro.parse_html", lambda: parse_html(page)),
+        ("micro.forward_chain.live_all", chain_all(live_ctx, LIVE_RULES)),
+        ("micro.forward_chain.work_all", chain_all(work_ctx, WORK_RULES)),
+        ("micro.backward_chain.live_all", backward_all),
+        ("micro.compiled_rules.live_all", compiled_all),
+        ("micro.get_close_matches", lambda: get_close_matches("population", keys, n=20, cutoff=0.3)),
+        ("micro.rank_countries.live", lambda: rank_countries(get_country_table(), dict(live_ctx, density="low"), {}, 10)),
+    ]
+
+
+def run_benchmarks(iterations: int, warmup: int, country: str, only: str | None = None) -> Dict[str, Any]:
+    code = web_app.code_for_country(country)
+    if not code:
+        raise SystemExit(f"Country not found in countryList.txt: {country}")
+    cases = micro_cases(code.lower()) + http_cases(country)
+    results: Dict[str, Any] = {}
+    for name, fn in cases:
+        if only and only not in name:
+            continue
+        # Các route HTTP chậm hơn nhiều nên giảm số lần lặp
+        n = iterations if name.startswith("micro.") else max(1, iterations // 5)
+        results[name] = _summary(_timed(fn, n, warmup))
+        print(f"{name:40s} median={results[name]['median_ms']:9.3f} ms  p95={results[name]['p95_ms']:9.3f} ms", flush=True)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "country": country,
+            "iterations": iterations,
+            "warmup": warmup,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """So sánh median với baseline; trả về danh sách case bị chậm hơn quá ngưỡng."""
+    regressions: List[str] = []
+    base_results = baseline.get("results", {})
+    for name, cur in current["results"].items():
+        base = base_results.get(name)
+        if not base:
+            print(f"{name:40s} (no baseline)")
+            continue
+        ratio = cur["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        flag = ""
+        if ratio > 1.0 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:40s} {base['median_ms']:9.3f} -> {cur['median_ms']:9.3f} ms ({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark search, inference and admin paths.")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--country", default="United States")
+    parser.add_argument("--only", help="chỉ chạy các case có tên chứa chuỗi này")
+    parser.add_argument("--out", help="ghi kết quả JSON ra file")
+    parser.add_argument("--compare", help="file JSON baseline để so sánh")
+    parser.add_argument("--threshold", type=float, default=0.2, help="tỉ lệ chậm hơn cho phép (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    src = os.path.dirname(os.path.abspath(__file__))
+    workdir = _prepare_workdir(src)
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        current = run_benchmarks(args.iterations, args.warmup, args.country, args.only)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(current, fh, ensure_ascii=False, indent=2)
+        print(f"Saved benchmark results to {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
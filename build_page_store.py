@@ -0,0 +1,57 @@
+"""Đóng gói thư mục countries/ thành kho trang nén countries.pack.
+
+Mỗi trang được bỏ phần khung không dùng tới (script, style, comment, thuộc tính trừ class)
+rồi nén zlib với một từ điển dùng chung học từ chính các trang, kèm chỉ mục offset để đọc
+ngẫu nhiên theo mã quốc gia. Khi có countries.pack, read_country_page đọc từ đó và không
+cần tới thư mục countries/ nữa (có thể bỏ khỏi bản triển khai).
+
+Ví dụ:
+    python build_page_store.py --src countries --out countries.pack --verify
+"""
+
+import argparse
+import os
+import time
+from typing import List, Optional
+
+from web_app import PAGE_STORE_PATH, parse_html, read_packed_page, write_page_store
+
+
+def verify(src: str, out: str) -> List[str]:
+    """Các mã trang mà parse_html trên bản trong kho khác với trên file gốc."""
+    mismatched: List[str] = []
+    for name in sorted(os.listdir(src)):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(src, name), "rb") as fh:
+            original = parse_html(fh.read())
+        if parse_html(read_packed_page(name[:-5], out)) != original:
+            mismatched.append(name[:-5])
+    return mismatched
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Pack countries/*.html into a compressed page store.")
+    parser.add_argument("--src", default="countries", help="thư mục chứa <code>.html")
+    parser.add_argument("--out", default=PAGE_STORE_PATH)
+    parser.add_argument("--no-strip", action="store_true", help="giữ nguyên trang gốc, chỉ nén")
+    parser.add_argument("--verify", action="store_true", help="so sánh kết quả parse_html với trang gốc")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    stats = write_page_store(args.src, args.out, strip=not args.no_strip)
+    elapsed = time.perf_counter() - start
+    ratio = stats["source_bytes"] / stats["packed_bytes"] if stats["packed_bytes"] else 0.0
+    print(
+        f"Packed {stats['pages']} pages: {stats['source_bytes']:,} -> {stats['packed_bytes']:,} bytes "
+        f"({ratio:.1f}x, stripped {stats['stripped_bytes']:,}) in {elapsed:.1f}s -> {args.out}"
+    )
+    if args.verify:
+        mismatched = verify(args.src, args.out)
+        if mismatched:
+            raise SystemExit(f"parse_html differs for: {', '.join(mismatched)}")
+        print(f"Verified {stats['pages']} pages: parse_html output identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Dựng sẵn chỉ mục mục (section_index/<mã>.idx) cho mọi quốc gia và ma trận mục dùng cho /compare.
+
+Web app tự dựng phần còn thiếu khi cần, nhưng lần đầu phải parse toàn bộ trang HTML; chạy script này
+sau khi cập nhật countries.pack / countries.zip / countries/ để request đầu tiên không phải chờ.
+Chỉ quốc gia có trang nguồn thay đổi mới bị parse lại.
+
+Ví dụ:
+    python build_section_index.py --workers 4
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from web_app import SECTION_INDEX_DIR, get_section_index, get_section_matrix, load_country_codes
+
+
+def index_country(code: str) -> Tuple[str, int]:
+    """Dựng (hoặc xác nhận) chỉ mục của một quốc gia; trả về số mục (-1 nếu không đọc được trang)."""
+    try:
+        return code, len(get_section_index(code)["sections"])
+    except (KeyError, OSError):
+        return code, -1
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Precompute per-country section indexes and the section matrix.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="số process parse song song")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    codes = [code for code, _ in load_country_codes()]
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        results = list(pool.map(index_country, codes, chunksize=4))
+    missing = [code for code, count in results if count < 0]
+    matrix = get_section_matrix()
+    print(
+        f"{len(codes) - len(missing)} countries indexed, {len(matrix['ids'])} canonical sections "
+        f"in {time.perf_counter() - start:.1f}s -> {SECTION_INDEX_DIR}/"
+    )
+    if missing:
+        print(f"  no page for: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Xuất sẵn các trang chỉ-đọc thành HTML tĩnh, để server tĩnh / CDN phục vụ mà không cần chạy Python.
+
+Các trang được render bằng chính Flask app và template Jinja (qua test client, ở dạng khách chưa
+đăng nhập, bỏ qua yêu cầu đăng nhập chung), nên nội dung giống hệt route động:
+  - /countries, /search, /expert
+  - /search?country=<tên>&query=;keys và ;lst cho từng quốc gia
+  - kết quả gợi ý Sống / Làm việc (suy diễn theo luật) cho mọi tổ hợp lựa chọn trong form
+Gợi ý Du lịch nhận số tiền tự do nên vẫn dùng route động (POST /expert/travel).
+
+Mỗi trang được ghi kèm "dấu vân tay" các dữ liệu nó phụ thuộc vào trong manifest.json; lần chạy
+sau chỉ render lại trang có dấu vân tay thay đổi và xóa trang không còn trong kế hoạch.
+manifest.json cũng liệt kê URL động tương ứng của từng file, dùng để viết rewrite rule cho CDN
+(ví dụ /search?country=Japan&query=;keys -> /search/ja/keys.html). Thư mục xuất ra không có
+kiểm tra đăng nhập: nếu cần thì đặt sau lớp xác thực của server tĩnh.
+
+Ví dụ:
+    python export_static.py --out site --workers 4
+    python export_static.py --out site            # chạy lại: chỉ render trang bị ảnh hưởng
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import web_app
+from web_app import (
+    SEARCH_VI_CACHE,
+    STATIC_EXPORT_ENVIRON,
+    app,
+    code_for_country,
+    file_digest,
+    load_country_list,
+    read_country_page,
+    set_vi_translator,
+    templates_version,
+)
+
+MANIFEST = "manifest.json"
+
+# Các lựa chọn trong form expert.html (giá trị của <option>)
+LIVE_INPUTS = {
+    "climate": ["cold", "moderate", "hot"],
+    "government": ["democracy", "communist", "monarchy", "republic", "federal"],
+    "religion": ["christianity", "buddhism", "hinduism", "islam", "atheist"],
+}
+WORK_INPUTS = {
+    "mode": ["business", "job"],
+    "trade": ["import", "export"],
+    "domain": ["technology", "manufacturing", "tourism", "infrastructure"],
+}
+SEARCH_QUERIES = {"keys": ";keys", "lst": ";lst"}
+
+# Một trang cần render: (file đích, method, path, tham số, dấu vân tay)
+Job = Tuple[str, str, str, Dict[str, str], str]
+
+_CLIENT: Any = None
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def site_version() -> str:
+    """Phần chung của mọi trang: mã nguồn app, templates và static (URL static có ?v=<hash>)."""
+    static = os.path.join(app.root_path, app.static_folder or "static")
+    assets = [(name, file_digest(os.path.join(static, name))) for name in sorted(os.listdir(static))]
+    return _digest(file_digest(web_app.__file__), templates_version(), assets)
+
+
+def plan_jobs() -> List[Job]:
+    """Danh sách mọi trang cần xuất cùng dấu vân tay dữ liệu của từng trang."""
+    site = site_version()
+    names = file_digest("countryList.txt")
+    countries_csv = _digest(file_digest("countries.csv"), file_digest(web_app.VOCAB_PATH))
+    jobs: List[Job] = [
+        ("countries/index.html", "GET", "/countries", {}, _digest(site, names)),
+        ("search/index.html", "GET", "/search", {}, _digest(site, names)),
+        ("expert/index.html", "GET", "/expert", {}, site),
+    ]
+
+    for name in load_country_list():
+        code = (code_for_country(name) or "").lower()
+        if not code:
+            continue
+        try:
+            page = hashlib.sha1(read_country_page(code)).hexdigest()
+        except (KeyError, OSError):
+            continue
+        fingerprint = _digest(site, names, page, SEARCH_VI_CACHE.get(code))
+        for slug, query in SEARCH_QUERIES.items():
+            jobs.append((f"search/{code}/{slug}.html", "GET", "/search", {"country": name, "query": query}, fingerprint))
+
+    for values in itertools.product(*LIVE_INPUTS.values()):
+        form = dict(zip(LIVE_INPUTS, values), density="high", inference="rules")
+        jobs.append((f"expert/live/{'-'.join(values)}.html", "POST", "/expert/live", form, _digest(site, countries_csv)))
+    for values in itertools.product(*WORK_INPUTS.values()):
+        form = dict(zip(WORK_INPUTS, values), inference="rules")
+        jobs.append((f"expert/work/{'-'.join(values)}.html", "POST", "/expert/work", form, _digest(site, countries_csv)))
+    return jobs
+
+
+def _init_worker() -> None:
+    global _CLIENT
+    # Trang xuất ra dùng đúng SEARCH_VI_CACHE hiện có (dấu vân tay tính trên đó); không dịch nền,
+    # tránh nhiều process cùng ghi search_vi_cache.json khi thoát
+    set_vi_translator(None)
+    _CLIENT = app.test_client()
+    _CLIENT.environ_base[STATIC_EXPORT_ENVIRON] = True
+
+
+def render_job(out: str, job: Job) -> Tuple[str, int, int]:
+    """Render một trang trong worker và ghi thẳng ra file (ghi file tạm rồi os.replace)."""
+    target, method, path, params, _ = job
+    if method == "GET":
+        response = _CLIENT.get(path, query_string=params)
+    else:
+        response = _CLIENT.post(path, data=params)
+    if response.status_code != 200:
+        return target, response.status_code, 0
+    dest = os.path.join(out, target)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as fh:
+        fh.write(response.get_data())
+    os.replace(tmp, dest)
+    return target, 200, len(response.get_data())
+
+
+def load_manifest(out: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(out, MANIFEST), "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {"pages": {}}
+
+
+def export(out: str, workers: int, force: bool = False) -> Dict[str, Any]:
+    """Xuất (hoặc cập nhật) thư mục tĩnh; trả về số trang đã render / giữ nguyên / xóa / lỗi."""
+    os.makedirs(out, exist_ok=True)
+    previous = load_manifest(out)["pages"]
+    jobs = plan_jobs()
+    todo = [
+        job
+        for job in jobs
+        if force
+        or previous.get(job[0], {}).get("fingerprint") != job[4]
+        or not os.path.exists(os.path.join(out, job[0]))
+    ]
+
+    pages: Dict[str, Any] = {}
+    failed: List[Tuple[str, int]] = []
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for target, status, _ in pool.map(render_job, itertools.repeat(out), todo, chunksize=8):
+                if status != 200:
+                    failed.append((target, status))
+    failed_targets = {target for target, _ in failed}
+    for target, method, path, params, fingerprint in jobs:
+        if target in failed_targets:
+            continue
+        url = f"{path}?{urlencode(params)}" if params and method == "GET" else path
+        pages[target] = {"method": method, "url": url, "params": params, "fingerprint": fingerprint}
+
+    removed = 0
+    for target in set(previous) - set(pages):
+        path = os.path.join(out, target)
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+
+    static_src = os.path.join(app.root_path, app.static_folder or "static")
+    shutil.copytree(static_src, os.path.join(out, "static"), dirs_exist_ok=True)
+
+    tmp = os.path.join(out, f"{MANIFEST}.tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"pages": pages}, fh, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(out, MANIFEST))
+    return {
+        "planned": len(jobs),
+        "rendered": len(todo) - len(failed),
+        "unchanged": len(jobs) - len(todo),
+        "removed": removed,
+        "failed": failed,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Pre-render read-only pages into a static directory.")
+    parser.add_argument("--out", default="site", help="thư mục đích")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="số process render song song")
+    parser.add_argument("--force", action="store_true", help="render lại toàn bộ, bỏ qua manifest")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    stats = export(args.out, max(1, args.workers), force=args.force)
+    print(
+        f"{stats['planned']} pages: rendered {stats['rendered']}, unchanged {stats['unchanged']}, "
+        f"removed {stats['removed']}, failed {len(stats['failed'])} in {time.perf_counter() - start:.1f}s -> {args.out}"
+    )
+    for target, status in stats["failed"][:20]:
+        print(f"  failed {target}: HTTP {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Sinh dữ liệu giả lập (cùng schema với dữ liệu thật) để kiểm thử tải offline.
+
+Tạo trong thư mục đích:
+  - countries.csv, Tourism.csv: header tiếng Việt, giá trị lấy từ GOV_MAP, FIELD_MAP,
+    RELIGION_MAP, CLIMATE_MAP, TRADE_MAP, PLACE_MAP.
+  - countryList.txt và countries/<code>.html: trang factbook giả theo bố cục
+    div.category / category_data mà parse_html đọc được.
+
+Mã trang chỉ có 2 ký tự (giống countryList.txt) nên số trang HTML tối đa là 676;
+số dòng CSV thì không giới hạn.
+
+Ví dụ:
+    python generate_dataset.py --out /tmp/synthetic --countries 100000 --places 100000 --pages 300
+    cd /tmp/synthetic && python /path/to/web_app.py
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import random
+import string
+from typing import Iterator, List
+
+from web_app import (
+    CLIMATE_MAP,
+    COUNTRIES_HEADER_MAP,
+    FIELD_MAP,
+    GOV_MAP,
+    PLACE_MAP,
+    RELIGION_MAP,
+    TOURISM_HEADER_MAP,
+    TRADE_MAP,
+)
+
+BUDGET_LABELS = ["Dưới 30.000.000", "30–60 triệu", "Trên 60.000.000"]
+
+SECTION_TITLES = [
+    "Background", "Location", "Geographic coordinates", "Map references", "Area", "Land boundaries",
+    "Coastline", "Climate", "Terrain", "Elevation", "Natural resources", "Land use", "Population",
+    "Nationality", "Ethnic groups", "Languages", "Religions", "Age structure", "Government type",
+    "Capital", "Legal system", "Economy - overview", "GDP (purchasing power parity)", "Exports",
+    "Imports", "Currency", "Electricity - production", "Telephones - fixed lines", "Airports",
+    "Railways", "Roadways", "Ports and terminals", "Military branches", "Disputes - international",
+]
+
+WORDS = (
+    "the of and in to a is was for on as by with from that at its are an which has been "
+    "economy population region coast border river mountain government trade export import "
+    "industry agriculture climate tropical temperate capital province island territory "
+    "percent million billion growth sector services production resources"
+).split()
+
+# Bộ khung lặp lại của trang factbook, dùng để "độn" trang giả lớn gần bằng trang thật
+BOILERPLATE = (
+    '<div class="boilerplate"><script type="text/javascript">var CollapsiblePanel = '
+    'new Spry.Widget.CollapsiblePanel("CollapsiblePanel", null, "LASTCRNTYCODE");</script>'
+    '<a href="../docs/notesanddefs.html"><img src="../graphics/field_listing_on.gif" border="0" '
+    'alt="Field info displayed for all countries in alpha order." /></a></div>\n'
+)
+
+
+def _number(rng: random.Random, low: float, high: float, decimals: int = 2) -> str:
+    """Định dạng số kiểu "18,561.93" giống countries.csv."""
+    value = rng.uniform(low, high)
+    return f"{value:,.{decimals}f}"
+
+
+def _name(rng: random.Random, index: int) -> str:
+    syllables = ["ar", "be", "ca", "do", "el", "fa", "go", "ha", "is", "jo", "ka", "lu", "ma", "no", "or", "pa"]
+    stem = "".join(rng.choice(syllables) for _ in range(3)).capitalize()
+    # Chỉ số có độ dài cố định để code_for_country (so khớp chuỗi con) không nhầm tên
+    return f"{stem} {index:06d}"
+
+
+def country_codes() -> Iterator[str]:
+    for a, b in itertools.product(string.ascii_lowercase, repeat=2):
+        yield a + b
+
+
+def country_rows(rng: random.Random, names: List[str]) -> Iterator[List[str]]:
+    govs = list(GOV_MAP.values())
+    fields = list(FIELD_MAP.values())
+    religions = list(RELIGION_MAP.values())
+    climates = list(CLIMATE_MAP.values())
+    trades = list(TRADE_MAP.values())
+    for name in names:
+        yield [
+            name,
+            rng.choice(govs).capitalize(),
+            rng.choice(fields).capitalize(),
+            rng.choice(religions).capitalize(),
+            _number(rng, 0.1, 20_000),
+            str(rng.randint(1, 2_000)),
+            rng.choice(climates),
+            _number(rng, 0.1, 2_500),
+            _number(rng, 0.1, 2_000, decimals=0),
+            rng.choice(trades).capitalize(),
+        ]
+
+
+def tourism_rows(rng: random.Random, n: int, country_names: List[str]) -> Iterator[List[str]]:
+    places = list(PLACE_MAP.values())
+    for i in range(n):
+        yield [
+            f"Place {i}",
+            rng.choice(country_names),
+            rng.choice(BUDGET_LABELS),
+            rng.choice(places).capitalize(),
+        ]
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[:1].upper() + text[1:] + "."
+
+
+def render_page(rng: random.Random, code: str, name: str, sections: int, section_words: int, padding_kb: int) -> str:
+    """Sinh một trang HTML có `sections` mục theo bố cục mà parse_html mong đợi."""
+    parts: List[str] = [
+        '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Strict//EN" '
+        '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-strict.dtd">\n',
+        f'<html lang="en"><head><meta charset="utf-8" /><title>{name} - Synthetic Factbook</title></head><body>\n',
+    ]
+    padding = BOILERPLATE * max(0, (padding_kb * 1024) // len(BOILERPLATE))
+    parts.append(padding)
+    titles = [SECTION_TITLES[i] if i < len(SECTION_TITLES) else f"Section {i}" for i in range(sections)]
+    for title in titles:
+        parts.append(
+            '<table width="638" border="0" cellpadding="0" cellspacing="0">\n'
+            '  <tr class="noa_light">\n'
+            f'    <td width="390" height="20"><div class="category" id="field"><a href="../docs/notesanddefs.html#{code}">'
+            f"{title}</a>:</div></td>\n"
+            '    <td align="right"></td>\n'
+            "  </tr>\n"
+            "  <tr>\n"
+            f'    <td id="data" colspan="2"><div class="category_data">{_paragraph(rng, section_words)}</div></td>\n'
+            "  </tr>\n"
+            "</table>\n"
+        )
+    parts.append(padding)
+    parts.append("</body></html>\n")
+    return "".join(parts)
+
+
+def generate(
+    out: str,
+    countries: int,
+    places: int,
+    pages: int,
+    sections: int,
+    section_words: int,
+    padding_kb: int,
+    seed: int,
+) -> None:
+    rng = random.Random(seed)
+    os.makedirs(out, exist_ok=True)
+    names = [_name(rng, i) for i in range(countries)]
+
+    with open(os.path.join(out, "countries.csv"), "w", encoding="utf-8", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(list(COUNTRIES_HEADER_MAP.values()))
+        writer.writerows(country_rows(rng, names))
+
+    with open(os.path.join(out, "Tourism.csv"), "w", encoding="utf-8", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(list(TOURISM_HEADER_MAP.values()))
+        writer.writerows(tourism_rows(rng, places, names or ["Nowhere"]))
+
+    page_dir = os.path.join(out, "countries")
+    os.makedirs(page_dir, exist_ok=True)
+    with open(os.path.join(out, "countryList.txt"), "w", encoding="utf-8") as fh:
+        for code, name in zip(country_codes(), names[:pages]):
+            fh.write(f"{code} {name} \n")
+            with open(os.path.join(page_dir, f"{code}.html"), "w", encoding="utf-8") as page:
+                page.write(render_page(rng, code, name, sections, section_words, padding_kb))
+
+    print(f"Generated {countries} countries, {places} places, {min(pages, countries)} pages in {out}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic, schema-compatible dataset.")
+    parser.add_argument("--out", required=True, help="thư mục đích")
+    parser.add_argument("--countries", type=int, default=1000, help="số dòng countries.csv")
+    parser.add_argument("--places", type=int, default=1000, help="số dòng Tourism.csv")
+    parser.add_argument("--pages", type=int, default=50, help="số trang HTML (tối đa 676)")
+    parser.add_argument("--sections", type=int, default=120, help="số mục trên mỗi trang")
+    parser.add_argument("--section-words", type=int, default=60, help="số từ trong mỗi mục")
+    parser.add_argument("--padding-kb", type=int, default=100, help="KB boilerplate chèn vào mỗi trang")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.pages > 26 * 26:
+        parser.error("--pages must be at most 676 (two-letter country codes)")
+    generate(
+        args.out,
+        args.countries,
+        args.places,
+        args.pages,
+        args.sections,
+        args.section_words,
+        args.padding_kb,
+        args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""Kiểm thử tải đầu-cuối: chạy app cục bộ và mô phỏng nhiều phiên người dùng đồng thời.
+
+- Mỗi phiên đọc đăng nhập qua POST /login (do_login) bằng tài khoản "user", rồi gửi request theo
+  tỷ lệ --mix: tra cứu (/search với câu hỏi thường, ;keys, ;lst, ;matches) và ba bộ gợi ý.
+- --writers phiên quản trị (tài khoản "admin") định kỳ thêm / sửa / xóa dòng trong countries.csv
+  và Tourism.csv trong khi các phiên đọc vẫn chạy.
+- Báo cáo throughput, p50/p95/p99 theo từng loại request, các lỗi (HTTP >= 500, bị đẩy về /login, ...).
+- Trong lúc chạy, file CSV được đọc lại liên tục để phát hiện file hỏng (dòng thiếu cột, header đổi,
+  mất dòng gốc); cuối cùng so với sổ ghi của các phiên quản trị để phát hiện thay đổi bị mất.
+
+Server chạy trong tiến trình con trên bản sao dữ liệu (như bench_concurrency.py).
+
+Ví dụ:
+    python loadtest.py --sessions 50 --writers 2 --duration 30
+    python loadtest.py --mix search=1,matches=3,live=1 --server async --out load.json
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+from bench_concurrency import SERVERS, _countries, _free_port, _percentiles, _request, _wait_for_port
+from benchmark import _prepare_workdir
+
+DEFAULT_MIX = "search=20,keys=15,lst=10,matches=15,live=15,work=15,travel=10"
+
+SEARCH_WORDS = ["population", "climate", "gdp", "capital", "religions", "exports", "dân số", "khí hậu", "thủ đô"]
+LIVE_FORM = {
+    "climate": ["cold", "moderate", "hot"],
+    "government": ["democracy", "communist", "monarchy", "republic", "federal"],
+    "religion": ["christianity", "buddhism", "hinduism", "islam", "atheist"],
+    "density": ["high", "low"],
+    "inference": ["rules", "backward", "compiled", "score"],
+}
+WORK_FORM = {
+    "mode": ["business", "job"],
+    "trade": ["import", "export"],
+    "domain": ["technology", "manufacturing", "tourism", "infrastructure"],
+    "inference": ["rules", "backward", "compiled", "score"],
+}
+TRAVEL_FORM = {
+    "budget": ["20.000.000", "45.000.000", "80.000.000"],
+    "place_type": ["historical", "hill station", "desert", "beach"],
+}
+# Giá trị hợp lệ cho dòng quản trị mới (theo thứ tự cột của countries.csv / Tourism.csv tiếng Việt)
+COUNTRY_VALUES = ["Dân chủ", "Công nghệ", "Phật giáo", "1,000", "50", "lạnh", "10", "20", "Nhập khẩu"]
+PLACE_VALUES = ["Japan", "30–60 triệu", "Lịch sử"]
+
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in READERS:
+            raise SystemExit(f"unknown request kind '{kind}' (choose from {', '.join(READERS)})")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def _pick(rng: random.Random, choices: Dict[str, List[str]]) -> Dict[str, str]:
+    return {name: rng.choice(values) for name, values in choices.items()}
+
+
+def _search(rng: random.Random, countries: List[str], query: str) -> Tuple[str, str, Dict[str, str]]:
+    return "POST", "/search", {"country": rng.choice(countries), "query": query}
+
+
+READERS = {
+    "search": lambda rng, countries: _search(rng, countries, rng.choice(SEARCH_WORDS)),
+    "keys": lambda rng, countries: _search(rng, countries, ";keys"),
+    "lst": lambda rng, countries: _search(rng, countries, ";lst"),
+    "matches": lambda rng, countries: _search(rng, countries, f";matches {rng.choice(SEARCH_WORDS)}"),
+    "live": lambda rng, countries: ("POST", "/expert/live", _pick(rng, LIVE_FORM)),
+    "work": lambda rng, countries: ("POST", "/expert/work", _pick(rng, WORK_FORM)),
+    "travel": lambda rng, countries: ("POST", "/expert/travel", _pick(rng, TRAVEL_FORM)),
+}
+
+
+def read_csv(path: str) -> Tuple[List[str], List[List[str]]]:
+    with open(path, "r", encoding="utf-8", newline="") as fh:
+        rows = list(csv.reader(fh))
+    return (rows[0], rows[1:]) if rows else ([], [])
+
+
+class LoadRun:
+    """Trạng thái một lần chạy: mẫu độ trễ, lỗi, sổ ghi quản trị và các vấn đề CSV phát hiện được."""
+
+    def __init__(self, port: int, workdir: str, seed: int) -> None:
+        self.port = port
+        self.workdir = workdir
+        self.rng = random.Random(seed)
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+        # sổ ghi: (file, khóa) -> giá trị cột cuối cùng đã ghi, None = đã xóa
+        self.ledger: Dict[Tuple[str, str], Optional[str]] = {}
+        self.csv_checks = 0
+        self.csv_problems: List[str] = []
+        self.baseline: Dict[str, Tuple[List[str], Set[str]]] = {}
+        for name in ("countries.csv", "Tourism.csv"):
+            header, rows = read_csv(os.path.join(workdir, name))
+            self.baseline[name] = (header, {r[0].strip().lower() for r in rows if r})
+
+    def error(self, kind: str, reason: str) -> None:
+        self.errors.setdefault(kind, {})
+        self.errors[kind][reason] = self.errors[kind].get(reason, 0) + 1
+
+    async def call(
+        self, kind: str, method: str, path: str, cookie: str, form: Dict[str, str], expect: int = 200
+    ) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        headers = dict(FORM, Cookie=cookie) if cookie else dict(FORM)
+        start = time.perf_counter()
+        try:
+            status, response_headers, body = await _request(
+                self.port, method, path, headers, urlencode(form).encode("utf-8")
+            )
+        except (OSError, ValueError, IndexError) as exc:
+            self.error(kind, type(exc).__name__)
+            return None
+        elapsed = (time.perf_counter() - start) * 1000.0
+        if status != expect:
+            self.error(kind, f"HTTP {status}")
+            return None
+        if "/login" in response_headers.get("location", ""):
+            self.error(kind, "redirected to login")
+            return None
+        self.samples.setdefault(kind, []).append(elapsed)
+        return status, response_headers, body
+
+    async def login(self, username: str, password: str) -> str:
+        result = await self.call("login", "POST", "/login", "", {"username": username, "password": password}, 302)
+        if result is None:
+            return ""
+        return result[1].get("set-cookie", "").split(";", 1)[0]
+
+    async def reader(self, mix: Dict[str, float], countries: List[str], deadline: float, think: float) -> None:
+        cookie = await self.login("user", "user123")
+        if not cookie:
+            return
+        kinds, weights = list(mix), list(mix.values())
+        loop = asyncio.get_running_loop()
+        while loop.time() < deadline:
+            kind = self.rng.choices(kinds, weights=weights)[0]
+            method, path, form = READERS[kind](self.rng, countries)
+            await self.call(kind, method, path, cookie, form)
+            if think:
+                await asyncio.sleep(self.rng.uniform(0, 2 * think))
+
+    async def writer(self, index: int, deadline: float, interval: float) -> None:
+        cookie = await self.login("admin", "admin123")
+        if not cookie:
+            return
+        loop = asyncio.get_running_loop()
+        serial = 0
+        while loop.time() < deadline:
+            await asyncio.sleep(self.rng.uniform(0, 2 * interval))
+            name = self.rng.choice(["countries.csv", "Tourism.csv"])
+            header = self.baseline[name][0]
+            route = "/admin/countries" if name == "countries.csv" else "/admin/tourism"
+            # Mỗi phiên chỉ sửa dòng của chính nó, nên thứ tự ghi của một khóa luôn xác định
+            prefix = f"Loadtest w{index}-"
+            mine = [
+                key
+                for (file, key), value in self.ledger.items()
+                if file == name and value is not None and key.startswith(prefix)
+            ]
+            action = self.rng.choice(["insert", "update", "delete"]) if mine else "insert"
+            if action == "delete":
+                key = self.rng.choice(mine)
+                if await self.call("admin_delete", "POST", f"{route}/delete", cookie, {"key": key}, 302):
+                    self.ledger[(name, key)] = None
+                continue
+            if action == "insert":
+                serial += 1
+                key = f"Loadtest w{index}-{serial}"
+                original = ""
+            else:
+                key = original = self.rng.choice(mine)
+            values = COUNTRY_VALUES if name == "countries.csv" else PLACE_VALUES
+            marker = f"{self.rng.randint(1, 10**6)}"
+            row = [key] + values[:-1] + [f"{values[-1]} {marker}"]
+            form = dict(zip(header, row), _original_key=original)
+            if await self.call(f"admin_{action}", "POST", route, cookie, form, 302):
+                self.ledger[(name, key)] = row[-1]
+
+    def check_csv(self) -> None:
+        """Đọc lại hai file CSV: header như ban đầu, mọi dòng đủ cột, không mất dòng gốc."""
+        self.csv_checks += 1
+        for name, (header, base_keys) in self.baseline.items():
+            try:
+                current, rows = read_csv(os.path.join(self.workdir, name))
+            except (OSError, UnicodeDecodeError, csv.Error) as exc:
+                self.csv_problems.append(f"{name}: unreadable ({exc})")
+                continue
+            if current != header:
+                self.csv_problems.append(f"{name}: header changed to {current}")
+            short = sum(1 for r in rows if len(r) != len(header))
+            if short:
+                self.csv_problems.append(f"{name}: {short} rows with wrong column count")
+            missing = base_keys - {r[0].strip().lower() for r in rows if r}
+            if missing:
+                self.csv_problems.append(f"{name}: {len(missing)} original rows missing, e.g. {sorted(missing)[:3]}")
+
+    async def checker(self, deadline: float, interval: float) -> None:
+        loop = asyncio.get_running_loop()
+        while loop.time() < deadline:
+            self.check_csv()
+            await asyncio.sleep(interval)
+
+    def lost_writes(self) -> List[str]:
+        """Các thay đổi đã được server xác nhận nhưng không còn trong file (ghi đè lẫn nhau)."""
+        lost: List[str] = []
+        current: Dict[str, Dict[str, str]] = {}
+        for name in self.baseline:
+            _, rows = read_csv(os.path.join(self.workdir, name))
+            current[name] = {r[0].strip().lower(): r[-1] for r in rows if r}
+        for (name, key), expected in sorted(self.ledger.items()):
+            actual = current[name].get(key.lower())
+            if actual != expected:
+                state = "deleted" if expected is None else f"'{expected}'"
+                lost.append(f"{name}: {key} expected {state}, found {actual!r}")
+        return lost
+
+
+async def run_load(
+    port: int, workdir: str, sessions: int, writers: int, mix: Dict[str, float], duration: float,
+    think: float, write_interval: float, seed: int,
+) -> Dict[str, Any]:
+    run = LoadRun(port, workdir, seed)
+    countries = _countries(workdir)
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    deadline = loop.time() + duration
+    tasks = [run.reader(mix, countries, deadline, think) for _ in range(sessions)]
+    tasks += [run.writer(i, deadline, write_interval) for i in range(writers)]
+    tasks.append(run.checker(deadline, 0.2))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    run.check_csv()
+    total = sum(len(v) for k, v in run.samples.items() if k != "login")
+    return {
+        "sessions": sessions,
+        "writers": writers,
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "latency": {kind: _percentiles(values) for kind, values in sorted(run.samples.items())},
+        "errors": run.errors,
+        "admin_writes": len(run.ledger),
+        "csv_checks": run.csv_checks,
+        "csv_problems": sorted(set(run.csv_problems)),
+        "lost_writes": run.lost_writes(),
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(
+        f"{result['sessions']} sessions + {result['writers']} writers, {result['elapsed_s']:.1f}s, "
+        f"{result['throughput_rps']:.1f} req/s"
+    )
+    print(f"{'kind':16s} {'count':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    for kind, stats in result["latency"].items():
+        print(
+            f"{kind:16s} {stats['count']:7d} {stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} "
+            f"{stats['p99_ms']:9.1f} {stats['max_ms']:9.1f}"
+        )
+    for kind, reasons in sorted(result["errors"].items()):
+        print(f"ERROR {kind}: " + ", ".join(f"{reason} x{count}" for reason, count in sorted(reasons.items())))
+    print(f"CSV checks: {result['csv_checks']}, admin writes: {result['admin_writes']}")
+    for problem in result["csv_problems"]:
+        print(f"CSV PROBLEM {problem}")
+    for lost in result["lost_writes"][:20]:
+        print(f"LOST WRITE {lost}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="End-to-end load test with concurrent sessions and admin writes.")
+    parser.add_argument("--sessions", type=int, default=20, help="số phiên đọc đồng thời")
+    parser.add_argument("--writers", type=int, default=1, help="số phiên quản trị ghi CSV")
+    parser.add_argument("--duration", type=float, default=20.0, help="thời gian chạy (giây)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="tỷ lệ loại request, ví dụ search=2,matches=1,live=1")
+    parser.add_argument("--think", type=float, default=0.0, help="thời gian nghỉ trung bình giữa hai request (giây)")
+    parser.add_argument("--write-interval", type=float, default=0.5, help="khoảng trung bình giữa hai lần ghi (giây)")
+    parser.add_argument("--server", default="threaded", choices=sorted(SERVERS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="ghi kết quả JSON ra file")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    src = os.path.dirname(os.path.abspath(__file__))
+    workdir = _prepare_workdir(src)
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", SERVERS[args.server].format(port=port)],
+        cwd=workdir,
+        env=dict(os.environ, PYTHONPATH=src),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_port(port)
+        result = asyncio.run(
+            run_load(
+                port, workdir, args.sessions, args.writers, mix, args.duration,
+                args.think, args.write_interval, args.seed,
+            )
+        )
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result["server"] = args.server
+    print_report(result)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, ensure_ascii=False, indent=2)
+        print(f"Saved load test results to {args.out}")
+    if result["errors"] or result["csv_problems"] or result["lost_writes"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
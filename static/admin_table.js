@@ -0,0 +1,74 @@
+// Bảng quản trị phân trang phía server: lọc / sắp xếp / chuyển trang bằng cách tải JSON từ data-rows-url
+function adminTable(selector, initial) {
+  const table = document.querySelector(selector);
+  if (!table) return;
+  const url = table.dataset.rowsUrl;
+  const body = table.querySelector('tbody');
+  const pager = document.getElementById('adminPager');
+  const total = document.getElementById('adminTotal');
+  const search = document.querySelector(table.dataset.filter);
+  const state = {
+    q: initial.q || '',
+    sort: initial.sort,
+    desc: !!initial.desc,
+    page: initial.page || 1,
+    per_page: initial.per_page,
+    filters: Object.assign({}, initial.filters || {}),
+  };
+  let timer = null;
+  let pending = null;
+
+  function query() {
+    const params = new URLSearchParams({ page: state.page, per_page: state.per_page, q: state.q });
+    if (state.sort !== null && state.sort !== undefined) params.set('sort', state.sort);
+    if (state.desc) params.set('desc', '1');
+    Object.entries(state.filters).forEach(([col, value]) => { if (value) params.set('f_' + col, value); });
+    return params;
+  }
+
+  function load() {
+    if (pending) pending.abort();
+    pending = new AbortController();
+    const params = query();
+    fetch(url + '?' + params, { signal: pending.signal })
+      .then(r => r.json())
+      .then(data => {
+        body.innerHTML = data.html;
+        pager.innerHTML = data.pager;
+        total.textContent = data.total;
+        table.querySelectorAll('[data-sort]').forEach(a => {
+          const col = Number(a.dataset.sort);
+          a.dataset.arrow = state.sort === col ? (state.desc ? '▼' : '▲') : '';
+          a.textContent = a.textContent.replace(/ [▲▼]$/, '') + (a.dataset.arrow ? ' ' + a.dataset.arrow : '');
+        });
+        history.replaceState(null, '', '?' + params);
+      })
+      .catch(() => {});
+  }
+
+  function later() {
+    clearTimeout(timer);
+    timer = setTimeout(() => { state.page = 1; load(); }, 200);
+  }
+
+  if (search) search.addEventListener('input', () => { state.q = search.value; later(); });
+  table.querySelectorAll('[data-col]').forEach(input => {
+    input.addEventListener('input', () => { state.filters[input.dataset.col] = input.value; later(); });
+  });
+  table.querySelectorAll('[data-sort]').forEach(a => {
+    a.addEventListener('click', e => {
+      e.preventDefault();
+      const col = Number(a.dataset.sort);
+      state.desc = state.sort === col ? !state.desc : false;
+      state.sort = col;
+      state.page = 1;
+      load();
+    });
+  });
+  pager.addEventListener('click', e => {
+    const btn = e.target.closest('[data-page]');
+    if (!btn || btn.disabled) return;
+    state.page = Number(btn.dataset.page);
+    load();
+  });
+}
@@ -0,0 +1,136 @@
+"""Ba bộ suy diễn (tiến, lùi, biên dịch) phải chọn cùng một tập quốc gia.
+
+Chạy: python -m pytest -q
+"""
+
+import itertools
+from typing import Any, Dict, List
+
+import pytest
+
+from web_app import (
+    LIVE_RULES,
+    WORK_RULES,
+    build_country_table,
+    select_indices,
+    start_rule_trace,
+    term_id,
+)
+
+# Tập quốc gia mẫu theo đúng dạng của load_country_details (chữ thường, ô trống bị bỏ):
+# header EN lẫn VI, giá trị EN / VI, ô trống và giá trị lạ không có trong từ vựng
+COUNTRIES: Dict[str, Dict[str, str]] = {
+    "alpha": {
+        "average weather": "cold",
+        "type of government": "democracy",
+        "major religion": "christianity",
+        "field domain": "technology",
+        "trade type": "import",
+    },
+    "beta": {
+        "khí hậu trung bình": "lạnh",
+        "hình thức chính phủ": "dân chủ",
+        "tôn giáo chính": "thiên chúa giáo",
+        "lĩnh vực": "công nghệ",
+        "loại thương mại": "xuất khẩu",
+    },
+    "gamma": {
+        "average weather": "hot",
+        "type of government": "monarchy",
+        "major religion": "islam",
+        "field domain": "tourism",
+        "trade type": "export",
+    },
+    "delta": {"type of government": "democracy"},
+    "epsilon": {
+        "average weather": "tundra",
+        "type of government": "republic",
+        "major religion": "buddhism",
+        "field domain": "mining",
+        "trade type": "import",
+    },
+    "zeta": {
+        "khí hậu trung bình": "nóng",
+        "hình thức chính phủ": "quân chủ",
+        "tôn giáo chính": "hồi giáo",
+        "lĩnh vực": "du lịch",
+        "loại thương mại": "nhập khẩu",
+    },
+}
+
+LIVE_INPUTS = {
+    "climate": ["", "cold", "Nóng", "tundra", "xyz"],
+    "government": ["", "democracy", "Quân chủ", "republic"],
+    "religion": ["", "christianity", "Hồi giáo", "buddhism"],
+}
+WORK_INPUTS = {
+    "mode": ["business", "job"],
+    "trade": ["", "import", "Xuất khẩu", "zz"],
+    "domain": ["", "technology", "du lịch", "mining"],
+}
+
+
+@pytest.fixture(scope="module")
+def table() -> Dict[str, Any]:
+    return build_country_table({name: dict(info) for name, info in COUNTRIES.items()})
+
+
+def _contexts(inputs: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    contexts = []
+    for values in itertools.product(*inputs.values()):
+        raw = dict(zip(inputs, values))
+        contexts.append({key: value if key == "mode" else term_id(key, value) for key, value in raw.items()})
+    return contexts
+
+
+def _names(table: Dict[str, Any], indices: List[int]) -> List[str]:
+    return [table["names"][i] for i in indices]
+
+
+@pytest.mark.parametrize("advisor, inputs", [("live", LIVE_INPUTS), ("work", WORK_INPUTS)])
+@pytest.mark.parametrize("inference", ["backward", "compiled"])
+def test_engines_match_forward_chaining(table, advisor, inputs, inference):
+    n = len(table["names"])
+    for context in _contexts(inputs):
+        for start, stop in ((0, n), (1, n - 1)):
+            expected = select_indices(table, context, "rules", advisor, start, stop)
+            assert select_indices(table, context, inference, advisor, start, stop) == expected, context
+
+
+@pytest.mark.parametrize("advisor, inputs", [("live", LIVE_INPUTS), ("work", WORK_INPUTS)])
+@pytest.mark.parametrize("inference", ["rules", "backward", "compiled"])
+def test_traced_selection_matches_untraced(table, advisor, inputs, inference):
+    n = len(table["names"])
+    for context in _contexts(inputs):
+        trace = start_rule_trace(advisor, inference, context)
+        traced = select_indices(table, context, inference, advisor, 0, n, trace)
+        assert traced == select_indices(table, context, inference, advisor, 0, n), context
+
+
+@pytest.mark.parametrize("inference", ["rules", "backward", "compiled"])
+def test_known_selections(table, inference):
+    n = len(table["names"])
+    live = {"climate": term_id("climate", "lạnh"), "government": term_id("government", "democracy"),
+            "religion": term_id("religion", "christianity")}
+    assert _names(table, select_indices(table, live, inference, "live", 0, n)) == ["alpha", "beta"]
+
+    job = {"mode": "job", "trade": term_id("trade", ""), "domain": term_id("domain", "technology")}
+    assert _names(table, select_indices(table, job, inference, "work", 0, n)) == ["alpha", "beta"]
+
+    business = dict(job, mode="business", trade=term_id("trade", "import"))
+    assert _names(table, select_indices(table, business, inference, "work", 0, n)) == ["alpha"]
+
+    # Giá trị chỉ có trong dữ liệu vẫn so khớp được; ô trống không khớp với lựa chọn trống
+    odd = {"mode": "job", "trade": term_id("trade", ""), "domain": term_id("domain", "mining")}
+    assert _names(table, select_indices(table, odd, inference, "work", 0, n)) == ["epsilon"]
+    blank = dict(live, climate=term_id("climate", ""))
+    assert select_indices(table, blank, inference, "live", 0, n) == []
+
+
+@pytest.mark.parametrize("advisor, rules, inputs", [("live", LIVE_RULES, LIVE_INPUTS), ("work", WORK_RULES, WORK_INPUTS)])
+def test_rules_return_bool(table, advisor, rules, inputs):
+    for context in _contexts(inputs):
+        for name, info in zip(table["names"], table["infos"]):
+            facts: Dict[str, Any] = {}
+            for rule in rules:
+                assert isinstance(rule(name, info, context, facts), bool), (advisor, rule.__name__)
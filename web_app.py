@@ -1,14 +1,46 @@
 from __future__ import annotations
 
+import atexit
+import codecs
 import csv
+import gzip
+import hashlib
+import heapq
 import json
+import math
 import os
+import queue
+import re
+import struct
+import threading
+import time
+import unicodedata
 import zipfile
+import zlib
+from bisect import bisect_left, bisect_right
+from concurrent.futures.process import BrokenProcessPool
+from collections import Counter, deque
+from datetime import datetime, timezone
 from difflib import get_close_matches
-from typing import Any, Callable, Dict, List, Tuple
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Tuple
 from functools import wraps, lru_cache
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import (
+    Flask,
+    Response,
+    flash,
+    get_template_attribute,
+    has_request_context,
+    jsonify,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
+from markupsafe import Markup
 from werkzeug.security import check_password_hash, generate_password_hash
 
 try:
@@ -22,11 +54,168 @@ try:
 except ImportError:
     GoogleTranslator = None  # type: ignore[assignment]
 
+try:
+    # Nén brotli nếu có cài thư viện; nếu không chỉ dùng gzip
+    import brotli
+except ImportError:
+    brotli = None  # type: ignore[assignment]
+
 
 app = Flask(__name__)
 app.secret_key = "expert-system-demo"  # for flash messages only
 
 
+# ----------------------
+# Metrics (bộ đếm cho /metrics theo định dạng Prometheus)
+# ----------------------
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+METRIC_HELP: Dict[str, Tuple[str, str]] = {
+    # name: (type, help)
+    "vi_cache_lookups_total": ("counter", "Số lần gọi get_vi_key_val."),
+    "vi_cache_fallbacks_total": ("counter", "Số lần get_vi_key_val phải dùng lại tiếng Anh vì thiếu cache."),
+    "rule_engine_runs_total": ("counter", "Số lần chạy forward_chain_for_country."),
+    "rule_engine_iterations_total": ("counter", "Số vòng lặp điểm bất động trong forward_chain_for_country."),
+    "rule_engine_firings_total": ("counter", "Số lần một luật sinh ra sự kiện mới."),
+    "country_page_reads_total": ("counter", "Số lần đọc trang HTML quốc gia."),
+    "country_page_bytes_read_total": ("counter", "Tổng số byte đọc từ các trang HTML quốc gia."),
+    "country_page_store_bytes_read_total": ("counter", "Số byte đã nén đọc từ đĩa khi lấy trang trong countries.pack."),
+    "section_index_builds_total": ("counter", "Số lần parse trang để dựng chỉ mục mục (section_index/<mã>.idx)."),
+    "section_index_bytes_read_total": ("counter", "Số byte nội dung mục đọc từ file chỉ mục."),
+    "section_index_reloads_total": ("counter", "Số lần file chỉ mục bị thay trong lúc đọc và phải nạp lại."),
+    "rule_traces_total": ("counter", "Số request suy diễn đã ghi vết (theo advisor)."),
+    "section_matrix_builds_total": ("counter", "Số lần dựng lại ma trận mục dùng cho /compare."),
+    "csv_reads_total": ("counter", "Số lần đọc file CSV theo endpoint."),
+    "csv_writes_total": ("counter", "Số lần ghi file CSV theo endpoint."),
+    "parallel_inference_requests_total": ("counter", "Số request suy diễn chạy trên process pool."),
+    "parallel_inference_failures_total": (
+        "counter",
+        "Số request suy diễn song song lỗi và phải chạy tuần tự (reason=broken_pool: pool bị hỏng và được tạo lại).",
+    ),
+    "single_flight_leaders_total": ("counter", "Số lần single_flight thực sự chạy phép tính (theo loại khóa)."),
+    "single_flight_coalesced_total": ("counter", "Số request chờ và dùng chung kết quả của một phép tính đang chạy."),
+    "single_flight_timeouts_total": ("counter", "Số request hết thời gian chờ một phép tính đang chạy."),
+    "single_flight_errors_total": ("counter", "Số phép tính single_flight kết thúc bằng lỗi."),
+    "vi_translate_enqueued_total": ("counter", "Số mục thiếu bản dịch được đưa vào hàng đợi dịch nền."),
+    "vi_translate_dropped_total": ("counter", "Số mục thiếu bản dịch bị bỏ vì hàng đợi đầy."),
+    "vi_translate_done_total": ("counter", "Số mục được dịch nền và ghi vào SEARCH_VI_CACHE."),
+    "vi_translate_errors_total": ("counter", "Số lần dịch nền bị lỗi (sẽ thử lại sau)."),
+}
+
+_METRICS: Dict[MetricKey, float] = {}
+_METRICS_LOCK = threading.Lock()
+
+
+def _current_endpoint() -> str:
+    if has_request_context():
+        return request.endpoint or "unknown"
+    return "none"
+
+
+def inc_metric(name: str, amount: float = 1, **labels: str) -> None:
+    """Tăng bộ đếm `name` (có nhãn) một lượng `amount`, an toàn giữa các thread."""
+    key: MetricKey = (name, tuple(sorted(labels.items())))
+    with _METRICS_LOCK:
+        _METRICS[key] = _METRICS.get(key, 0) + amount
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_metrics() -> str:
+    """Xuất toàn bộ bộ đếm theo định dạng text của Prometheus."""
+    with _METRICS_LOCK:
+        snapshot = dict(_METRICS)
+
+    info = translate_en_vi.cache_info()
+    samples: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], float]]] = {
+        "translate_cache_hits_total": [((), info.hits)],
+        "translate_cache_misses_total": [((), info.misses)],
+        "translate_cache_size": [((), info.currsize)],
+        "vi_translate_queue_size": [((), _VI_MISSES.qsize())],
+    }
+    helps: Dict[str, Tuple[str, str]] = {
+        "translate_cache_hits_total": ("counter", "Số lần translate_en_vi trúng lru_cache."),
+        "translate_cache_misses_total": ("counter", "Số lần translate_en_vi trượt lru_cache."),
+        "translate_cache_size": ("gauge", "Số mục hiện có trong lru_cache của translate_en_vi."),
+        "vi_cache_fallback_ratio": ("gauge", "Tỉ lệ lượt gọi get_vi_key_val phải dùng lại tiếng Anh."),
+        "vi_translate_queue_size": ("gauge", "Số mục đang chờ dịch nền."),
+    }
+    helps.update(METRIC_HELP)
+
+    for (name, labels), value in snapshot.items():
+        samples.setdefault(name, []).append((labels, value))
+
+    lookups = sum(v for (n, _), v in snapshot.items() if n == "vi_cache_lookups_total")
+    fallbacks = sum(v for (n, _), v in snapshot.items() if n == "vi_cache_fallbacks_total")
+    samples["vi_cache_fallback_ratio"] = [((), fallbacks / lookups if lookups else 0.0)]
+
+    lines: List[str] = []
+    for name in sorted(samples):
+        mtype, help_text = helps.get(name, ("untyped", ""))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {mtype}")
+        for labels, value in sorted(samples[name]):
+            number = int(value) if float(value).is_integer() else value
+            lines.append(f"{name}{_format_labels(labels)} {number}")
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------
+# Single-flight: gộp các request đồng thời cùng tính một khóa (parse trang, dựng bảng dữ liệu)
+# ----------------------
+
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get("EXPERT_SINGLE_FLIGHT_TIMEOUT", "30"))
+_INFLIGHT: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def single_flight(key: Tuple[Any, ...], compute: Callable[[], Any], timeout: float | None = None) -> Any:
+    """Chạy compute() một lần cho mỗi khóa đang được tính; các luồng khác cùng khóa chờ và dùng chung kết quả.
+
+    - key[0] là loại khóa (nhãn metric), ví dụ ("country_page", code, stamp).
+    - Lỗi của phép tính được ném lại cho mọi luồng đang chờ; luồng chờ quá `timeout` giây nhận TimeoutError.
+    - Không giữ kết quả sau khi xong: lần gọi sau (không trùng thời điểm) sẽ tính lại.
+    """
+    with _INFLIGHT_LOCK:
+        call = _INFLIGHT.get(key)
+        leader = call is None
+        if leader:
+            call = {"done": threading.Event(), "result": None, "error": None}
+            _INFLIGHT[key] = call
+
+    kind = str(key[0])
+    if not leader:
+        inc_metric("single_flight_coalesced_total", kind=kind)
+        if not call["done"].wait(SINGLE_FLIGHT_TIMEOUT if timeout is None else timeout):
+            inc_metric("single_flight_timeouts_total", kind=kind)
+            raise TimeoutError(f"Timed out waiting for {kind}")
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+    inc_metric("single_flight_leaders_total", kind=kind)
+    try:
+        call["result"] = compute()
+    except BaseException as exc:
+        call["error"] = exc
+        inc_metric("single_flight_errors_total", kind=kind)
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+        call["done"].set()
+    return call["result"]
+
+
 # ----------------------
 # Translation helper cho bước dịch TRƯỚC (EN -> VI) dùng trong script pretranslate_search.py.
 # Ở runtime, web app CHỈ đọc từ cache search_vi_cache.json, không gọi dịch nữa.
@@ -59,8 +248,11 @@ def translate_en_vi(text: str | None) -> str:
 
 
 # Cache đã dịch sẵn cho phần tra cứu (được tạo bởi script pretranslate_search.py)
+SEARCH_VI_CACHE_PATH = "search_vi_cache.json"
+
+
 def _load_search_vi_cache() -> Dict[str, Dict[str, Dict[str, str]]]:
-    path = "search_vi_cache.json"
+    path = SEARCH_VI_CACHE_PATH
     if not os.path.exists(path):
         return {}
     try:
@@ -80,11 +272,178 @@ SEARCH_VI_CACHE: Dict[str, Dict[str, Dict[str, str]]] = _load_search_vi_cache()
 def get_vi_key_val(country_code: str, key_en: str, val_en: str) -> Tuple[str, str]:
     country = SEARCH_VI_CACHE.get(country_code.lower()) or {}
     entry = country.get(key_en) or {}
+    inc_metric("vi_cache_lookups_total")
+    if not entry.get("key_vi"):
+        inc_metric("vi_cache_fallbacks_total")
     key_vi = entry.get("key_vi") or key_en
     val_vi = entry.get("val_vi") or val_en
+    if not entry.get("key_vi") or (val_en and not entry.get("val_vi")):
+        enqueue_vi_miss(country_code, key_en, val_en)
     return key_vi, val_vi
 
 
+# ----------------------
+# Dịch nền cho các mục thiếu trong SEARCH_VI_CACHE: request không bao giờ chờ dịch
+# ----------------------
+
+VI_TRANSLATE_WORKERS = int(os.environ.get("EXPERT_TRANSLATE_WORKERS", "2"))
+VI_MISS_QUEUE_SIZE = int(os.environ.get("EXPERT_TRANSLATE_QUEUE_SIZE", "1000"))
+VI_FLUSH_INTERVAL = float(os.environ.get("EXPERT_VI_FLUSH_INTERVAL", "10"))
+VI_RETRY_AFTER = 300.0
+
+_VI_MISSES: "queue.Queue[Tuple[str, str, str]]" = queue.Queue(maxsize=VI_MISS_QUEUE_SIZE)
+_VI_PENDING: set = set()
+_VI_FAILED: Dict[Tuple[str, str], float] = {}
+_VI_CACHE_LOCK = threading.Lock()  # SEARCH_VI_CACHE, _VI_PENDING, _VI_FAILED, _VI_STATE
+_VI_FLUSH_LOCK = threading.Lock()  # chỉ một luồng ghi search_vi_cache.json tại một thời điểm
+_VI_WORKERS: List[threading.Thread] = []
+_VI_STATE: Dict[str, Any] = {"dirty": False, "flushed_at": 0.0}
+
+
+def google_translate_en_vi(text: str) -> str:
+    """Dịch qua Google (deep-translator); khác translate_en_vi ở chỗ ném lỗi để worker thử lại sau."""
+    if _translator_en_vi is None:
+        raise RuntimeError("deep-translator is not installed")
+    return _translator_en_vi.translate(text)  # type: ignore[call-arg]
+
+
+def stub_translate_en_vi(text: str) -> str:
+    """Bộ dịch giả, không cần mạng (dùng khi kiểm thử)."""
+    return f"[vi] {text}"
+
+
+VI_TRANSLATORS: Dict[str, Callable[[str], str] | None] = {
+    "google": google_translate_en_vi if GoogleTranslator is not None else None,
+    "stub": stub_translate_en_vi,
+    "off": None,
+}
+# Mặc định không dịch ở runtime (chỉ đọc cache); "google" phải được bật rõ ràng qua EXPERT_TRANSLATOR
+_vi_translator: Callable[[str], str] | None = VI_TRANSLATORS.get(os.environ.get("EXPERT_TRANSLATOR", "off"))
+
+
+def set_vi_translator(translator: Callable[[str], str] | None) -> None:
+    """Đổi bộ dịch dùng cho các mục thiếu (None = tắt dịch nền)."""
+    global _vi_translator
+    _vi_translator = translator
+
+
+def enqueue_vi_miss(country_code: str, key_en: str, val_en: str) -> None:
+    """Ghi nhận một mục thiếu bản dịch; không chặn, bỏ qua nếu hàng đợi đầy hoặc mục đã chờ/mới lỗi."""
+    if _vi_translator is None or not key_en:
+        return
+    item = (country_code.lower(), key_en)
+    with _VI_CACHE_LOCK:
+        failed_at = _VI_FAILED.get(item)
+        if item in _VI_PENDING or (failed_at is not None and time.monotonic() - failed_at < VI_RETRY_AFTER):
+            return
+        _VI_PENDING.add(item)
+    try:
+        _VI_MISSES.put_nowait((item[0], key_en, val_en))
+    except queue.Full:
+        with _VI_CACHE_LOCK:
+            _VI_PENDING.discard(item)
+        inc_metric("vi_translate_dropped_total")
+        return
+    inc_metric("vi_translate_enqueued_total")
+    if len(_VI_WORKERS) < VI_TRANSLATE_WORKERS:
+        _start_vi_workers()
+
+
+def _start_vi_workers() -> None:
+    with _VI_CACHE_LOCK:
+        while len(_VI_WORKERS) < VI_TRANSLATE_WORKERS:
+            worker = threading.Thread(target=_vi_worker, name=f"vi-translate-{len(_VI_WORKERS)}", daemon=True)
+            _VI_WORKERS.append(worker)
+            worker.start()
+
+
+def _vi_worker() -> None:
+    while True:
+        try:
+            country_code, key_en, val_en = _VI_MISSES.get(timeout=VI_FLUSH_INTERVAL)
+        except queue.Empty:
+            flush_vi_cache()
+            continue
+        item = (country_code, key_en)
+        failed = False
+        try:
+            translate_vi_miss(country_code, key_en, val_en)
+        except Exception:
+            failed = True
+            inc_metric("vi_translate_errors_total")
+        finally:
+            with _VI_CACHE_LOCK:
+                if failed:
+                    _VI_FAILED[item] = time.monotonic()
+                else:
+                    _VI_FAILED.pop(item, None)
+                _VI_PENDING.discard(item)
+            _VI_MISSES.task_done()
+        # Mỗi lần ghi là ghi lại toàn bộ file: tối đa một lần mỗi VI_FLUSH_INTERVAL giây; phần còn lại
+        # được ghi khi hàng đợi rảnh (timeout của get ở trên) hoặc khi thoát
+        if time.monotonic() - _VI_STATE["flushed_at"] >= VI_FLUSH_INTERVAL:
+            flush_vi_cache()
+
+
+def translate_vi_miss(country_code: str, key_en: str, val_en: str) -> None:
+    """Dịch phần còn thiếu của một mục và đưa vào SEARCH_VI_CACHE (request sau thấy ngay)."""
+    translator = _vi_translator
+    if translator is None:
+        return
+    entry = dict((SEARCH_VI_CACHE.get(country_code) or {}).get(key_en) or {})
+    if not entry.get("key_vi"):
+        entry["key_vi"] = translator(key_en)
+    if val_en and not entry.get("val_vi"):
+        entry["val_vi"] = translator(val_en) if len(val_en) <= 4000 else val_en
+    with _VI_CACHE_LOCK:
+        SEARCH_VI_CACHE.setdefault(country_code, {})[key_en] = entry
+        _VI_STATE["dirty"] = True
+    inc_metric("vi_translate_done_total")
+
+
+def _merge_vi_entries(
+    base: Dict[str, Dict[str, Dict[str, str]]], extra: Dict[str, Dict[str, Dict[str, str]]]
+) -> Dict[str, Dict[str, Dict[str, str]]]:
+    """Gộp hai bản cache: giá trị đã có trong `base` được giữ, `extra` chỉ lấp các trường còn trống."""
+    merged = {country: dict(entries) for country, entries in base.items()}
+    for country, entries in extra.items():
+        target = merged.setdefault(country, {})
+        for key_en, entry in entries.items():
+            current = target.get(key_en) or {}
+            target[key_en] = {**entry, **{field: value for field, value in current.items() if value}}
+    return merged
+
+
+def flush_vi_cache() -> None:
+    """Ghi SEARCH_VI_CACHE ra search_vi_cache.json (file tạm + os.replace) nếu có thay đổi.
+
+    File trên đĩa được đọc lại và gộp trước khi ghi (bản dịch trên đĩa được ưu tiên), để không ghi
+    đè kết quả của pretranslate_search.py chạy cùng lúc; các mục mới trên đĩa cũng được nạp vào bộ nhớ.
+    """
+    with _VI_FLUSH_LOCK:
+        with _VI_CACHE_LOCK:
+            if not _VI_STATE["dirty"]:
+                return
+            snapshot = {country: dict(entries) for country, entries in SEARCH_VI_CACHE.items()}
+            _VI_STATE.update(dirty=False, flushed_at=time.monotonic())
+        merged = _merge_vi_entries(_load_search_vi_cache(), snapshot)
+        tmp = f"{SEARCH_VI_CACHE_PATH}.tmp-{os.getpid()}"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(merged, fh, ensure_ascii=False, indent=2)
+            os.replace(tmp, SEARCH_VI_CACHE_PATH)
+        except OSError:
+            with _VI_CACHE_LOCK:
+                _VI_STATE["dirty"] = True
+            raise
+        with _VI_CACHE_LOCK:
+            # Bản dịch mới trong bộ nhớ (sau snapshot) vẫn được giữ
+            SEARCH_VI_CACHE.update(_merge_vi_entries(merged, SEARCH_VI_CACHE))
+
+
+atexit.register(flush_vi_cache)
+
+
 USERS = {
     # username: {password_hash, role}
     # role: 'manager' can modify CSVs, 'user' can only view
@@ -181,64 +540,190 @@ PLACE_MAP = {
 PLACE_REV = {v: k for k, v in PLACE_MAP.items()}
 
 
+# ----------------------
+# Từ vựng phân loại: mọi cách viết (EN/VI) của một giá trị được intern thành một ID nguyên nhỏ
+# ----------------------
+
+# Thuộc tính -> (bảng EN -> VI, bảng VI -> EN); từ vựng được dựng từ các bảng này và vocabulary.json
+VOCAB_MAPS: Dict[str, Tuple[Dict[str, str], Dict[str, str]]] = {
+    "government": (GOV_MAP, GOV_REV),
+    "domain": (FIELD_MAP, FIELD_REV),
+    "religion": (RELIGION_MAP, RELIGION_REV),
+    "climate": (CLIMATE_MAP, CLIMATE_REV),
+    "trade": (TRADE_MAP, TRADE_REV),
+    "place": (PLACE_MAP, PLACE_REV),
+}
+
+# Thuộc tính -> (header EN, header VI) trong countries.csv / Tourism.csv
+VOCAB_FIELDS: Dict[str, Tuple[str, str]] = {
+    "government": ("type of government", "hình thức chính phủ"),
+    "domain": ("field domain", "lĩnh vực"),
+    "religion": ("major religion", "tôn giáo chính"),
+    "climate": ("average weather", "khí hậu trung bình"),
+    "trade": ("trade type", "loại thương mại"),
+    "place": ("type of place", "loại địa điểm"),
+}
+COLUMN_ATTRIBUTES: Dict[str, str] = {
+    header: attribute for attribute, headers in VOCAB_FIELDS.items() for header in headers
+}
+
+# File tùy chọn để mở rộng từ vựng: {"climate": {"arid": "khô hạn"}, ...}
+VOCAB_PATH = "vocabulary.json"
+EMPTY_ID = 0  # ô trống / không chọn (giá trị "falsy" như chuỗi rỗng trước đây)
+UNKNOWN_ID = -1  # giá trị người dùng nhập không có trong từ vựng: không khớp với dòng nào
+TERMS_KEY = "#terms"  # khóa trong dict info giữ ID đã intern của dòng
+
+# attribute -> {"ids": cách viết -> ID, "en": ID -> EN, "vi": ID -> VI (None nếu chỉ gặp trong dữ liệu)}
+VOCAB: Dict[str, Dict[str, Any]] = {}
+_VOCAB_LOCK = threading.Lock()
+
+
+def _vocab_entry(attribute: str) -> Dict[str, Any]:
+    entry = VOCAB.get(attribute)
+    if entry is None:
+        entry = VOCAB.setdefault(attribute, {"ids": {"": EMPTY_ID}, "en": [""], "vi": [""]})
+    return entry
+
+
+def add_term(attribute: str, en: str, vi: str) -> int:
+    """Thêm (hoặc đặt bản dịch cho) một giá trị phân loại; cả hai cách viết trỏ về cùng một ID.
+
+    - Cách viết rỗng (thiếu bản dịch trong vocabulary.json) bị bỏ qua: "" luôn là EMPTY_ID.
+    - Cách viết đã có ID thì giữ nguyên ID đó, không bị gán lại sang ID khác.
+    """
+    en, vi = _norm(en), _norm(vi)
+    spellings = [text for text in (en, vi) if text]
+    if not spellings:
+        return EMPTY_ID
+    with _VOCAB_LOCK:
+        entry = _vocab_entry(attribute)
+        term = next((entry["ids"][text] for text in spellings if text in entry["ids"]), None)
+        if term is None:
+            term = len(entry["en"])
+            entry["en"].append(en or vi)
+            entry["vi"].append(vi or en)
+        else:
+            if en:
+                entry["en"][term] = en
+            if vi or entry["vi"][term] is None:
+                entry["vi"][term] = vi or en
+        for text in spellings:
+            entry["ids"].setdefault(text, term)
+        if en and vi:
+            mapping, reverse = VOCAB_MAPS.setdefault(attribute, ({}, {}))
+            mapping[en] = vi
+            reverse[vi] = en
+    return term
+
+
+def load_vocabulary(path: str = VOCAB_PATH) -> None:
+    """Dựng từ vựng từ các bảng *_MAP, sau đó mở rộng bằng vocabulary.json nếu có."""
+    for attribute, (mapping, _) in list(VOCAB_MAPS.items()):
+        for en, vi in list(mapping.items()):
+            add_term(attribute, en, vi)
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return
+    for attribute, mapping in (data or {}).items():
+        for en, vi in (mapping or {}).items():
+            add_term(attribute, en, vi)
+
+
+def term_id(attribute: str, value: str | None) -> int:
+    """ID của một giá trị (EN hoặc VI, không phân biệt hoa thường); UNKNOWN_ID nếu chưa có trong từ vựng."""
+    term = _vocab_entry(attribute)["ids"].get(_norm(value))
+    return UNKNOWN_ID if term is None else term
+
+
+def intern_term(attribute: str, value: str | None) -> int:
+    """Như term_id, nhưng giá trị lạ (chỉ gặp trong dữ liệu) được cấp ID mới để so sánh bằng nhau vẫn đúng."""
+    v = _norm(value)
+    entry = _vocab_entry(attribute)
+    term = entry["ids"].get(v)
+    if term is None:
+        with _VOCAB_LOCK:
+            term = entry["ids"].get(v)
+            if term is None:
+                term = len(entry["en"])
+                entry["en"].append(v)
+                entry["vi"].append(None)
+                entry["ids"][v] = term
+    return term
+
+
+def is_known_term(attribute: str, term: int) -> bool:
+    """ID có bản dịch trong từ vựng (không phải giá trị lạ chỉ gặp trong dữ liệu hay ô trống)."""
+    return term > EMPTY_ID and _vocab_entry(attribute)["vi"][term] is not None
+
+
+def term_en(attribute: str, term: int) -> str:
+    entry = _vocab_entry(attribute)
+    return entry["en"][term] if 0 <= term < len(entry["en"]) else ""
+
+
+def term_vi(attribute: str, term: int) -> str:
+    """Cách viết tiếng Việt của ID (giá trị lạ thì trả lại chính nó)."""
+    entry = _vocab_entry(attribute)
+    if not 0 <= term < len(entry["en"]):
+        return ""
+    return entry["vi"][term] or entry["en"][term]
+
+
+def intern_info(info: Dict[str, Any]) -> Dict[str, int]:
+    """Intern các cột phân loại của một dòng dữ liệu một lần và lưu vào info[TERMS_KEY]."""
+    terms = {attribute: intern_term(attribute, get_field(info, en, vi)) for attribute, (en, vi) in VOCAB_FIELDS.items()}
+    info[TERMS_KEY] = terms
+    return terms
+
+
+def info_term(info: Dict[str, Any], attribute: str) -> int:
+    terms = info.get(TERMS_KEY)
+    if terms is None:
+        terms = intern_info(info)
+    return terms[attribute]
+
+
+def normalize_term(attribute: str, value: str | None) -> str:
+    """Chuẩn hóa về cách viết EN (giá trị lạ: chữ thường, bỏ khoảng trắng hai đầu)."""
+    term = term_id(attribute, value)
+    return term_en(attribute, term) if term != UNKNOWN_ID else _norm(value)
+
+
+load_vocabulary()
+
+
 # Chuẩn hóa giá trị hình thức chính phủ, chấp nhận cả EN và VI
 def normalize_government(value: str | None) -> str:
-    v = _norm(value)
-    if v in GOV_MAP:
-        return v
-    if v in GOV_REV:
-        return GOV_REV[v]
-    return v
+    return normalize_term("government", value)
 
 
 # Chuẩn hóa giá trị lĩnh vực kinh tế, chấp nhận cả EN và VI
 def normalize_field(value: str | None) -> str:
-    v = _norm(value)
-    if v in FIELD_MAP:
-        return v
-    if v in FIELD_REV:
-        return FIELD_REV[v]
-    return v
+    return normalize_term("domain", value)
 
 
 # Chuẩn hóa giá trị tôn giáo chính, chấp nhận cả EN và VI
 def normalize_religion(value: str | None) -> str:
-    v = _norm(value)
-    if v in RELIGION_MAP:
-        return v
-    if v in RELIGION_REV:
-        return RELIGION_REV[v]
-    return v
+    return normalize_term("religion", value)
 
 
 # Chuẩn hóa giá trị khí hậu trung bình, chấp nhận cả EN và VI
 def normalize_climate(value: str | None) -> str:
-    v = _norm(value)
-    if v in CLIMATE_MAP:
-        return v
-    if v in CLIMATE_REV:
-        return CLIMATE_REV[v]
-    return v
+    return normalize_term("climate", value)
 
 
 # Chuẩn hóa loại thương mại (import/export), chấp nhận cả EN và VI
 def normalize_trade(value: str | None) -> str:
-    v = _norm(value)
-    if v in TRADE_MAP:
-        return v
-    if v in TRADE_REV:
-        return TRADE_REV[v]
-    return v
+    return normalize_term("trade", value)
 
 
 # Chuẩn hóa loại địa điểm du lịch (biển, sa mạc, lịch sử,...)
 def normalize_place_type(value: str | None) -> str:
-    v = _norm(value)
-    if v in PLACE_MAP:
-        return v
-    if v in PLACE_REV:
-        return PLACE_REV[v]
-    return v
+    return normalize_term("place", value)
 
 
 # Lấy giá trị từ dict, ưu tiên header EN rồi đến header VI
@@ -248,32 +733,55 @@ def get_field(info: Dict[str, str], en: str, vi: str) -> str:
 
 CountryFacts = Dict[str, Any]
 Rule = Callable[[str, Dict[str, str], Dict[str, Any], CountryFacts], bool]
+# Bộ đếm cục bộ của bộ suy diễn: (tên metric, tên luật hoặc "") -> số lần; cộng vào metric một lần mỗi request
+EngineCounts = Counter[Tuple[str, str]]
 
 
 # Suy diễn tiến trên một quốc gia với tập luật cho trước
 def forward_chain_for_country(
-    name: str, info: Dict[str, str], context: Dict[str, Any], rules: List[Rule]
+    name: str,
+    info: Dict[str, str],
+    context: Dict[str, Any],
+    rules: List[Rule],
+    counts: EngineCounts | None = None,
 ) -> CountryFacts:
     """Áp dụng các luật suy diễn tiến cho một quốc gia.
 
     - facts: tập các sự kiện đã suy ra cho quốc gia đó.
     - Mỗi rule() trả về True nếu tạo ra sự kiện mới, cho phép vòng lặp tiếp tục.
+    - counts: nếu có, số lần kích hoạt / số vòng lặp được cộng vào đây (xem record_engine_counts).
     """
     facts: CountryFacts = {}
+    iterations = 0
     changed = True
     while changed:
         changed = False
+        iterations += 1
         for rule in rules:
             if rule(name, info, context, facts):
                 changed = True
+                if counts is not None:
+                    counts[("rule_engine_firings_total", rule.__name__)] += 1
+    if counts is not None:
+        counts[("rule_engine_runs_total", "")] += 1
+        counts[("rule_engine_iterations_total", "")] += iterations
     return facts
 
 
+def record_engine_counts(counts: EngineCounts) -> None:
+    """Cộng bộ đếm cục bộ của bộ suy diễn vào metric (mỗi khóa một lần inc_metric)."""
+    for (metric, rule), amount in counts.items():
+        if rule:
+            inc_metric(metric, amount, rule=rule)
+        else:
+            inc_metric(metric, amount)
+
+
 # Luật: kiểm tra khớp khí hậu giữa mong muốn và quốc gia
 def rule_live_climate(name: str, info: Dict[str, str], ctx: Dict[str, Any], facts: CountryFacts) -> bool:
     if facts.get("climate_match") or not ctx.get("climate"):
         return False
-    info_climate = normalize_climate(get_field(info, "average weather", "khí hậu trung bình"))
+    info_climate = info_term(info, "climate")
     if info_climate == ctx["climate"]:
         facts["climate_match"] = True
         return True
@@ -284,7 +792,7 @@ def rule_live_climate(name: str, info: Dict[str, str], ctx: Dict[str, Any], fact
 def rule_live_government(name: str, info: Dict[str, str], ctx: Dict[str, Any], facts: CountryFacts) -> bool:
     if facts.get("gov_match") or not ctx.get("government"):
         return False
-    info_gov = normalize_government(get_field(info, "type of government", "hình thức chính phủ"))
+    info_gov = info_term(info, "government")
     if info_gov == ctx["government"]:
         facts["gov_match"] = True
         return True
@@ -295,7 +803,7 @@ def rule_live_government(name: str, info: Dict[str, str], ctx: Dict[str, Any], f
 def rule_live_religion(name: str, info: Dict[str, str], ctx: Dict[str, Any], facts: CountryFacts) -> bool:
     if facts.get("religion_match") or not ctx.get("religion"):
         return False
-    info_rel = normalize_religion(get_field(info, "major religion", "tôn giáo chính"))
+    info_rel = info_term(info, "religion")
     if info_rel == ctx["religion"]:
         facts["religion_match"] = True
         return True
@@ -325,15 +833,18 @@ LIVE_RULES: List[Rule] = [
 def rule_work_field(name: str, info: Dict[str, str], ctx: Dict[str, Any], facts: CountryFacts) -> bool:
     if facts.get("field_match") or not ctx.get("domain"):
         return False
-    info_field = normalize_field(get_field(info, "field domain", "lĩnh vực"))
+    info_field = info_term(info, "domain")
     if info_field == ctx["domain"]:
         facts["field_match"] = True
         return True
+    return False
+
+
 # Luật: kiểm tra loại thương mại khi chọn chế độ business
 def rule_work_trade(name: str, info: Dict[str, str], ctx: Dict[str, Any], facts: CountryFacts) -> bool:
     if ctx.get("mode") != "business" or facts.get("trade_match") or not ctx.get("trade"):
         return False
-    info_trade = normalize_trade(get_field(info, "trade type", "loại thương mại"))
+    info_trade = info_term(info, "trade")
     if info_trade == ctx["trade"]:
         facts["trade_match"] = True
         return True
@@ -364,17 +875,687 @@ WORK_RULES: List[Rule] = [
     rule_work_selected,
 ]
 
+
+# ----------------------
+# Suy diễn lùi: bắt đầu từ mục tiêu "selected", chỉ chứng minh các mục tiêu con cần thiết
+# ----------------------
+
+GoalPlan = Dict[str, List[str]]
+
+# Sự kiện lá -> luật suy diễn tiến sinh ra sự kiện đó (dùng lại làm hàm chứng minh)
+LIVE_PROVERS: Dict[str, Rule] = {
+    "climate_match": rule_live_climate,
+    "gov_match": rule_live_government,
+    "religion_match": rule_live_religion,
+}
+WORK_PROVERS: Dict[str, Rule] = {
+    "field_match": rule_work_field,
+    "trade_match": rule_work_trade,
+}
+
+# Sự kiện lá -> (cột phân loại trong bảng quốc gia, khóa tương ứng trong context)
+FACT_ATTRIBUTES: Dict[str, Tuple[str, str]] = {
+    "climate_match": ("climate", "climate"),
+    "gov_match": ("government", "government"),
+    "religion_match": ("religion", "religion"),
+    "field_match": ("domain", "domain"),
+    "trade_match": ("trade", "trade"),
+}
+
+
+def live_goals(ctx: Dict[str, Any]) -> GoalPlan:
+    return {"selected": ["climate_match", "gov_match", "religion_match"]}
+
+
+def work_goals(ctx: Dict[str, Any]) -> GoalPlan:
+    # Business cần cả lĩnh vực và loại thương mại; job chỉ cần lĩnh vực
+    if ctx.get("mode") == "business":
+        return {"selected": ["field_match", "trade_match"]}
+    return {"selected": ["field_match"]}
+
+
+def order_by_selectivity(plan: GoalPlan, ctx: Dict[str, Any], freq: Dict[str, Dict[int, int]]) -> GoalPlan:
+    """Sắp xếp điều kiện con theo tần suất giá trị mong muốn (ít gặp nhất kiểm tra trước)."""
+
+    def frequency(fact: str) -> int:
+        attr = FACT_ATTRIBUTES.get(fact)
+        if not attr:
+            return 0
+        column, key = attr
+        return freq.get(column, {}).get(ctx.get(key) or EMPTY_ID, 0)
+
+    return {goal: sorted(subgoals, key=frequency) for goal, subgoals in plan.items()}
+
+
+def prove_goal(
+    goal: str,
+    name: str,
+    info: Dict[str, str],
+    context: Dict[str, Any],
+    facts: CountryFacts,
+    plan: GoalPlan,
+    provers: Dict[str, Rule],
+) -> bool:
+    """Chứng minh `goal` cho một quốc gia; dừng ngay ở điều kiện con đầu tiên thất bại."""
+    if facts.get(goal):
+        return True
+    subgoals = plan.get(goal)
+    if subgoals is not None:
+        for sub in subgoals:
+            if not prove_goal(sub, name, info, context, facts, plan, provers):
+                return False
+        facts[goal] = True
+        return True
+    rule = provers.get(goal)
+    if rule is None:
+        return False
+    rule(name, info, context, facts)
+    return bool(facts.get(goal))
+
+
+def backward_chain_for_country(
+    name: str,
+    info: Dict[str, str],
+    context: Dict[str, Any],
+    plan: GoalPlan,
+    provers: Dict[str, Rule],
+    goal: str = "selected",
+) -> CountryFacts:
+    """Suy diễn lùi cho một quốc gia; trả về các sự kiện đã chứng minh (giống forward_chain_for_country)."""
+    facts: CountryFacts = {}
+    prove_goal(goal, name, info, context, facts, plan, provers)
+    return facts
+
+
+# ----------------------
+# Biên dịch luật: sinh một hàm Python thẳng (không vòng lặp, không dict) cho mỗi dạng context
+# ----------------------
+
+CompiledPredicate = Callable[[Tuple[int, ...]], bool]
+
+# Thứ tự cột trong mỗi dòng đã chuẩn hóa (bảng quốc gia, khóa "rows")
+ROW_COLUMNS: List[str] = ["climate", "government", "religion", "domain", "trade"]
+
+_COMPILED_CACHE: Dict[Tuple[Any, ...], Callable[..., CompiledPredicate]] = {}
+_COMPILED_LOCK = threading.Lock()
+
+
+def _compile_factory(conditions: List[Tuple[str, bool]]) -> Callable[..., CompiledPredicate]:
+    """Sinh mã cho một dạng context: conditions = [(cột, có giá trị mong muốn hay không), ...]."""
+    if not all(present for _, present in conditions):
+        # Thiếu giá trị mong muốn: luật khớp không bao giờ kích hoạt nên "selected" luôn sai
+        body = "False"
+        params: List[str] = []
+    else:
+        params = [f"c{i}" for i in range(len(conditions))]
+        tests = [f"row[{ROW_COLUMNS.index(column)}] == {param}" for (column, _), param in zip(conditions, params)]
+        body = " and ".join(tests) if tests else "True"
+    source = (
+        f"def factory({', '.join(params)}):\n"
+        f"    def predicate(row):\n"
+        f"        return {body}\n"
+        f"    return predicate\n"
+    )
+    namespace: Dict[str, Any] = {}
+    exec(compile(source, "<compiled-rules>", "exec"), namespace)
+    factory = namespace["factory"]
+    factory.source = source  # type: ignore[attr-defined]
+    return factory
+
+
+def compile_rules(
+    goals: Callable[[Dict[str, Any]], GoalPlan],
+    context: Dict[str, Any],
+    freq: Dict[str, Dict[int, int]] | None = None,
+    goal: str = "selected",
+    advisor: str | None = None,
+) -> CompiledPredicate:
+    """Biên dịch tập luật (dạng mục tiêu) + context cố định thành predicate trên dòng đã chuẩn hóa.
+
+    - Mã sinh ra được cache theo dạng context (tập luật, thứ tự cột, cột nào có giá trị),
+      giá trị cụ thể được truyền vào qua tham số của factory.
+    - Nếu có freq thì điều kiện được sắp theo độ chọn lọc như suy diễn lùi (theo RULE_ORDER khi biết advisor).
+    """
+    plan = goals(context)
+    if freq is not None:
+        plan = order_conditions(plan, context, freq, advisor) if advisor else order_by_selectivity(plan, context, freq)
+    attrs = [FACT_ATTRIBUTES[fact] for fact in plan[goal]]
+    conditions = [(column, bool(context.get(key))) for column, key in attrs]
+    shape = (goals.__name__, goal, tuple(conditions))
+    factory = _COMPILED_CACHE.get(shape)
+    if factory is None:
+        with _COMPILED_LOCK:
+            factory = _COMPILED_CACHE.get(shape)
+            if factory is None:
+                factory = _compile_factory(conditions)
+                _COMPILED_CACHE[shape] = factory
+    if not all(present for _, present in conditions):
+        return factory()
+    return factory(*[context[key] for _, key in attrs])
+
+
+# Bộ luật của từng loại tư vấn: advisor -> (luật suy diễn tiến, kế hoạch mục tiêu, hàm chứng minh)
+ADVISOR_RULESETS: Dict[str, Tuple[List[Rule], Callable[[Dict[str, Any]], GoalPlan], Dict[str, Rule]]] = {
+    "live": (LIVE_RULES, live_goals, LIVE_PROVERS),
+    "work": (WORK_RULES, work_goals, WORK_PROVERS),
+}
+
+
+def select_indices(
+    table: Dict[str, Any],
+    context: Dict[str, Any],
+    inference: str,
+    advisor: str,
+    start: int,
+    stop: int,
+    trace: Dict[str, Any] | None = None,
+    counts: EngineCounts | None = None,
+) -> List[int]:
+    """Chỉ số các dòng trong [start, stop) của bảng quốc gia thỏa mục tiêu "selected".
+
+    - "backward": suy diễn lùi; "compiled": predicate sinh mã; mặc định: suy diễn tiến.
+    - trace: bản ghi vết (start_rule_trace) để ghi lại quá trình suy diễn của từng quốc gia.
+    - counts: bộ đếm cục bộ của suy diễn tiến (forward_chain_for_country).
+    """
+    if trace is not None:
+        return trace_select_indices(table, context, inference, advisor, start, stop, trace)
+    rules, goals, provers = ADVISOR_RULESETS[advisor]
+    names, infos = table["names"], table["infos"]
+    if inference == "compiled":
+        predicate = compile_rules(goals, context, table["freq"], advisor=advisor)
+        rows = table["rows"]
+        return [i for i in range(start, stop) if predicate(rows[i])]
+    if inference == "backward":
+        plan = order_conditions(goals(context), context, table["freq"], advisor)
+        return [
+            i
+            for i in range(start, stop)
+            if backward_chain_for_country(names[i], infos[i], context, plan, provers).get("selected")
+        ]
+    return [
+        i
+        for i in range(start, stop)
+        if forward_chain_for_country(names[i], infos[i], context, rules, counts).get("selected")
+    ]
+
+
+def select_countries(
+    table: Dict[str, Any], context: Dict[str, Any], inference: str, advisor: str, trace: Dict[str, Any] | None = None
+) -> List[int]:
+    """Chỉ số các quốc gia (trong bảng quốc gia) thỏa mục tiêu "selected" bằng bộ suy diễn được yêu cầu.
+
+    Khi bật PARALLEL_WORKERS và bảng đủ lớn, việc suy diễn được chia cho process pool.
+    Khi ghi vết (trace), suy diễn luôn chạy tuần tự trong process hiện tại rồi lưu vết vào vòng đệm.
+    Bộ đếm của bộ suy diễn (kể cả từ worker) được cộng vào metric một lần ở cuối request.
+    """
+    n = len(table["names"])
+    if trace is not None:
+        indices = select_indices(table, context, inference, advisor, 0, n, trace)
+        finish_rule_trace(trace)
+        return indices
+    counts: EngineCounts = Counter()
+    indices = None
+    if PARALLEL_WORKERS > 0 and n >= PARALLEL_MIN_ROWS:
+        indices = parallel_select_indices(table, context, inference, advisor, counts)
+    if indices is None:
+        indices = select_indices(table, context, inference, advisor, 0, n, counts=counts)
+    record_engine_counts(counts)
+    return indices
+
+
+# ----------------------
+# Ghi vết suy diễn (tùy chọn): luật nào kích hoạt, điều kiện nào thất bại đầu tiên, số vòng lặp
+# ----------------------
+#
+# Khi không ghi vết, select_indices chạy đúng các vòng lặp ở trên (chỉ thêm một phép so sánh None mỗi
+# request). Khi ghi vết, mỗi quốc gia thành một bản ghi gọn (tên, số vòng, số lần đánh giá luật,
+# bitmask luật đã kích hoạt, chỉ số luật thất bại đầu tiên) trong vòng đệm của request; các request đã
+# ghi vết nằm trong vòng đệm RULE_TRACE_SIZE và thống kê theo luật được cộng dồn vào _RULE_STATS.
+
+RULE_TRACE_ALL = os.environ.get("EXPERT_RULE_TRACE", "0") == "1"  # ghi vết mọi request suy diễn theo luật
+RULE_TRACE_SIZE = int(os.environ.get("EXPERT_RULE_TRACE_SIZE", "50"))
+RULE_TRACE_COUNTRIES = int(os.environ.get("EXPERT_RULE_TRACE_COUNTRIES", "1000"))
+# "frequency": sắp điều kiện theo tần suất giá trị trong bảng; "stats": theo thống kê ghi vết (nếu đủ mẫu)
+RULE_ORDER = os.environ.get("EXPERT_RULE_ORDER", "frequency")
+RULE_STATS_MIN_SAMPLES = 200
+
+# Thống kê của một luật: [số quốc gia đã xét, số lần đánh giá, số lần kích hoạt, số lần thất bại đầu tiên, thời gian ns]
+RuleStats = List[int]
+TraceRecord = Tuple[str, int, int, int, int]
+
+_RULE_TRACES: "deque[Dict[str, Any]]" = deque(maxlen=RULE_TRACE_SIZE)
+_RULE_STATS: Dict[Tuple[str, str], RuleStats] = {}
+_RULE_TRACE_LOCK = threading.Lock()
+_RULE_TRACE_STATE: Dict[str, int] = {"next_id": 1}
+
+
+def start_rule_trace(advisor: str, inference: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Tạo bản ghi vết cho một request suy diễn (truyền vào select_countries)."""
+    rules = ADVISOR_RULESETS[advisor][0]
+    return {
+        "id": 0,
+        "advisor": advisor,
+        "inference": inference,
+        "context": {
+            key: term_en(key, value) if key in SCORE_CATEGORICAL and isinstance(value, int) else value
+            for key, value in context.items()
+        },
+        "rules": [rule.__name__ for rule in rules],
+        "stats": [[0, 0, 0, 0, 0] for _ in rules],
+        "records": deque(maxlen=RULE_TRACE_COUNTRIES),
+        "countries": 0,
+        "selected": 0,
+        "passes": 0,
+        "evaluations": 0,
+        "elapsed_ms": 0.0,
+        "created": time.time(),
+    }
+
+
+def _timed_rule(rule: Rule, stats: RuleStats) -> Rule:
+    def traced(name: str, info: Dict[str, str], ctx: Dict[str, Any], facts: CountryFacts) -> bool:
+        start = time.perf_counter_ns()
+        fired = rule(name, info, ctx, facts)
+        stats[1] += 1
+        stats[4] += time.perf_counter_ns() - start
+        if fired:
+            stats[2] += 1
+        return fired
+
+    return traced
+
+
+def trace_select_indices(
+    table: Dict[str, Any], context: Dict[str, Any], inference: str, advisor: str, start: int, stop: int,
+    trace: Dict[str, Any],
+) -> List[int]:
+    """Giống select_indices nhưng ghi vết từng quốc gia (chậm hơn; chỉ dùng khi bật ghi vết)."""
+    rules, goals, provers = ADVISOR_RULESETS[advisor]
+    names, infos = table["names"], table["infos"]
+    stats = trace["stats"]
+    position = {rule: bit for bit, rule in enumerate(rules)}
+    timed = [_timed_rule(rule, stats[bit]) for bit, rule in enumerate(rules)]
+    leaves = goals(context)["selected"]
+    if inference in ("backward", "compiled"):
+        leaves = order_conditions(goals(context), context, table["freq"], advisor)["selected"]
+    leaf_bits = [position[provers[fact]] for fact in leaves]
+    records = trace["records"]
+    selected: List[int] = []
+    began = time.perf_counter()
+
+    for i in range(start, stop):
+        name, info = names[i], infos[i]
+        facts: CountryFacts = {}
+        passes = evaluations = fired = 0
+        failed = -1
+        if inference == "compiled":
+            # Cùng thứ tự điều kiện với predicate sinh mã, dừng ở điều kiện đầu tiên sai
+            row = table["rows"][i]
+            passes = 1
+            for fact, bit in zip(leaves, leaf_bits):
+                column, key = FACT_ATTRIBUTES[fact]
+                t0 = time.perf_counter_ns()
+                ok = bool(context.get(key)) and row[ROW_COLUMNS.index(column)] == context[key]
+                stats[bit][1] += 1
+                stats[bit][4] += time.perf_counter_ns() - t0
+                stats[bit][0] += 1
+                evaluations += 1
+                if not ok:
+                    failed = bit
+                    break
+                stats[bit][2] += 1
+                fired |= 1 << bit
+                facts[fact] = True
+            else:
+                facts["selected"] = True
+        elif inference == "backward":
+            passes = 1
+            for fact, bit in zip(leaves, leaf_bits):
+                stats[bit][0] += 1
+                evaluations += 1
+                if timed[bit](name, info, context, facts):
+                    fired |= 1 << bit
+                if not facts.get(fact):
+                    failed = bit
+                    break
+            else:
+                facts["selected"] = True
+        else:
+            for bit in range(len(rules)):
+                stats[bit][0] += 1
+            changed = True
+            while changed:
+                changed = False
+                passes += 1
+                for bit, rule in enumerate(timed):
+                    evaluations += 1
+                    if rule(name, info, context, facts):
+                        changed = True
+                        fired |= 1 << bit
+            failed = next((bit for fact, bit in zip(leaves, leaf_bits) if not facts.get(fact)), -1)
+
+        if failed >= 0:
+            stats[failed][3] += 1
+        if facts.get("selected"):
+            selected.append(i)
+        records.append((name, passes, evaluations, fired, failed))
+        trace["countries"] += 1
+        trace["passes"] += passes
+        trace["evaluations"] += evaluations
+
+    trace["selected"] += len(selected)
+    trace["elapsed_ms"] += (time.perf_counter() - began) * 1000.0
+    return selected
+
+
+def finish_rule_trace(trace: Dict[str, Any]) -> Dict[str, Any]:
+    """Đưa bản ghi vết vào vòng đệm (gán id) và cộng thống kê theo luật."""
+    with _RULE_TRACE_LOCK:
+        trace["id"] = _RULE_TRACE_STATE["next_id"]
+        _RULE_TRACE_STATE["next_id"] += 1
+        _RULE_TRACES.append(trace)
+        for rule, stats in zip(trace["rules"], trace["stats"]):
+            total = _RULE_STATS.setdefault((trace["advisor"], rule), [0, 0, 0, 0, 0])
+            for k, value in enumerate(stats):
+                total[k] += value
+    inc_metric("rule_traces_total", advisor=trace["advisor"])
+    return trace
+
+
+def _rule_stats_view(rule: str, stats: RuleStats) -> Dict[str, Any]:
+    countries, evaluations, fired, first_failures, ns = stats
+    return {
+        "rule": rule,
+        "countries": countries,
+        "evaluations": evaluations,
+        "fired": fired,
+        "first_failures": first_failures,
+        "selectivity": round(fired / countries, 4) if countries else None,
+        "avg_ns": round(ns / evaluations) if evaluations else None,
+    }
+
+
+def rule_trace_view(trace: Dict[str, Any]) -> Dict[str, Any]:
+    """Dạng đọc được (template / JSON) của một bản ghi vết."""
+    rules = trace["rules"]
+    return {
+        "id": trace["id"],
+        "advisor": trace["advisor"],
+        "inference": trace["inference"],
+        "context": trace["context"],
+        "countries": trace["countries"],
+        "selected": trace["selected"],
+        "passes": trace["passes"],
+        "evaluations": trace["evaluations"],
+        "elapsed_ms": round(trace["elapsed_ms"], 3),
+        "created": datetime.fromtimestamp(trace["created"], tz=timezone.utc).isoformat(),
+        "rules": [_rule_stats_view(rule, stats) for rule, stats in zip(rules, trace["stats"])],
+        "records": [
+            {
+                "name": name,
+                "passes": passes,
+                "evaluations": evaluations,
+                "fired": [rule for bit, rule in enumerate(rules) if fired >> bit & 1],
+                "failed": rules[failed] if failed >= 0 else None,
+            }
+            for name, passes, evaluations, fired, failed in trace["records"]
+        ],
+    }
+
+
+def get_rule_trace(trace_id: int) -> Dict[str, Any] | None:
+    with _RULE_TRACE_LOCK:
+        return next((trace for trace in _RULE_TRACES if trace["id"] == trace_id), None)
+
+
+def rule_stats_snapshot() -> List[Dict[str, Any]]:
+    """Thống kê cộng dồn theo (advisor, luật): độ chọn lọc (tỉ lệ kích hoạt) và chi phí trung bình."""
+    with _RULE_TRACE_LOCK:
+        items = sorted((key, list(stats)) for key, stats in _RULE_STATS.items())
+    return [dict(_rule_stats_view(rule, stats), advisor=advisor) for (advisor, rule), stats in items]
+
+
+def order_by_rule_stats(plan: GoalPlan, advisor: str) -> GoalPlan | None:
+    """Sắp xếp điều kiện con theo thống kê ghi vết: chi phí trung bình / tỉ lệ thất bại nhỏ nhất trước.
+
+    Thống kê cộng dồn qua mọi context nên chỉ là ước lượng trung bình; None nếu có điều kiện chưa đủ
+    RULE_STATS_MIN_SAMPLES mẫu.
+    """
+    provers = ADVISOR_RULESETS[advisor][2]
+    ranks: Dict[str, float] = {}
+    with _RULE_TRACE_LOCK:
+        for subgoals in plan.values():
+            for fact in subgoals:
+                stats = _RULE_STATS.get((advisor, provers[fact].__name__)) if fact in provers else None
+                if not stats or stats[0] < RULE_STATS_MIN_SAMPLES or not stats[1]:
+                    return None
+                fail_rate = 1.0 - stats[2] / stats[0]
+                ranks[fact] = (stats[4] / stats[1]) / max(fail_rate, 1e-6)
+    return {goal: sorted(subgoals, key=ranks.__getitem__) for goal, subgoals in plan.items()}
+
+
+def order_conditions(plan: GoalPlan, ctx: Dict[str, Any], freq: Dict[str, Dict[int, int]], advisor: str) -> GoalPlan:
+    """Thứ tự điều kiện cho suy diễn lùi / luật biên dịch theo RULE_ORDER."""
+    if RULE_ORDER == "stats":
+        ordered = order_by_rule_stats(plan, advisor)
+        if ordered is not None:
+            return ordered
+    return order_by_selectivity(plan, ctx, freq)
+
+
+# ----------------------
+# Suy diễn song song trên process pool (tùy chọn, cho cơ sở tri thức lớn)
+# ----------------------
+
+# Số process worker (0 = tắt) và số dòng tối thiểu để dùng song song
+PARALLEL_WORKERS = int(os.environ.get("EXPERT_PARALLEL_WORKERS", "0"))
+PARALLEL_MIN_ROWS = int(os.environ.get("EXPERT_PARALLEL_MIN_ROWS", "20000"))
+
+_PARALLEL_POOL: Any = None
+_PARALLEL_LOCK = threading.Lock()
+
+
+def _parallel_worker_init() -> None:
+    # Worker tự đọc và giữ bảng quốc gia; request chỉ gửi context và khoảng chỉ số
+    get_country_table()
+
+
+def _parallel_worker_select(
+    context: Dict[str, Any], inference: str, advisor: str, start: int, stop: int
+) -> Tuple[Tuple[int, int] | None, List[int], Dict[Tuple[str, str], int]]:
+    # Metric của worker không tự về process cha: bộ đếm cục bộ được trả về cùng kết quả
+    table = get_country_table()
+    # ID động của giá trị lạ khác nhau giữa các process: context được gửi bằng cách viết EN
+    context = {
+        key: term_id(key, value) if key in SCORE_CATEGORICAL and isinstance(value, str) else value
+        for key, value in context.items()
+    }
+    counts: EngineCounts = Counter()
+    indices = select_indices(table, context, inference, advisor, start, stop, counts=counts)
+    return table["stamp"], indices, dict(counts)
+
+
+def get_parallel_pool() -> Any:
+    global _PARALLEL_POOL
+    if _PARALLEL_POOL is None:
+        with _PARALLEL_LOCK:
+            if _PARALLEL_POOL is None:
+                from concurrent.futures import ProcessPoolExecutor
+
+                _PARALLEL_POOL = ProcessPoolExecutor(
+                    max_workers=PARALLEL_WORKERS, initializer=_parallel_worker_init
+                )
+                atexit.register(_PARALLEL_POOL.shutdown, wait=False, cancel_futures=True)
+    return _PARALLEL_POOL
+
+
+def reset_parallel_pool(pool: Any) -> None:
+    """Bỏ pool đã hỏng (worker chết) để request sau tạo pool mới thay vì luôn chạy tuần tự."""
+    global _PARALLEL_POOL
+    with _PARALLEL_LOCK:
+        if _PARALLEL_POOL is pool:
+            _PARALLEL_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def parallel_select_indices(
+    table: Dict[str, Any], context: Dict[str, Any], inference: str, advisor: str, counts: EngineCounts | None = None
+) -> List[int] | None:
+    """Chia bảng thành các khối, chạy select_indices trên process pool rồi ghép theo thứ tự.
+
+    - counts: bộ đếm cục bộ; bộ đếm của các worker chỉ được cộng vào khi mọi khối thành công.
+    - Trả về None (để chạy tuần tự) nếu worker đang giữ phiên bản dữ liệu khác hoặc pool lỗi.
+    """
+    stamp = table["stamp"]
+    n = len(table["names"])
+    chunk = max(1, -(-n // (PARALLEL_WORKERS * 4)))
+    context = {
+        key: term_en(key, value) if key in SCORE_CATEGORICAL and isinstance(value, int) and value > EMPTY_ID else value
+        for key, value in context.items()
+    }
+    pool = None
+    try:
+        pool = get_parallel_pool()
+        futures = [
+            pool.submit(_parallel_worker_select, context, inference, advisor, start, min(n, start + chunk))
+            for start in range(0, n, chunk)
+        ]
+        indices: List[int] = []
+        worker_counts: EngineCounts = Counter()
+        for future in futures:
+            worker_stamp, part, part_counts = future.result()
+            if worker_stamp != stamp:
+                return None
+            indices.extend(part)
+            worker_counts.update(part_counts)
+    except BrokenProcessPool as exc:
+        app.logger.error("Parallel inference pool is broken, recreating it and running serially: %s", exc)
+        inc_metric("parallel_inference_failures_total", advisor=advisor, reason="broken_pool")
+        if pool is not None:
+            reset_parallel_pool(pool)
+        return None
+    except Exception:
+        app.logger.exception("Parallel inference failed, running serially")
+        inc_metric("parallel_inference_failures_total", advisor=advisor, reason="error")
+        return None
+    if counts is not None:
+        counts.update(worker_counts)
+    inc_metric("parallel_inference_requests_total", advisor=advisor)
+    return indices
+
+
+# ----------------------
+# Suy diễn theo điểm: chấm điểm có trọng số và xếp hạng top-k
+# ----------------------
+
+# Tiêu chí phân loại (so sánh theo ID từ vựng, xem VOCAB_FIELDS)
+SCORE_CATEGORICAL: List[str] = ["climate", "government", "religion", "domain", "trade"]
+
+# Tiêu chí số: criterion -> (header EN, header VI)
+SCORE_NUMERIC: Dict[str, Tuple[str, str]] = {
+    "density": ("population density", "mật độ dân số"),
+    "gdp": ("gdp", "gdp"),
+    "import": ("import", "nhập khẩu"),
+    "export": ("export", "xuất khẩu"),
+}
+
+LIVE_SCORE_CRITERIA = ["climate", "government", "religion", "density"]
+WORK_SCORE_CRITERIA = ["domain", "trade", "gdp", "import", "export"]
+
+def _criterion_vector(table: Dict[str, Any], criterion: str, target: int | str) -> List[float] | None:
+    if criterion in SCORE_CATEGORICAL:
+        key = (criterion, target)
+        vec = table["match"].get(key)
+        if vec is None:
+            vec = [1.0 if v == target else 0.0 for v in table["cat"][criterion]]
+            table["match"][key] = vec
+        return vec
+    if criterion not in SCORE_NUMERIC:
+        return None
+    # Mục tiêu "high"/"low": dùng hạng phần trăm; mục tiêu là số: độ gần so với khoảng giá trị
+    if target == "high":
+        return [0.0 if p is None else p for p in table["pct"][criterion]]
+    if target == "low":
+        return [0.0 if p is None else 1.0 - p for p in table["pct"][criterion]]
+    goal = parse_number(target)
+    if goal is None:
+        return None
+    values = table["num"][criterion]
+    present = table["index"][criterion][0]
+    span = (present[-1] - present[0]) if present else 0.0
+    span = span or 1.0
+    return [0.0 if v is None else max(0.0, 1.0 - abs(v - goal) / span) for v in values]
+
+
+def rank_countries(
+    table: Dict[str, Any], context: Dict[str, Any], weights: Dict[str, float], k: int
+) -> List[Tuple[int, float]]:
+    """Chấm điểm mọi quốc gia theo từng cột rồi lấy top-k bằng heap.
+
+    - context: criterion -> giá trị mong muốn (đã chuẩn hóa; với tiêu chí số là "high", "low" hoặc một số).
+    - Trả về (chỉ số dòng, điểm) với điểm nằm trong [0, 1] (chia cho tổng trọng số).
+    """
+    n = len(table["names"])
+    totals = [0.0] * n
+    weight_sum = 0.0
+    for criterion, target in context.items():
+        weight = weights.get(criterion, 1.0)
+        if not target or weight <= 0:
+            continue
+        vec = _criterion_vector(table, criterion, target)
+        if vec is None:
+            continue
+        totals = [t + weight * s for t, s in zip(totals, vec)]
+        weight_sum += weight
+    if not weight_sum:
+        return []
+    top = heapq.nlargest(k, range(n), key=totals.__getitem__)
+    return [(i, totals[i] / weight_sum) for i in top if totals[i] > 0]
+
+
+SCORE_MAX_WEIGHT = 100.0
+SCORE_MAX_TOP_K = 500
+
+
+def parse_score_weights(form: Dict[str, str], criteria: List[str]) -> Dict[str, float]:
+    """Đọc trọng số w_<criterion> từ form; mặc định 1, giá trị âm/không hợp lệ (kể cả inf, nan) coi như 0/1.
+
+    Trọng số bị giới hạn trong [0, SCORE_MAX_WEIGHT] để tổng trọng số luôn hữu hạn.
+    """
+    weights: Dict[str, float] = {}
+    for criterion in criteria:
+        raw = (form.get(f"w_{criterion}") or "").strip()
+        try:
+            value = float(raw) if raw else 1.0
+        except ValueError:
+            value = 1.0
+        weights[criterion] = min(SCORE_MAX_WEIGHT, max(0.0, value)) if math.isfinite(value) else 1.0
+    return weights
+
+
+def parse_top_k(raw: str | None, default: int = 10) -> int:
+    """Số kết quả top-k trong [1, SCORE_MAX_TOP_K]."""
+    try:
+        return min(SCORE_MAX_TOP_K, max(1, int(raw or default)))
+    except ValueError:
+        return default
+
+
+def _numeric_pref(raw: str | None) -> str | None:
+    v = _norm(raw)
+    if v in {"high", "cao"}:
+        return "high"
+    if v in {"low", "thấp"}:
+        return "low"
+    return v if parse_number(v) is not None else None
+
+
 # Tạo câu mô tả tóm tắt về một quốc gia để hiển thị cho người dùng
 def describe_country(name: str, info: Dict[str, str]) -> str:
-    gov_en = normalize_government(get_field(info, "type of government", "hình thức chính phủ"))
-    field_en = normalize_field(get_field(info, "field domain", "lĩnh vực"))
-    rel_en = normalize_religion(get_field(info, "major religion", "tôn giáo chính"))
-    climate_en = normalize_climate(get_field(info, "average weather", "khí hậu trung bình"))
-
-    gov = GOV_MAP.get(gov_en, gov_en or "không rõ")
-    field = FIELD_MAP.get(field_en, field_en or "không rõ")
-    rel = RELIGION_MAP.get(rel_en, rel_en or "không rõ")
-    climate = CLIMATE_MAP.get(climate_en, climate_en or "không rõ")
+    gov = term_vi("government", info_term(info, "government")) or "không rõ"
+    field = term_vi("domain", info_term(info, "domain")) or "không rõ"
+    rel = term_vi("religion", info_term(info, "religion")) or "không rõ"
+    climate = term_vi("climate", info_term(info, "climate")) or "không rõ"
 
     density = get_field(info, "population density", "mật độ dân số")
     gdp = get_field(info, "gdp", "gdp")
@@ -408,8 +1589,10 @@ def describe_place(place: str, info: Dict[str, str], target_budget: float, selec
     else:
         label = "trên 60.000.000 VND"
 
-    place_type_en = normalize_place_type(get_field(info, "type of place", "loại địa điểm") or selected_type)
-    place_type_vi = PLACE_MAP.get(place_type_en, place_type_en or "điểm tham quan")
+    place_term = info_term(info, "place") or term_id("place", selected_type)
+    place_type_vi = (
+        term_vi("place", place_term) if place_term != UNKNOWN_ID else _norm(selected_type)
+    ) or "điểm tham quan"
 
     return (
         f"Với ngân sách {label} cho mỗi người và mong muốn trải nghiệm kiểu địa điểm {place_type_vi}, "
@@ -417,6 +1600,42 @@ def describe_place(place: str, info: Dict[str, str], target_budget: float, selec
     )
 
 
+# Câu mô tả được tạo một lần cho mỗi dòng của mỗi phiên bản dữ liệu và lưu trong bảng
+def country_summary(table: Dict[str, Any], i: int) -> str:
+    key = (i,)
+    text = table["summaries"].get(key)
+    if text is None:
+        text = describe_country(table["names"][i], table["infos"][i])
+        table["summaries"][key] = text
+    return text
+
+
+def place_summary(table: Dict[str, Any], i: int, target_budget: float, selected_type: str | None) -> str:
+    key = (i, target_budget, term_id("place", selected_type))
+    text = table["summaries"].get(key)
+    if text is None:
+        text = describe_place(table["names"][i], table["infos"][i], target_budget, selected_type)
+        table["summaries"][key] = text
+    return text
+
+
+def _carry_over_summaries(old: Dict[str, Any] | None, new: Dict[str, Any]) -> None:
+    """Giữ lại câu mô tả của các dòng không đổi khi bảng được dựng lại (ví dụ sau khi admin sửa CSV),
+    để chỉ các dòng bị thay đổi phải tạo lại."""
+    if not old or not old["summaries"]:
+        return
+    old_pos = {name: j for j, name in enumerate(old["names"])}
+    moved: Dict[int, int] = {}
+    for i, name in enumerate(new["names"]):
+        j = old_pos.get(name)
+        if j is not None and old["infos"][j] == new["infos"][i]:
+            moved[j] = i
+    for key, text in old["summaries"].items():
+        i = moved.get(key[0])
+        if i is not None:
+            new["summaries"][(i,) + key[1:]] = text
+
+
 # ----------------------
 # Data loading utilities
 # ----------------------
@@ -432,6 +1651,17 @@ def load_country_list() -> List[str]:
     return countries
 
 
+def load_country_codes() -> List[Tuple[str, str]]:
+    """Các cặp (mã file, tên) theo thứ tự trong countryList.txt."""
+    pairs: List[Tuple[str, str]] = []
+    with open("countryList.txt", "r", encoding="utf-8") as fh:
+        for line in fh:
+            name = line[3:].strip()
+            if name:
+                pairs.append((line[:2].lower(), name))
+    return pairs
+
+
 def code_for_country(target_country: str) -> str | None:
     with open("countryList.txt", "r", encoding="utf-8") as fh:
         for line in fh:
@@ -440,11 +1670,192 @@ def code_for_country(target_country: str) -> str | None:
     return None
 
 
-def parse_html_from_zip(country_code: str) -> Dict[str, str]:
+# ----------------------
+# Kho trang nén (countries.pack): mỗi trang nén zlib riêng với một từ điển dùng chung
+# ----------------------
+#
+# Bố cục file:
+#   PAGE_STORE_MAGIC | độ dài chỉ mục (4 byte, big-endian) | chỉ mục JSON | từ điển | các trang đã nén
+# Chỉ mục: {"strip": bool, "dictionary": [offset, length], "pages": {code: [offset, length, raw_length]}},
+# offset tính từ đầu phần dữ liệu (ngay sau chỉ mục).
+
+PAGE_STORE_PATH = "countries.pack"
+PAGE_STORE_MAGIC = b"EXPAGES1"
+PAGE_STORE_DICT_SIZE = 32 * 1024  # cửa sổ của deflate; phần từ điển dài hơn không được dùng tới
+
+# Phần parse_html không đọc tới: script, style, comment và mọi thuộc tính trừ class
+_PAGE_NOISE = re.compile(rb"<script\b.*?</script\s*>|<style\b.*?</style\s*>|<!--.*?-->", re.S | re.I)
+_PAGE_TAG = re.compile(rb"<([A-Za-z][\w:-]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>")
+_PAGE_CLASS = re.compile(rb"\sclass\s*=\s*(\"[^\"]*\"|'[^']*'|[^\s>]+)", re.I)
+_PAGE_GAP = re.compile(rb">\s+<")
+
+# path -> {"file": (inode, mtime, size), "index", "zdict", "base"}; được thay nguyên dict khi file đổi
+_PAGE_STORES: Dict[str, Dict[str, Any]] = {}
+_PAGE_STORE_LOCK = threading.Lock()
+
+
+def strip_page_boilerplate(data: bytes) -> bytes:
+    """Bỏ phần khung lặp lại của trang factbook; parse_html cho kết quả y hệt trang gốc.
+
+    - Khoảng trắng giữa hai thẻ được thu về một dấu xuống dòng (không xóa hẳn, vì số node con
+      của <tr> được parse_html dùng để nhận dạng bố cục).
+    """
+
+    def keep_class(match: "re.Match[bytes]") -> bytes:
+        attrs = match.group(2)
+        found = _PAGE_CLASS.search(attrs)
+        tail = b" /" if attrs.rstrip().endswith(b"/") else b""
+        return b"<" + match.group(1) + (b" class=" + found.group(1) if found else b"") + tail + b">"
+
+    data = _PAGE_NOISE.sub(b"", data)
+    data = _PAGE_TAG.sub(keep_class, data)
+    return _PAGE_GAP.sub(b">\n<", data)
+
+
+def train_page_dictionary(pages: Iterable[bytes], size: int = PAGE_STORE_DICT_SIZE) -> bytes:
+    """Từ điển dùng chung: các dòng xuất hiện ở nhiều trang, chọn theo (số trang * độ dài).
+
+    Dòng có giá trị cao nhất được đặt cuối từ điển (gần dữ liệu nhất, khoảng cách tham chiếu ngắn nhất).
+    """
+    seen: Counter = Counter()
+    for page in pages:
+        seen.update(set(page.splitlines(keepends=True)))
+    candidates = sorted(
+        ((count * len(line), line) for line, count in seen.items() if count > 1 and len(line.strip()) > 3),
+        reverse=True,
+    )
+    chosen: List[bytes] = []
+    total = 0
+    for _, line in candidates:
+        if total + len(line) <= size:
+            chosen.append(line)
+            total += len(line)
+    return b"".join(reversed(chosen))
+
+
+def write_page_store(src_dir: str, path: str = PAGE_STORE_PATH, strip: bool = True) -> Dict[str, Any]:
+    """Đóng gói countries/<code>.html thành một file kho trang (ghi file tạm rồi os.replace)."""
+    codes = sorted(name[:-5].lower() for name in os.listdir(src_dir) if name.endswith(".html"))
+
+    source_bytes = 0
+
+    def load(code: str) -> bytes:
+        nonlocal source_bytes
+        with open(os.path.join(src_dir, f"{code}.html"), "rb") as fh:
+            data = fh.read()
+        source_bytes += len(data)
+        return strip_page_boilerplate(data) if strip else data
+
+    zdict = train_page_dictionary(load(code) for code in codes)
+    source_bytes = 0
+    blobs: List[bytes] = []
+    sizes: List[int] = []
+    for code in codes:
+        data = load(code)
+        compressor = zlib.compressobj(9, zdict=zdict)
+        blobs.append(compressor.compress(data) + compressor.flush())
+        sizes.append(len(data))
+
+    pages: Dict[str, List[int]] = {}
+    offset = len(zdict)
+    for code, blob, size in zip(codes, blobs, sizes):
+        pages[code] = [offset, len(blob), size]
+        offset += len(blob)
+    index = json.dumps(
+        {"strip": strip, "dictionary": [0, len(zdict)], "pages": pages}, separators=(",", ":")
+    ).encode("utf-8")
+
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(tmp, "wb") as fh:
+            fh.write(PAGE_STORE_MAGIC + struct.pack(">I", len(index)) + index + zdict)
+            for blob in blobs:
+                fh.write(blob)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return {
+        "pages": len(codes),
+        "source_bytes": source_bytes,
+        "stripped_bytes": sum(sizes),
+        "packed_bytes": os.path.getsize(path),
+    }
+
+
+def _page_store_from(fh: Any, path: str) -> Dict[str, Any]:
+    """Chỉ mục và từ điển của kho trang đang mở `fh`; chỉ đọc lại khi file (inode, mtime, size) đã đổi.
+
+    build_page_store.py thay file bằng os.replace: đối chiếu theo file đã mở (fstat) chứ không theo
+    đường dẫn, nên chỉ mục cũ không bao giờ được dùng với dữ liệu của file mới.
+    """
+    identity = _file_identity(os.fstat(fh.fileno()))
+    store = _PAGE_STORES.get(path)
+    if store is not None and store["file"] == identity:
+        return store
+    with _PAGE_STORE_LOCK:
+        store = _PAGE_STORES.get(path)
+        if store is not None and store["file"] == identity:
+            return store
+        fh.seek(0)
+        if fh.read(len(PAGE_STORE_MAGIC)) != PAGE_STORE_MAGIC:
+            raise ValueError(f"{path} is not a page store")
+        (size,) = struct.unpack(">I", fh.read(4))
+        index = json.loads(fh.read(size).decode("utf-8"))
+        base = fh.tell()
+        offset, length = index["dictionary"]
+        fh.seek(base + offset)
+        zdict = fh.read(length)
+        store = {"file": identity, "index": index, "zdict": zdict, "base": base}
+        _PAGE_STORES[path] = store
+    return store
+
+
+def load_page_store(path: str = PAGE_STORE_PATH) -> Dict[str, Any]:
+    """Chỉ mục và từ điển của kho trang, giữ trong bộ nhớ và chỉ đọc lại khi file thay đổi."""
+    with open(path, "rb") as fh:
+        return _page_store_from(fh, path)
+
+
+def read_packed_page(country_code: str, path: str = PAGE_STORE_PATH) -> bytes:
+    """Đọc một trang từ kho trang: chỉ mục và phần đã nén được đọc từ cùng một lần mở file."""
+    with open(path, "rb") as fh:
+        store = _page_store_from(fh, path)
+        entry = store["index"]["pages"].get(country_code.lower())
+        if entry is None:
+            raise KeyError(f"There is no item named '{country_code}.html' in {path}")
+        offset, length, _ = entry
+        fh.seek(store["base"] + offset)
+        blob = fh.read(length)
+    inc_metric("country_page_store_bytes_read_total", len(blob), endpoint=_current_endpoint())
+    return zlib.decompressobj(zdict=store["zdict"]).decompress(blob)
+
+
+def read_country_page(country_code: str) -> bytes:
+    """Đọc nội dung HTML thô của một quốc gia.
+
+    - Ưu tiên kho trang countries.pack, sau đó countries.zip, cuối cùng là thư mục countries/.
+    """
     page = f"{country_code}.html"
-    with zipfile.ZipFile("countries.zip", "r") as archive:
-        with archive.open(page, "r") as html_file:
-            return parse_html(html_file)
+    if os.path.exists(PAGE_STORE_PATH):
+        data = read_packed_page(country_code)
+    elif os.path.exists("countries.zip"):
+        with zipfile.ZipFile("countries.zip", "r") as archive:
+            with archive.open(page, "r") as html_file:
+                data = html_file.read()
+    else:
+        with open(os.path.join("countries", page), "rb") as html_file:
+            data = html_file.read()
+    inc_metric("country_page_reads_total", endpoint=_current_endpoint())
+    inc_metric("country_page_bytes_read_total", len(data), endpoint=_current_endpoint())
+    return data
+
+
+def parse_html_from_zip(country_code: str) -> Dict[str, str]:
+    # Nhiều người tra cứu cùng một quốc gia cùng lúc chỉ đọc + parse trang một lần
+    key = ("country_page", country_code.lower(), _file_stamp(country_page_path(country_code)))
+    return dict(single_flight(key, lambda: parse_html(read_country_page(country_code))))
 
 
 def parse_html(html_file) -> Dict[str, str]:
@@ -508,10 +1919,337 @@ def format_key(key: str) -> str:
     return " ".join(temp)
 
 
-def load_country_details() -> Dict[str, Dict[str, str]]:
-    country_details: Dict[str, Dict[str, str]] = {}
-    rows: List[List[str]] = []
-    with open("countries.csv", "r", encoding="utf-8") as fh:
+# ----------------------
+# Chỉ mục mục (section) theo quốc gia: tiêu đề + vị trí nội dung, đọc từng mục mà không parse lại trang
+# ----------------------
+
+SECTION_INDEX_DIR = os.environ.get("EXPERT_SECTION_INDEX_DIR", "section_index")
+SECTION_INDEX_MAGIC = b"EXSECT01"
+SECTION_PREVIEW_CHARS = 120
+_SECTION_INDEXES: Dict[str, Dict[str, Any]] = {}
+
+
+def section_index_path(country_code: str) -> str:
+    return os.path.join(SECTION_INDEX_DIR, f"{country_code.lower()}.idx")
+
+
+def write_section_index(country_code: str, sections: Dict[str, str], source: List[int]) -> Dict[str, Any]:
+    """Ghi file chỉ mục của một quốc gia và trả về chỉ mục đã nạp.
+
+    Định dạng: magic, độ dài index (4 byte big-endian), index JSON
+    {"source": stamp trang gốc, "sections": [[tiêu đề EN, offset, độ dài], ...]}, rồi nội dung EN (UTF-8)
+    nối liền nhau; offset tính từ đầu phần nội dung. Không ghi được file (thư mục chỉ đọc) thì giữ
+    nội dung trong bộ nhớ.
+    """
+    entries: List[List[Any]] = []
+    bodies: List[bytes] = []
+    offset = 0
+    for key, value in sections.items():
+        data = value.encode("utf-8")
+        entries.append([key, offset, len(data)])
+        bodies.append(data)
+        offset += len(data)
+    header = json.dumps({"source": source, "sections": entries}, ensure_ascii=False).encode("utf-8")
+    blob = b"".join(bodies)
+    index: Dict[str, Any] = {
+        "path": section_index_path(country_code),
+        "source": source,
+        "base": len(SECTION_INDEX_MAGIC) + 4 + len(header),
+        "sections": {key: (start, length) for key, start, length in entries},
+        "data": None,
+        "file": None,
+    }
+    try:
+        os.makedirs(SECTION_INDEX_DIR, exist_ok=True)
+        tmp = f"{index['path']}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp, "wb") as fh:
+            fh.write(SECTION_INDEX_MAGIC + struct.pack(">I", len(header)) + header + blob)
+            fh.flush()
+            # Lấy từ file tạm (os.replace giữ nguyên inode): process khác có thể thay file ngay sau đó
+            index["file"] = _file_identity(os.fstat(fh.fileno()))
+        os.replace(tmp, index["path"])
+    except OSError:
+        index["data"] = blob
+    return index
+
+
+def load_section_index(country_code: str, source: List[int]) -> Dict[str, Any] | None:
+    """Nạp file chỉ mục nếu có và còn khớp với trang gốc (None nếu thiếu, hỏng hoặc đã cũ)."""
+    path = section_index_path(country_code)
+    try:
+        with open(path, "rb") as fh:
+            if fh.read(len(SECTION_INDEX_MAGIC)) != SECTION_INDEX_MAGIC:
+                return None
+            (length,) = struct.unpack(">I", fh.read(4))
+            header = json.loads(fh.read(length).decode("utf-8"))
+            identity = _file_identity(os.fstat(fh.fileno()))
+    except (OSError, ValueError, struct.error):
+        return None
+    if header.get("source") != source:
+        return None
+    return {
+        "path": path,
+        "source": source,
+        "base": len(SECTION_INDEX_MAGIC) + 4 + length,
+        "sections": {key: (start, size) for key, start, size in header["sections"]},
+        "data": None,
+        "file": identity,
+    }
+
+
+def _file_identity(st: os.stat_result) -> Tuple[int, int, int]:
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def get_section_index(country_code: str) -> Dict[str, Any]:
+    """Chỉ mục mục của một quốc gia; chỉ parse trang khi chưa có file chỉ mục hoặc trang gốc đã đổi."""
+    code = country_code.lower()
+    source = list(_file_stamp(country_page_path(code)) or ())
+    index = _SECTION_INDEXES.get(code)
+    if index is not None and index["source"] == source:
+        return index
+
+    def build() -> Dict[str, Any]:
+        loaded = load_section_index(code, source)
+        if loaded is not None:
+            return loaded
+        inc_metric("section_index_builds_total")
+        return write_section_index(code, parse_html(read_country_page(code)), source)
+
+    index = single_flight(("section_index", code, tuple(source)), build)
+    _SECTION_INDEXES[code] = index
+    return index
+
+
+def read_sections(country_code: str, keys: Iterable[str] | None = None) -> Dict[str, str]:
+    """Nội dung EN của các mục `keys` (None = mọi mục) của một quốc gia, một lần mở file + một lần đọc.
+
+    File chỉ mục có thể bị dựng lại (luồng / process khác) giữa lúc nạp header và lúc đọc: file vừa mở
+    phải đúng là file đã nạp header (inode, mtime, size), nếu không thì nạp lại chỉ mục rồi đọc lại.
+    """
+    code = country_code.lower()
+    for _ in range(2):
+        index = get_section_index(code)
+        sections = index["sections"]
+        wanted = list(sections) if keys is None else [key for key in keys if key in sections]
+        if not wanted:
+            return {}
+        low = min(sections[key][0] for key in wanted)
+        high = max(sections[key][0] + sections[key][1] for key in wanted)
+        if index["data"] is not None:
+            blob = index["data"][low:high]
+        else:
+            try:
+                with open(index["path"], "rb") as fh:
+                    if _file_identity(os.fstat(fh.fileno())) != index["file"]:
+                        raise FileNotFoundError(index["path"])
+                    fh.seek(index["base"] + low)
+                    blob = fh.read(high - low)
+            except FileNotFoundError:
+                _SECTION_INDEXES.pop(code, None)
+                inc_metric("section_index_reloads_total")
+                keys = wanted
+                continue
+            inc_metric("section_index_bytes_read_total", len(blob), endpoint=_current_endpoint())
+        return {
+            key: blob[sections[key][0] - low : sections[key][0] - low + sections[key][1]].decode("utf-8")
+            for key in wanted
+        }
+    raise OSError(f"Section index for '{code}' keeps changing while being read")
+
+
+def section_keys(country_code: str) -> List[str]:
+    """Tiêu đề EN các mục theo thứ tự trong trang."""
+    return list(get_section_index(country_code)["sections"])
+
+
+def read_section(country_code: str, key_en: str) -> str | None:
+    """Nội dung EN của một mục (một lần seek + read), None nếu không có mục này."""
+    return read_sections(country_code, [key_en]).get(key_en)
+
+
+def load_sections(country_code: str) -> Dict[str, str]:
+    """Mọi mục {tiêu đề EN: nội dung EN}, giống parse_html_from_zip nhưng đọc từ chỉ mục."""
+    return read_sections(country_code)
+
+
+def preview_text(text: str, limit: int = SECTION_PREVIEW_CHARS) -> Tuple[str, bool]:
+    """Cắt ngắn nội dung để xem trước (ưu tiên cắt ở khoảng trắng); trả về (đoạn xem trước, có bị cắt)."""
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text, False
+    cut = text.rfind(" ", 0, limit)
+    return text[: cut if cut > limit // 2 else limit].rstrip(" ,;:") + "…", True
+
+
+def section_preview(country_code: str, key_en: str) -> Tuple[str, str, bool]:
+    """(tiêu đề VI, đoạn xem trước, có bị cắt) của một mục; chỉ đọc nội dung EN khi thiếu bản dịch."""
+    entry = (SEARCH_VI_CACHE.get(country_code.lower()) or {}).get(key_en) or {}
+    val_en = "" if entry.get("val_vi") else (read_section(country_code, key_en) or "")
+    key_vi, val_vi = get_vi_key_val(country_code, key_en, val_en)
+    return (key_vi, *preview_text(val_vi))
+
+
+# ----------------------
+# Ma trận mục căn chỉnh giữa các quốc gia (so sánh nhiều quốc gia trong một request)
+# ----------------------
+#
+# Mỗi tiêu đề mục được quy về một mã chuẩn (section_id) để các biến thể giữa các trang trùng nhau;
+# ma trận có một hàng cho mỗi quốc gia, một cột cho mỗi mã mục, ô chứa tiêu đề EN của mục trong
+# chỉ mục của quốc gia đó (None nếu trang không có mục này).
+
+SECTION_MATRIX_PATH = os.path.join(SECTION_INDEX_DIR, "matrix.json")
+COMPARE_MAX_COUNTRIES = 20
+COMPARE_MAX_SECTIONS = 50
+_SECTION_MATRIX: Dict[str, Any] = {"source": None, "matrix": None}
+
+
+def section_id(title: str | None) -> str:
+    """Mã chuẩn của một tiêu đề mục: bỏ dấu, chữ thường, chỉ giữ chữ và số ("GDP - per capita" -> "gdp-per-capita")."""
+    return "-".join(re.findall(r"[a-z0-9]+", fold_text(title)))
+
+
+def page_source_stamp() -> List[Any]:
+    """Phiên bản nguồn trang của mọi quốc gia: stamp của kho trang / zip, hoặc với thư mục countries/
+    là digest stamp từng trang (sửa một trang tại chỗ không đổi stamp của thư mục)."""
+    path = country_page_path("")
+    if path in (PAGE_STORE_PATH, "countries.zip"):
+        return [path, *(_file_stamp(path) or ())]
+    stamps = [(code, _file_stamp(country_page_path(code))) for code, _ in load_country_codes()]
+    return ["countries", hashlib.sha1(repr(stamps).encode("utf-8")).hexdigest()]
+
+
+def build_section_matrix() -> Dict[str, Any]:
+    """Dựng ma trận từ chỉ mục mục của mọi quốc gia (dựng chỉ mục còn thiếu; xem build_section_index.py)."""
+    titles: Dict[str, Counter] = {}
+    ids: List[str] = []
+    rows: List[Tuple[str, str, Dict[str, str]]] = []
+    for code, name in load_country_codes():
+        try:
+            keys = section_keys(code)
+        except (KeyError, OSError):
+            continue
+        row: Dict[str, str] = {}
+        for key in keys:
+            sid = section_id(key)
+            if not sid or sid in row:
+                continue
+            row[sid] = key
+            if sid not in titles:
+                titles[sid] = Counter()
+                ids.append(sid)
+            titles[sid][key] += 1
+        rows.append((code, name, row))
+    return {
+        "ids": ids,
+        "titles": [titles[sid].most_common(1)[0][0] for sid in ids],
+        "codes": [code for code, _, _ in rows],
+        "names": [name for _, name, _ in rows],
+        "cells": [[row.get(sid) for sid in ids] for _, _, row in rows],
+    }
+
+
+def _index_matrix(matrix: Dict[str, Any]) -> Dict[str, Any]:
+    matrix["column"] = {sid: i for i, sid in enumerate(matrix["ids"])}
+    matrix["row"] = {code: i for i, code in enumerate(matrix["codes"])}
+    return matrix
+
+
+def get_section_matrix() -> Dict[str, Any]:
+    """Ma trận mục hiện hành: bộ nhớ -> section_index/matrix.json -> dựng lại khi danh sách/trang nguồn đổi."""
+    source = [list(_file_stamp("countryList.txt") or ()), page_source_stamp()]
+    if _SECTION_MATRIX["source"] == source:
+        return _SECTION_MATRIX["matrix"]
+
+    def build() -> Dict[str, Any]:
+        try:
+            with open(SECTION_MATRIX_PATH, "r", encoding="utf-8") as fh:
+                stored = json.load(fh)
+            if stored.get("source") == source:
+                return _index_matrix(stored["matrix"])
+        except (OSError, ValueError, KeyError):
+            pass
+        inc_metric("section_matrix_builds_total")
+        matrix = build_section_matrix()
+        try:
+            os.makedirs(SECTION_INDEX_DIR, exist_ok=True)
+            tmp = f"{SECTION_MATRIX_PATH}.tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump({"source": source, "matrix": matrix}, fh, ensure_ascii=False)
+            os.replace(tmp, SECTION_MATRIX_PATH)
+        except OSError:
+            pass
+        return _index_matrix(matrix)
+
+    matrix = single_flight(("section_matrix", repr(source)), build)
+    _SECTION_MATRIX.update(source=source, matrix=matrix)
+    return matrix
+
+
+def resolve_compare_country(matrix: Dict[str, Any], value: str) -> str | None:
+    """Mã quốc gia từ mã 2 ký tự hoặc tên trong countryList.txt."""
+    value = value.strip()
+    if value.lower() in matrix["row"]:
+        return value.lower()
+    if value in matrix["names"]:
+        return matrix["codes"][matrix["names"].index(value)]
+    code = code_for_country(value) if value else None
+    return code.lower() if code and code.lower() in matrix["row"] else None
+
+
+def resolve_compare_section(matrix: Dict[str, Any], value: str, codes: List[str]) -> str | None:
+    """Mã mục từ tiêu đề EN / mã mục, tiêu đề VI (đã cache) của các quốc gia được chọn, hoặc gần đúng."""
+    sid = section_id(value)
+    if not sid:
+        return None
+    if sid in matrix["column"]:
+        return sid
+    for code in codes:
+        for key_en in matrix["cells"][matrix["row"][code]]:
+            if key_en and section_id(get_vi_key_val(code, key_en, "")[0]) == sid:
+                return section_id(key_en)
+    close = get_close_matches(sid, matrix["ids"], n=1, cutoff=0.75)
+    return close[0] if close else None
+
+
+def compare_countries(codes: List[str], section_ids: List[str]) -> Dict[str, Any]:
+    """Bảng so sánh căn chỉnh: một hàng cho mỗi mục, một cột cho mỗi quốc gia (giá trị đã dịch nếu có).
+
+    Ô trống ("") khi trang của quốc gia không có mục đó.
+    """
+    matrix = get_section_matrix()
+    columns = [matrix["column"][sid] for sid in section_ids]
+    values: Dict[str, List[str]] = {}
+    titles_vi: List[str | None] = [None] * len(section_ids)
+    for code in codes:
+        cells = matrix["cells"][matrix["row"][code]]
+        keys = [cells[col] for col in columns]
+        bodies = read_sections(code, [key for key in keys if key])
+        row: List[str] = []
+        for i, key in enumerate(keys):
+            if not key or key not in bodies:
+                row.append("")
+                continue
+            key_vi, val_vi = get_vi_key_val(code, key, bodies[key])
+            if titles_vi[i] is None and key_vi != key:
+                titles_vi[i] = key_vi
+            row.append(val_vi)
+        values[code] = row
+    return {
+        "countries": [{"code": code, "name": matrix["names"][matrix["row"][code]]} for code in codes],
+        "sections": [
+            {"id": sid, "title": matrix["titles"][col], "title_vi": titles_vi[i] or matrix["titles"][col]}
+            for i, (sid, col) in enumerate(zip(section_ids, columns))
+        ],
+        "rows": [[values[code][i] for code in codes] for i in range(len(section_ids))],
+    }
+
+
+def load_country_details() -> Dict[str, Dict[str, str]]:
+    country_details: Dict[str, Dict[str, str]] = {}
+    rows: List[List[str]] = []
+    inc_metric("csv_reads_total", endpoint=_current_endpoint(), file="countries.csv")
+    with open("countries.csv", "r", encoding="utf-8") as fh:
         reader = csv.reader(fh)
         for row in reader:
             rows.append([cell.lower() for cell in row])
@@ -526,12 +2264,15 @@ def load_country_details() -> Dict[str, Dict[str, str]]:
         for j in range(len(header)):
             if header[j] and rows[i][j]:
                 country_details[rows[i][0]][header[j]] = rows[i][j]
+    for info in country_details.values():
+        intern_info(info)
     return country_details
 
 
 def load_tourism_data() -> Dict[str, Dict[str, str]]:
     tourism: Dict[str, Dict[str, str]] = {}
     rows: List[List[str]] = []
+    inc_metric("csv_reads_total", endpoint=_current_endpoint(), file="Tourism.csv")
     with open("Tourism.csv", "r", encoding="utf-8") as fh:
         reader = csv.reader(fh)
         for row in reader:
@@ -545,14 +2286,242 @@ def load_tourism_data() -> Dict[str, Dict[str, str]]:
         for j in range(len(header)):
             if header[j] and rows[i][j]:
                 tourism[rows[i][0]][header[j]] = rows[i][j]
+    for info in tourism.values():
+        intern_info(info)
     return tourism
 
 
+# ----------------------
+# Cột số có kiểu và chỉ mục sắp xếp (dựng một lần cho mỗi phiên bản file CSV)
+# ----------------------
+
+_COUNTRY_TABLE_CACHE: Dict[str, Any] = {"stamp": None, "table": None}
+_TOURISM_TABLE_CACHE: Dict[str, Any] = {"stamp": None, "table": None}
+
+BudgetRange = Tuple[float, float, bool, bool]  # (low, high, low_inclusive, high_inclusive)
+
+_NUMBER_UNITS = {"nghìn": 1e3, "ngàn": 1e3, "k": 1e3, "triệu": 1e6, "tr": 1e6, "million": 1e6, "tỷ": 1e9, "billion": 1e9}
+
+
+def _file_stamp(path: str) -> Tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def parse_number(value: str | None, decimal: str | None = None) -> float | None:
+    """Chuyển chuỗi số sang float, hỗ trợ cả kiểu "18,561.93" (EN) và "60.000.000" / "1,5" (VI).
+
+    - decimal: dấu thập phân của cột ("." hoặc ","); None = tự đoán.
+    - Khi tự đoán: có cả hai dấu thì dấu xuất hiện sau cùng là dấu thập phân; một dấu lặp lại
+      nhiều lần là dấu phân tách hàng nghìn; một dấu duy nhất (phẩy hoặc chấm) đứng trước đúng
+      3 chữ số được coi là phân tách hàng nghìn ("40,000" và "1.504" đều là số nguyên).
+    - Cột CSV theo định dạng EN ("940.953" là số thập phân) phải truyền decimal=".".
+    """
+    text = "".join(ch for ch in _norm(value) if ch.isdigit() or ch in ",.-")
+    if not any(ch.isdigit() for ch in text):
+        return None
+    if decimal is None:
+        if "," in text and "." in text:
+            decimal = "," if text.rfind(",") > text.rfind(".") else "."
+        elif text.count(",") > 1:
+            decimal = "."
+        elif text.count(".") > 1:
+            decimal = ","
+        elif "," in text:
+            decimal = "." if len(text) - text.rfind(",") - 1 == 3 else ","
+        elif "." in text:
+            decimal = "," if len(text) - text.rfind(".") - 1 == 3 else "."
+        else:
+            decimal = "."
+    thousands = "," if decimal == "." else "."
+    text = text.replace(thousands, "").replace(decimal, ".")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _unit_of(text: str) -> float | None:
+    for word in _norm(text).replace(".", " ").split():
+        if word in _NUMBER_UNITS:
+            return _NUMBER_UNITS[word]
+    return None
+
+
+def _parse_amount(text: str, default_unit: float = 1.0) -> float | None:
+    """Số tiền kiểu VI ("60.000.000", "1,5 triệu") hoặc EN ("30,000,000"), có thể kèm đơn vị "triệu", "tỷ",..."""
+    number = parse_number(text)
+    if number is None:
+        return None
+    return number * (_unit_of(text) or default_unit)
+
+
+def parse_budget_range(label: str | None) -> BudgetRange | None:
+    """Chuyển nhãn ngân sách ("Dưới 30.000.000", "30–60 triệu", "Trên 60.000.000") thành khoảng số."""
+    text = _norm(label)
+    if not text:
+        return None
+    for prefix in ("dưới", "under", "below", "<"):
+        if text.startswith(prefix):
+            high = _parse_amount(text[len(prefix):])
+            return None if high is None else (0.0, high, True, False)
+    for prefix in ("trên", "over", "above", ">"):
+        if text.startswith(prefix):
+            low = _parse_amount(text[len(prefix):])
+            return None if low is None else (low, float("inf"), False, True)
+    for sep in ("–", "—", "-"):
+        if sep in text:
+            low_text, high_text = text.split(sep, 1)
+            # "30–60 triệu": đơn vị ở cuối áp dụng cho cả hai đầu khoảng
+            high = _parse_amount(high_text)
+            low = _parse_amount(low_text, default_unit=_unit_of(high_text) or 1.0)
+            if low is None or high is None:
+                return None
+            return (low, high, True, True)
+    amount = _parse_amount(text)
+    return None if amount is None else (amount, amount, True, True)
+
+
+def budget_contains(budget: BudgetRange, amount: float) -> bool:
+    low, high, low_inc, high_inc = budget
+    above = amount >= low if low_inc else amount > low
+    below = amount <= high if high_inc else amount < high
+    return above and below
+
+
+def _sorted_index(values: List[float | None]) -> Tuple[List[float], List[int]]:
+    """Chỉ mục sắp xếp (giá trị tăng dần, chỉ số dòng tương ứng), bỏ qua ô trống."""
+    pairs = sorted((v, i) for i, v in enumerate(values) if v is not None)
+    return [v for v, _ in pairs], [i for _, i in pairs]
+
+
+def build_country_table(details: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+    """Dựng bảng cột cho countries.csv: giá trị phân loại đã chuẩn hóa, cột số có kiểu,
+    hạng phần trăm và chỉ mục sắp xếp cho truy vấn khoảng."""
+    names = list(details.keys())
+    infos = list(details.values())
+    cat = {criterion: [info_term(info, criterion) for info in infos] for criterion in SCORE_CATEGORICAL}
+    num: Dict[str, List[float | None]] = {}
+    pct: Dict[str, List[float | None]] = {}
+    index: Dict[str, Tuple[List[float], List[int]]] = {}
+    for criterion, (en, vi) in SCORE_NUMERIC.items():
+        values = [parse_number(get_field(info, en, vi), decimal=".") for info in infos]
+        present, _ = index[criterion] = _sorted_index(values)
+        last = len(present) - 1
+        num[criterion] = values
+        pct[criterion] = [
+            None if v is None else (bisect_left(present, v) / last if last > 0 else 1.0) for v in values
+        ]
+    # Tần suất từng giá trị phân loại, dùng để sắp thứ tự điều kiện cho suy diễn lùi
+    freq = {criterion: dict(Counter(column)) for criterion, column in cat.items()}
+    # "match" lưu vector 0/1 đã tính cho từng cặp (criterion, giá trị)
+    return {
+        "names": names,
+        "infos": infos,
+        "cat": cat,
+        "num": num,
+        "pct": pct,
+        "index": index,
+        "freq": freq,
+        "rows": list(zip(*(cat[column] for column in ROW_COLUMNS))) if names else [],
+        "match": {},
+        "summaries": {},
+    }
+
+
+def get_country_table() -> Dict[str, Any]:
+    """Bảng cột cho countries.csv; chỉ dựng lại khi file thay đổi."""
+    stamp = _file_stamp("countries.csv")
+    table = _COUNTRY_TABLE_CACHE["table"]
+    if table is None or _COUNTRY_TABLE_CACHE["stamp"] != stamp:
+
+        def build() -> Dict[str, Any]:
+            old = _COUNTRY_TABLE_CACHE["table"]
+            table = build_country_table(load_country_details())
+            table["stamp"] = stamp
+            _carry_over_summaries(old, table)
+            _COUNTRY_TABLE_CACHE.update(stamp=stamp, table=table)
+            return table
+
+        table = single_flight(("country_table", stamp), build)
+    return table
+
+
+def range_query(table: Dict[str, Any], ranges: Dict[str, Tuple[float | None, float | None]]) -> List[int]:
+    """Trả về chỉ số các dòng thỏa mọi điều kiện khoảng, ví dụ {"gdp": (1000, None), "density": (None, 100)}.
+
+    - Cận dưới/trên là mở (GDP > X, mật độ < Y); None = không giới hạn.
+    - Mỗi điều kiện dùng bisect trên chỉ mục sắp xếp, sau đó giao các tập từ nhỏ đến lớn.
+    """
+    candidates: List[List[int]] = []
+    for column, (low, high) in ranges.items():
+        values, rows = table["index"][column]
+        start = 0 if low is None else bisect_right(values, low)
+        stop = len(values) if high is None else bisect_left(values, high)
+        candidates.append(rows[start:stop])
+    if not candidates:
+        return list(range(len(table["names"])))
+    candidates.sort(key=len)
+    selected = set(candidates[0])
+    for rows in candidates[1:]:
+        selected.intersection_update(rows)
+        if not selected:
+            break
+    return sorted(selected)
+
+
+def build_tourism_table(tourism: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+    """Bảng cho Tourism.csv: khoảng ngân sách dạng số và chỉ mục theo loại địa điểm,
+    mỗi loại sắp xếp theo cận dưới của ngân sách."""
+    names = list(tourism.keys())
+    infos = list(tourism.values())
+    budgets = [parse_budget_range(get_field(info, "budget", "ngân sách")) for info in infos]
+    by_type: Dict[int, Tuple[List[float], List[int]]] = {}
+    grouped: Dict[int, List[Tuple[float, int]]] = {}
+    for i, info in enumerate(infos):
+        if budgets[i] is None:
+            continue
+        grouped.setdefault(info_term(info, "place"), []).append((budgets[i][0], i))
+    for place_type, pairs in grouped.items():
+        pairs.sort()
+        by_type[place_type] = ([low for low, _ in pairs], [i for _, i in pairs])
+    return {"names": names, "infos": infos, "budgets": budgets, "by_type": by_type, "summaries": {}}
+
+
+def get_tourism_table() -> Dict[str, Any]:
+    """Bảng cho Tourism.csv; chỉ dựng lại khi file thay đổi."""
+    stamp = _file_stamp("Tourism.csv")
+    table = _TOURISM_TABLE_CACHE["table"]
+    if table is None or _TOURISM_TABLE_CACHE["stamp"] != stamp:
+
+        def build() -> Dict[str, Any]:
+            old = _TOURISM_TABLE_CACHE["table"]
+            table = build_tourism_table(load_tourism_data())
+            table["stamp"] = stamp
+            _carry_over_summaries(old, table)
+            _TOURISM_TABLE_CACHE.update(stamp=stamp, table=table)
+            return table
+
+        table = single_flight(("tourism_table", stamp), build)
+    return table
+
+
+def places_for_budget(table: Dict[str, Any], place_type: int, amount: float) -> List[int]:
+    """Các điểm đến thuộc loại place_type (ID từ vựng) có khoảng ngân sách chứa amount (giữ thứ tự trong file)."""
+    lows, rows = table["by_type"].get(place_type, ([], []))
+    stop = bisect_right(lows, amount)
+    return sorted(i for i in rows[:stop] if budget_contains(table["budgets"][i], amount))
+
+
 # ----------------------
 # CSV read/write helpers
 # ----------------------
 
 def read_csv_file(path: str) -> Tuple[List[str], List[List[str]]]:
+    inc_metric("csv_reads_total", endpoint=_current_endpoint(), file=os.path.basename(path))
     with open(path, "r", encoding="utf-8", newline="") as fh:
         reader = csv.reader(fh)
         rows = list(reader)
@@ -563,11 +2532,505 @@ def read_csv_file(path: str) -> Tuple[List[str], List[List[str]]]:
     return header, data_rows
 
 
-def write_csv_file(path: str, header: List[str], rows: List[List[str]]) -> None:
-    with open(path, "w", encoding="utf-8", newline="") as fh:
-        writer = csv.writer(fh)
-        writer.writerow(header)
-        writer.writerows(rows)
+def write_csv_file(path: str, header: List[str], rows: Iterable[List[str]]) -> None:
+    """Ghi CSV vào file tạm cùng thư mục rồi os.replace, để người đọc không bao giờ thấy file ghi dở.
+
+    - rows có thể là generator (ví dụ đang đọc dần từ chính file cũ).
+    """
+    inc_metric("csv_writes_total", endpoint=_current_endpoint(), file=os.path.basename(path))
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(header)
+            writer.writerows(rows)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+# ----------------------
+# Bảng quản trị: index khóa chính, index phụ đã sắp xếp và phân trang phía server
+# ----------------------
+
+ADMIN_DATASETS = {"countries": "countries.csv", "tourism": "Tourism.csv"}
+ADMIN_PER_PAGE = 50
+ADMIN_MAX_PER_PAGE = 500
+_NUMERIC_CHARS = set("0123456789,.- ")
+_ADMIN_INDEX_CACHE: Dict[str, Dict[str, Any]] = {}
+_ADMIN_INDEX_LOCK = threading.Lock()
+
+
+def get_admin_dataset(path: str) -> Dict[str, Any]:
+    """Dữ liệu CSV + index khóa chính (cột đầu, không phân biệt hoa thường), dựng lại khi file đổi.
+
+    - "sorted"/"folded": index phụ theo từng cột, chỉ dựng khi cột đó được sắp xếp hoặc lọc lần đầu.
+    """
+    stamp = _file_stamp(path)
+    with _ADMIN_INDEX_LOCK:
+        dataset = _ADMIN_INDEX_CACHE.get(path)
+        if dataset is not None and dataset["stamp"] == stamp:
+            return dataset
+    return single_flight(("admin_dataset", path, stamp), lambda: _build_admin_dataset(path, stamp))
+
+
+def _build_admin_dataset(path: str, stamp: Tuple[int, int] | None) -> Dict[str, Any]:
+    header, rows = read_csv_file(path) if stamp is not None else ([], [])
+    rows = [r for r in rows if r]
+    pk: Dict[str, int] = {}
+    for i, r in enumerate(rows):
+        pk.setdefault(r[0].strip().lower(), i)
+    dataset = {
+        "stamp": stamp,
+        "header": header,
+        "rows": rows,
+        "pk": pk,
+        "search": [" ".join(r).lower() for r in rows],
+        "sorted": {},
+        "folded": {},
+    }
+    with _ADMIN_INDEX_LOCK:
+        _ADMIN_INDEX_CACHE[path] = dataset
+    return dataset
+
+
+def admin_lookup(dataset: Dict[str, Any], key: str | None) -> Dict[str, str] | None:
+    """Tìm dòng theo khóa chính qua index (thay cho quét tuyến tính)."""
+    i = dataset["pk"].get((key or "").strip().lower()) if key else None
+    return dict(zip(dataset["header"], dataset["rows"][i])) if i is not None else None
+
+
+def _column_value(row: List[str], col: int) -> str:
+    return row[col] if col < len(row) else ""
+
+
+def _folded_index(dataset: Dict[str, Any], col: int) -> Tuple[List[str], List[int]]:
+    """Index phụ: giá trị đã chuẩn hóa (fold_text) của cột, sắp xếp tăng dần, kèm chỉ số dòng."""
+    index = dataset["folded"].get(col)
+    if index is None:
+
+        def build() -> Tuple[List[str], List[int]]:
+            pairs = sorted((fold_text(_column_value(r, col)), i) for i, r in enumerate(dataset["rows"]))
+            dataset["folded"][col] = ([v for v, _ in pairs], [i for _, i in pairs])
+            return dataset["folded"][col]
+
+        index = single_flight(("admin_index", id(dataset), col), build)
+    return index
+
+
+def _sorted_order(dataset: Dict[str, Any], col: int) -> List[int]:
+    """Thứ tự dòng theo cột: theo số nếu mọi ô khác rỗng đều là số, ngược lại theo chữ."""
+    order = dataset["sorted"].get(col)
+    if order is None:
+        values = [_column_value(r, col) for r in dataset["rows"]]
+        numbers = [parse_number(v, decimal=".") if set(v) <= _NUMERIC_CHARS else None for v in values]
+        if all(n is not None for n, v in zip(numbers, values) if v.strip()):
+            order = sorted(range(len(values)), key=lambda i: (numbers[i] is None, numbers[i] or 0.0))
+        else:
+            order = _folded_index(dataset, col)[1]
+        dataset["sorted"][col] = order
+    return order
+
+
+def query_admin_rows(
+    dataset: Dict[str, Any],
+    q: str = "",
+    filters: Dict[int, str] | None = None,
+    sort: int | None = None,
+    desc: bool = False,
+    page: int = 1,
+    per_page: int = ADMIN_PER_PAGE,
+) -> Tuple[int, List[int]]:
+    """Trả về (tổng số dòng khớp, chỉ số dòng của trang `page`).
+
+    - filters: {cột: tiền tố} tra bằng bisect trên index phụ; q: chuỗi con trên toàn dòng.
+    """
+    rows = dataset["rows"]
+    allowed: set | None = None
+    for col, prefix in (filters or {}).items():
+        folded = fold_text(prefix)
+        if not folded:
+            continue
+        keys, ids = _folded_index(dataset, col)
+        lo = bisect_left(keys, folded)
+        hi = bisect_right(keys, folded + "\uffff")
+        matched = set(ids[lo:hi])
+        allowed = matched if allowed is None else allowed & matched
+
+    if sort is not None and 0 <= sort < len(dataset["header"]):
+        order: Any = _sorted_order(dataset, sort)
+        if desc:
+            order = order[::-1]
+    else:
+        order = range(len(rows))
+
+    start = (max(1, page) - 1) * per_page
+    needle = q.strip().lower()
+    if allowed is None and not needle:
+        return len(rows), list(order[start : start + per_page])
+    search = dataset["search"]
+    matched_ids = [i for i in order if (allowed is None or i in allowed) and (not needle or needle in search[i])]
+    return len(matched_ids), matched_ids[start : start + per_page]
+
+
+def admin_query_args(args: Dict[str, str], header: List[str]) -> Dict[str, Any]:
+    """Đọc tham số phân trang/sắp xếp/lọc từ query string (?page=&per_page=&sort=&desc=&q=&f_<cột>=)."""
+
+    def as_int(raw: str | None, default: int | None) -> int | None:
+        try:
+            return int(raw) if raw not in (None, "") else default
+        except ValueError:
+            return default
+
+    filters = {}
+    for col in range(len(header)):
+        value = (args.get(f"f_{col}") or "").strip()
+        if value:
+            filters[col] = value
+    return {
+        "q": args.get("q") or "",
+        "filters": filters,
+        "sort": as_int(args.get("sort"), None),
+        "desc": args.get("desc") == "1",
+        "page": max(1, as_int(args.get("page"), 1) or 1),
+        "per_page": min(ADMIN_MAX_PER_PAGE, max(1, as_int(args.get("per_page"), ADMIN_PER_PAGE) or ADMIN_PER_PAGE)),
+    }
+
+
+def admin_page(name: str, args: Dict[str, str]) -> Dict[str, Any]:
+    """Một trang của bảng quản trị (dùng cho cả template lẫn JSON), kèm HTML các dòng và thanh phân trang."""
+    dataset = get_admin_dataset(ADMIN_DATASETS[name])
+    header = dataset["header"]
+    params = admin_query_args(args, header)
+    total, ids = query_admin_rows(dataset, **params)
+    rows = [dataset["rows"][i] for i in ids]
+    pages = max(1, -(-total // params["per_page"]))
+    return {
+        "dataset": dataset,
+        "header": header,
+        "rows": rows,
+        "total": total,
+        "pages": pages,
+        "params": params,
+        "rows_html": Markup(get_template_attribute("_fragments.html", "admin_rows")(name, header, rows)),
+        "pager_html": Markup(get_template_attribute("_fragments.html", "admin_pager")(params["page"], pages, total)),
+    }
+
+
+# ----------------------
+# HTTP caching: ETag / Last-Modified theo phiên bản dữ liệu và fragment HTML dựng sẵn
+# ----------------------
+
+_FILE_DIGESTS: Dict[str, Tuple[Tuple[int, int] | None, str]] = {}
+# (loại fragment, lựa chọn) -> (phiên bản countryList.txt + templates, HTML); bản cũ bị thay thế khi đổi phiên bản
+_FRAGMENT_CACHE: Dict[Tuple[Any, ...], Tuple[Any, Markup]] = {}
+
+
+def file_digest(path: str) -> str:
+    """sha1 nội dung file, chỉ tính lại khi mtime/size thay đổi ("-" nếu file không tồn tại)."""
+    stamp = _file_stamp(path)
+    cached = _FILE_DIGESTS.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    digest = "-"
+    if stamp is not None:
+        with open(path, "rb") as fh:
+            digest = hashlib.sha1(fh.read()).hexdigest()
+    _FILE_DIGESTS[path] = (stamp, digest)
+    return digest
+
+
+def country_page_path(country_code: str) -> str:
+    for path in (PAGE_STORE_PATH, "countries.zip"):
+        if os.path.exists(path):
+            return path
+    return os.path.join("countries", f"{country_code}.html")
+
+
+def templates_version() -> str:
+    """Phiên bản của thư mục templates (mtime/size các file), để ETag đổi khi giao diện đổi."""
+    folder = os.path.join(app.root_path, app.template_folder or "templates")
+    stamps = []
+    for name in sorted(os.listdir(folder)):
+        stamps.append((name, _file_stamp(os.path.join(folder, name))))
+    return hashlib.sha1(repr(stamps).encode("utf-8")).hexdigest()
+
+
+def conditional_page(parts: List[Any], paths: List[str], render: Callable[[], Any]) -> Response:
+    """Trả về 304 nếu client đã có bản mới nhất, nếu không thì render và gắn ETag/Last-Modified.
+
+    - parts: các giá trị xác định nội dung (tham số truy vấn, ...); paths: các file dữ liệu liên quan.
+    - ETag gồm cả người dùng/role vì thanh điều hướng hiển thị theo phiên đăng nhập.
+    - Trang còn thông báo flash chưa hiển thị thì không dùng cache.
+    """
+    if session.get("_flashes"):
+        return make_response(render())
+    versions = [file_digest(path) for path in paths]
+    key = repr([parts, versions, templates_version(), session.get("user"), session.get("role")])
+    etag = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    mtimes = [st[0] for st in (_file_stamp(path) for path in paths) if st]
+    last_modified = datetime.fromtimestamp(max(mtimes) / 1e9, tz=timezone.utc) if mtimes else None
+
+    # Bản nén được gắn ETag có hậu tố mã hóa (xem compress_response)
+    matched = next((etag + suffix for suffix in ("", "-gzip", "-br") if etag + suffix in request.if_none_match), None)
+    if matched:
+        response = Response(status=304)
+        response.set_etag(matched)
+    else:
+        response = make_response(render())
+        if response.status_code != 200:
+            return response
+        response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def _cached_fragment(key: Tuple[Any, ...], render: Callable[[List[str]], Markup]) -> Markup:
+    version = (_file_stamp("countryList.txt"), templates_version())
+    cached = _FRAGMENT_CACHE.get(key)
+    if cached is None or cached[0] != version:
+        cached = (version, render(load_country_list()))
+        _FRAGMENT_CACHE[key] = cached
+    return cached[1]
+
+
+def country_options_html(selected: str | None) -> Markup:
+    """Danh sách <option> quốc gia (search.html), dựng một lần cho mỗi phiên bản countryList.txt / templates.
+
+    Chỉ cache theo tên có trong countryList.txt (tối đa một bản cho mỗi quốc gia); giá trị khác do
+    người dùng gửi lên được hiển thị như chưa chọn.
+    """
+    names = load_country_list()
+    selected = selected if selected in names else None
+    macro = get_template_attribute("_fragments.html", "country_options")
+    return _cached_fragment(("country_options", selected), lambda countries: Markup(macro(countries, selected)))
+
+
+def country_cards_html() -> Markup:
+    """Lưới thẻ quốc gia (countries.html), dựng một lần cho mỗi phiên bản countryList.txt / templates."""
+    macro = get_template_attribute("_fragments.html", "country_cards")
+    return _cached_fragment(("country_cards",), lambda countries: Markup(macro(countries)))
+
+
+# ----------------------
+# Autocomplete: prefix trie cho tên quốc gia và tiêu đề mục (VI/EN)
+# ----------------------
+
+AUTOCOMPLETE_LIMIT = 10
+SPECIAL_COMMANDS = [";lst", ";lst preview", ";keys", ";matches "]
+# (loại, mã quốc gia) -> (phiên bản dữ liệu, trie); phiên bản đổi thì thay trie cũ chứ không thêm khóa mới
+_TRIE_CACHE: Dict[Tuple[str, str], Tuple[Any, Dict[str, Any]]] = {}
+
+
+def fold_text(text: str | None) -> str:
+    """Chuẩn hóa để so khớp tiền tố: chữ thường, bỏ dấu tiếng Việt (đ -> d)."""
+    text = _norm(text)
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize("NFD", text.replace("đ", "d"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def build_trie(entries: Iterable[Tuple[str, Any]]) -> Dict[str, Any]:
+    """Trie dạng dict lồng nhau {ký tự: nút con}; khóa "" của nút giữ các giá trị kết thúc tại đó.
+
+    - Mỗi chuỗi được chèn tại đầu mọi từ, nên "overview" cũng gợi ý "Economy - overview".
+    """
+    root: Dict[str, Any] = {}
+    for text, value in entries:
+        folded = fold_text(text)
+        starts = [i for i, ch in enumerate(folded) if ch.isalnum() and (i == 0 or not folded[i - 1].isalnum())]
+        for start in starts or [0]:
+            node = root
+            for ch in folded[start:]:
+                node = node.setdefault(ch, {})
+            node.setdefault("", []).append(value)
+    return root
+
+
+def trie_suggest(root: Dict[str, Any], prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[Any]:
+    """Tối đa `limit` giá trị có tiền tố `prefix` (duyệt theo thứ tự chữ cái, không trùng)."""
+    node = root
+    for ch in fold_text(prefix):
+        node = node.get(ch)
+        if node is None:
+            return []
+    results: List[Any] = []
+    seen = set()
+    stack = [node]
+    while stack and len(results) < limit:
+        current = stack.pop()
+        for value in current.get("", ()):
+            if value not in seen:
+                seen.add(value)
+                results.append(value)
+                if len(results) >= limit:
+                    break
+        stack.extend(current[ch] for ch in sorted((k for k in current if k), reverse=True))
+    return results
+
+
+def _cached_trie(key: Tuple[str, str], version: Any, build: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    cached = _TRIE_CACHE.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    trie = build()
+    _TRIE_CACHE[key] = (version, trie)
+    return trie
+
+
+def get_country_trie() -> Dict[str, Any]:
+    """Trie tên quốc gia, dựng lại khi countryList.txt thay đổi."""
+    return _cached_trie(
+        ("countries", ""),
+        _file_stamp("countryList.txt"),
+        lambda: build_trie((name, name) for name in load_country_list()),
+    )
+
+
+def get_section_trie(country_code: str) -> Dict[str, Any]:
+    """Trie tiêu đề mục (VI và EN) của một quốc gia.
+
+    - Tiêu đề EN lấy từ chỉ mục mục (dựng một lần nếu chưa có), nên có gợi ý ngay cả khi chưa có
+      search_vi_cache.json; tiêu đề VI lấy từ SEARCH_VI_CACHE khi đã được dịch.
+    """
+    code = country_code.lower()
+    entries = SEARCH_VI_CACHE.get(code) or {}
+    try:
+        index = get_section_index(code)
+        keys = list(index["sections"])
+        source = tuple(index["source"])
+    except (KeyError, OSError):
+        keys, source = list(entries), None
+
+    def build() -> Dict[str, Any]:
+        pairs = [((entries.get(key_en) or {}).get("key_vi") or key_en, key_en) for key_en in keys]
+        return build_trie([(vi, (vi, en)) for vi, en in pairs] + [(en, (vi, en)) for vi, en in pairs])
+
+    return _cached_trie(("sections", code), (source, _file_stamp(SEARCH_VI_CACHE_PATH), len(entries)), build)
+
+
+# ----------------------
+# Nén response và fingerprint cho static assets
+# ----------------------
+
+# Chỉ nén response lớn hơn ngưỡng này (byte)
+COMPRESS_MIN_SIZE = int(os.environ.get("EXPERT_COMPRESS_MIN_SIZE", "1024"))
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/javascript", "image/svg+xml"}
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+_STATIC_COMPRESSED: Dict[Tuple[str, Tuple[int, int] | None, str], bytes] = {}
+
+
+def _is_compressible(mimetype: str | None) -> bool:
+    return bool(mimetype) and (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_MIMETYPES)
+
+
+def _pick_encoding() -> str | None:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_bytes(data: bytes, encoding: str, level: int = 6) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=min(11, level))  # type: ignore[union-attr]
+    return gzip.compress(data, compresslevel=min(9, level))
+
+
+def static_path(filename: str) -> str:
+    return os.path.join(app.static_folder or "static", filename)
+
+
+def static_version(filename: str) -> str:
+    """Hash nội dung của static asset, dùng làm tham số ?v= trong URL."""
+    return file_digest(static_path(filename))[:12]
+
+
+def precompressed_static(filename: str, encoding: str) -> bytes:
+    """Bản nén mức cao nhất của static asset, tạo một lần cho mỗi phiên bản file."""
+    path = static_path(filename)
+    key = (filename, _file_stamp(path), encoding)
+    data = _STATIC_COMPRESSED.get(key)
+    if data is None:
+        with open(path, "rb") as fh:
+            data = compress_bytes(fh.read(), encoding, level=11)
+        _STATIC_COMPRESSED[key] = data
+    return data
+
+
+@app.url_defaults
+def add_static_fingerprint(endpoint: str, values: Dict[str, Any]) -> None:
+    # url_for('static', filename=...) -> /static/<file>?v=<hash nội dung>
+    if endpoint == "static" and "filename" in values and "v" not in values:
+        try:
+            values["v"] = static_version(values["filename"])
+        except OSError:
+            pass
+
+
+_ENCODING_ETAG_SUFFIX = re.compile(r'-(?:gzip|br)"')
+
+
+@app.before_request
+def strip_static_etag_suffix() -> None:
+    """send_file so If-None-Match với ETag gốc của file: bỏ hậu tố -gzip/-br mà compress_response đã gắn."""
+    if request.endpoint == "static" and "HTTP_IF_NONE_MATCH" in request.environ:
+        request.environ["HTTP_IF_NONE_MATCH"] = _ENCODING_ETAG_SUFFIX.sub('"', request.environ["HTTP_IF_NONE_MATCH"])
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """Gắn cache header dài hạn cho static đã fingerprint và nén response lớn (gzip/brotli)."""
+    is_static = request.endpoint == "static"
+    if is_static and response.status_code in (200, 304):
+        filename = (request.view_args or {}).get("filename", "")
+        if request.args.get("v") and request.args.get("v") == static_version(filename):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+    if is_static and response.status_code == 304 and _is_compressible(response.mimetype):
+        # 304 mang cùng ETag (có hậu tố mã hóa) như bản 200 mà client đang giữ
+        response.vary.add("Accept-Encoding")
+        encoding = _pick_encoding()
+        etag, weak = response.get_etag()
+        if encoding and etag:
+            response.set_etag(f"{etag}-{encoding}", weak)
+        return response
+    if response.status_code != 200 or "Content-Encoding" in response.headers:
+        return response
+    if not _is_compressible(response.mimetype):
+        return response
+    if response.is_streamed and not is_static:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = _pick_encoding()
+    if encoding is None:
+        return response
+
+    if is_static:
+        data = precompressed_static((request.view_args or {}).get("filename", ""), encoding)
+        response.direct_passthrough = False
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_SIZE:
+            return response
+        data = compress_bytes(body, encoding)
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
 
 
 # -------------
@@ -579,6 +3042,16 @@ def write_csv_file(path: str, header: List[str], rows: List[List[str]]) -> None:
 EXEMPT_PATHS = {"/login", "/register"}
 
 
+@app.errorhandler(TimeoutError)
+def busy(exc: TimeoutError):
+    # Hết thời gian chờ một phép tính dùng chung (single_flight)
+    return Response("Máy chủ đang bận, vui lòng thử lại sau.", status=503, headers={"Retry-After": "5"})
+
+
+# Khóa environ do export_static.py đặt khi render trang tĩnh (client HTTP không thể đặt khóa này)
+STATIC_EXPORT_ENVIRON = "expert.static_export"
+
+
 @app.before_request
 def require_login_globally():
     path = request.path or "/"
@@ -586,6 +3059,8 @@ def require_login_globally():
         return  # allow static files
     if path in EXEMPT_PATHS:
         return  # allow login page
+    if request.environ.get(STATIC_EXPORT_ENVIRON):
+        return  # render trang tĩnh như khách chưa đăng nhập
     if not session.get("user"):
         # remember where to go after login
         next_url = request.full_path if request.query_string else request.path
@@ -663,18 +3138,40 @@ def logout():
 
 @app.get("/countries")
 def countries():
-    return render_template("countries.html", countries=load_country_list())
+    return conditional_page(
+        ["countries"],
+        ["countryList.txt"],
+        lambda: render_template("countries.html", country_cards=country_cards_html()),
+    )
 
 
 @app.get("/search")
 def search_page():
-    return render_template("search.html", countries=load_country_list(), results=None, query=None, country=None)
+    # GET /search?country=...&query=... cho phép client dùng lại kết quả qua ETag (If-None-Match)
+    country = (request.args.get("country") or "").strip()
+    if country:
+        query_raw = request.args.get("query") or ""
+        code = (code_for_country(country) or "").lower()
+        return conditional_page(
+            ["search", country, query_raw],
+            ["countryList.txt", SEARCH_VI_CACHE_PATH] + ([country_page_path(code)] if code else []),
+            lambda: run_search(country, query_raw),
+        )
+    return conditional_page(
+        ["search"],
+        ["countryList.txt"],
+        lambda: render_template(
+            "search.html", country_options=country_options_html(None), results=None, query=None, country=None
+        ),
+    )
 
 
 @app.post("/search")
 def do_search():
-    country = request.form.get("country", "").strip()
-    query_raw = (request.form.get("query", "") or "")
+    return run_search(request.form.get("country", "").strip(), request.form.get("query", "") or "")
+
+
+def run_search(country: str, query_raw: str):
     # Giữ bản gốc để hiển thị lại, lower-case chỉ dùng cho kiểm tra tiền tố ;lst, ;keys, ;matches
     query = query_raw.lower()
     if not country:
@@ -687,21 +3184,33 @@ def do_search():
         return redirect(url_for("search_page"))
 
     code = code.lower()
-    possibilities = parse_html_from_zip(code)
+    # Tiêu đề lấy từ chỉ mục mục; nội dung chỉ đọc cho các mục được hiển thị
+    keys = section_keys(code)
 
     special = query.strip()
     if special.startswith(";lst") or special.startswith(";keys") or special.startswith(";matches"):
-        if special.startswith(";lst"):
+        if special.startswith(";lst") and special.split()[1:] == ["preview"]:
+            # ";lst preview": tiêu đề + đoạn xem trước, nội dung đầy đủ tải khi mở mục (/search/section)
+            previews = [(k, *section_preview(code, k)) for k in keys]
+            return render_template(
+                "search.html",
+                country_options=country_options_html(country),
+                results=[(key_vi, preview) for _, key_vi, preview, _ in previews],
+                sections=[(key_en, truncated) for key_en, _, _, truncated in previews],
+                query=query,
+                country=country,
+            )
+        elif special.startswith(";lst"):
             # Liệt kê toàn bộ: ưu tiên dùng bản dịch đã cache sẵn (nếu có)
-            results = [get_vi_key_val(code, k, possibilities[k]) for k in possibilities.keys()]
+            possibilities = load_sections(code)
+            results = [get_vi_key_val(code, k, possibilities[k]) for k in keys]
         elif special.startswith(";keys"):
             # Chỉ danh sách đầu mục: dùng key đã dịch sẵn
-            results = [(get_vi_key_val(code, k, "")[0], "") for k in possibilities.keys()]
+            results = [(get_vi_key_val(code, k, "")[0], "") for k in keys]
         else:
             # Syntax: ";matches <keyword>" – cho phép keyword là tiếng Việt.
             # Vì đã có cache tiếng Việt, ta so khớp trực tiếp trên tiêu đề VI.
             pattern_vi = special.split(" ", 1)[1].strip() if " " in special else ""
-            keys = list(possibilities.keys())
             # Map từ key EN -> key VI đã cache (hoặc EN nếu chưa có trong cache)
             vi_keys = {k: get_vi_key_val(code, k, "")[0] for k in keys}
             if pattern_vi:
@@ -717,11 +3226,12 @@ def do_search():
                 matches = keys[:20]
             results = []
             for m in matches:
-                key_vi, val_vi = get_vi_key_val(code, m, possibilities.get(m, ""))
+                key_vi, val_vi = get_vi_key_val(code, m, read_section(code, m) or "")
                 results.append((key_vi, val_vi))
-        return render_template("search.html", countries=load_country_list(), results=results, query=query, country=country)
+        return render_template(
+            "search.html", country_options=country_options_html(country), results=results, query=query, country=country
+        )
 
-    keys = list(possibilities.keys())
     # Người dùng gõ tiếng Việt: so khớp trực tiếp với tiêu đề VI trong cache
     vi_keys = {k: get_vi_key_val(code, k, "")[0] for k in keys}
     matches_vi = get_close_matches(query.strip().lower(), [v.lower() for v in vi_keys.values()])
@@ -735,52 +3245,174 @@ def do_search():
     results: List[tuple[str, str]] = []
     if matches:
         for m in matches:
-            key_vi, val_vi = get_vi_key_val(code, m, possibilities[m])
+            key_vi, val_vi = get_vi_key_val(code, m, read_section(code, m) or "")
             results.append((key_vi, val_vi))
-    return render_template("search.html", countries=load_country_list(), results=results, query=query, country=country)
+    return render_template(
+        "search.html", country_options=country_options_html(country), results=results, query=query, country=country
+    )
+
+
+@app.get("/search/suggest")
+def search_suggest():
+    """Gợi ý khi gõ (JSON), đọc từ chỉ mục mục thay vì parse trang HTML.
+
+    - ?q=...&field=country: gợi ý tên quốc gia.
+    - ?q=...&country=...: gợi ý tiêu đề mục (VI/EN) của quốc gia; "q" bắt đầu bằng ";" gợi ý lệnh đặc biệt,
+      ";matches <từ>" gợi ý theo phần sau lệnh.
+    """
+    q = request.args.get("q") or ""
+    limit = min(parse_top_k(request.args.get("limit"), AUTOCOMPLETE_LIMIT), 50)
+    if request.args.get("field") == "country":
+        return jsonify({"query": q, "suggestions": trie_suggest(get_country_trie(), q, limit)})
+
+    prefix = ""
+    stripped = q.lstrip()
+    if stripped.startswith(";"):
+        if not stripped.lower().startswith(";matches "):
+            commands = [c for c in SPECIAL_COMMANDS if c.startswith(stripped.lower())]
+            return jsonify({"query": q, "suggestions": [{"value": c, "vi": c, "en": c} for c in commands[:limit]]})
+        prefix = ";matches "
+        stripped = stripped[len(prefix):]
+
+    code = code_for_country((request.args.get("country") or "").strip()) if request.args.get("country") else None
+    sections = trie_suggest(get_section_trie(code), stripped, limit) if code else []
+    return jsonify(
+        {"query": q, "suggestions": [{"value": prefix + vi, "vi": vi, "en": en} for vi, en in sections]}
+    )
+
+
+@app.get("/search/section")
+def search_section():
+    """Nội dung đầy đủ của một mục (JSON), đọc qua chỉ mục mục thay vì parse lại trang.
+
+    - ?country=<tên quốc gia>&key=<tiêu đề EN>; trả về {"key", "key_vi", "value"} (bản dịch nếu đã có).
+    """
+    code = code_for_country((request.args.get("country") or "").strip())
+    key_en = request.args.get("key") or ""
+    value = read_section(code.lower(), key_en) if code else None
+    if value is None:
+        return jsonify({"error": "Section not found."}), 404
+    key_vi, val_vi = get_vi_key_val(code.lower(), key_en, value)
+    return jsonify({"key": key_en, "key_vi": key_vi, "value": val_vi})
+
+
+@app.get("/compare")
+def compare_page():
+    """So sánh nhiều quốc gia theo các mục trong một request, đọc từ ma trận mục dựng sẵn.
+
+    - ?country=...&country=...&section=...&section=... (lặp lại tham số; tiêu đề mục có thể chứa dấu phẩy).
+    - country: mã 2 ký tự hoặc tên; section: tiêu đề EN / VI hoặc mã mục (xem section_id).
+    - ?format=json trả về bảng dạng JSON (xem compare_countries), 400 nếu lựa chọn không hợp lệ.
+    """
+    matrix = get_section_matrix()
+    errors: List[str] = []
+    countries_raw = [value for value in request.args.getlist("country") if value.strip()]
+    sections_raw = [value for value in request.args.getlist("section") if value.strip()]
+    # Kiểm tra giới hạn trước khi phân giải: mỗi giá trị có thể phải đọc countryList.txt / duyệt cache VI
+    if len(countries_raw) > COMPARE_MAX_COUNTRIES:
+        errors.append(f"Select at most {COMPARE_MAX_COUNTRIES} countries.")
+    if len(sections_raw) > COMPARE_MAX_SECTIONS:
+        errors.append(f"Select at most {COMPARE_MAX_SECTIONS} sections.")
+    if errors:
+        countries_raw = sections_raw = []
+
+    codes: List[str] = []
+    for value in countries_raw:
+        code = resolve_compare_country(matrix, value)
+        if code is None:
+            errors.append(f"Country not found: {value}")
+        elif code not in codes:
+            codes.append(code)
+    section_ids: List[str] = []
+    for value in sections_raw:
+        sid = resolve_compare_section(matrix, value, codes)
+        if sid is None:
+            errors.append(f"Section not found: {value}")
+        elif sid not in section_ids:
+            section_ids.append(sid)
+
+    table = compare_countries(codes, section_ids) if codes and section_ids and not errors else None
+    if request.args.get("format") == "json":
+        if table is None:
+            return jsonify({"errors": errors or ["Select at least one country and one section."]}), 400
+        return jsonify(table)
+    for message in errors:
+        flash(message)
+    return render_template(
+        "compare.html",
+        countries=list(zip(matrix["codes"], matrix["names"])),
+        sections=list(zip(matrix["ids"], matrix["titles"])),
+        selected_countries=codes,
+        selected_sections=section_ids,
+        table=table,
+    )
 
 
 @app.get("/expert")
 def expert_page():
-    return render_template(
-        "expert.html",
-        result=None,
-        section=None,
-        density=None,
-        climate=None,
-        government=None,
-        religion=None,
-        mode=None,
-        trade=None,
-        domain=None,
-        budget=None,
-        place_type=None,
+    return conditional_page(
+        ["expert"],
+        [],
+        lambda: render_template(
+            "expert.html",
+            result=None,
+            section=None,
+            density=None,
+            climate=None,
+            government=None,
+            religion=None,
+            mode=None,
+            trade=None,
+            domain=None,
+            budget=None,
+            place_type=None,
+            inference=None,
+            top_k=None,
+            weights=None,
+            numeric_prefs=None,
+            trace=None,
+        ),
     )
 
 
 @app.post("/expert/live")
 def expert_live():
-    details = load_country_details()
-    density = request.form.get("density")  # not used in current filter
+    density = request.form.get("density")  # chỉ dùng trong chế độ xếp hạng theo điểm
     climate_raw = request.form.get("climate")
     government_raw = request.form.get("government")
     religion_raw = request.form.get("religion")
+    inference = request.form.get("inference") or "rules"
+    top_k = parse_top_k(request.form.get("top_k"))
+    weights = parse_score_weights(request.form, LIVE_SCORE_CRITERIA)
 
-    # Chuẩn hóa input người dùng thành context cho bộ suy diễn
+    # Bảng được nạp trước để các giá trị lạ trong dữ liệu đã có ID khi chuẩn hóa input
+    table = get_country_table()
+    # Chuẩn hóa input người dùng thành context (ID từ vựng) cho bộ suy diễn
     context = {
-        "climate": normalize_climate(climate_raw),
-        "government": normalize_government(government_raw),
-        "religion": normalize_religion(religion_raw),
+        "climate": term_id("climate", climate_raw),
+        "government": term_id("government", government_raw),
+        "religion": term_id("religion", religion_raw),
     }
 
-    result: List[Dict[str, str]] = []
-    for name, info in details.items():
-        facts = forward_chain_for_country(name, info, context, LIVE_RULES)
-        if facts.get("selected"):
+    result: List[Dict[str, Any]] = []
+    trace = None
+    if inference == "score":
+        score_context = dict(context, density=_numeric_pref(density))
+        for i, score in rank_countries(table, score_context, weights, top_k):
+            result.append(
+                {
+                    "name": table["names"][i],
+                    "summary": country_summary(table, i),
+                    "score": round(score * 100),
+                }
+            )
+    else:
+        trace = start_rule_trace("live", inference, context) if RULE_TRACE_ALL or request.form.get("trace") else None
+        for i in select_countries(table, context, inference, "live", trace):
             result.append(
                 {
-                    "name": name,
-                    "summary": describe_country(name, info),
+                    "name": table["names"][i],
+                    "summary": country_summary(table, i),
                 }
             )
 
@@ -797,30 +3429,55 @@ def expert_live():
         domain=None,
         budget=None,
         place_type=None,
+        inference=inference,
+        top_k=top_k,
+        weights=weights,
+        numeric_prefs=None,
+        trace=rule_trace_view(trace) if trace and request.form.get("trace") else None,
     )
 
 
 @app.post("/expert/work")
 def expert_work():
-    details = load_country_details()
     mode = request.form.get("mode")  # business or job
     trade_raw = request.form.get("trade")
     domain_raw = request.form.get("domain")
+    inference = request.form.get("inference") or "rules"
+    top_k = parse_top_k(request.form.get("top_k"))
+    weights = parse_score_weights(request.form, WORK_SCORE_CRITERIA)
+    numeric_prefs = {c: request.form.get(c) or "" for c in ("gdp", "import", "export")}
 
+    table = get_country_table()
     context = {
         "mode": mode,
-        "trade": normalize_trade(trade_raw) if trade_raw else None,
-        "domain": normalize_field(domain_raw) if domain_raw else None,
+        "trade": term_id("trade", trade_raw),
+        "domain": term_id("domain", domain_raw),
     }
-    result: List[Dict[str, str]] = []
-
-    for name, info in details.items():
-        facts = forward_chain_for_country(name, info, context, WORK_RULES)
-        if facts.get("selected"):
+    result: List[Dict[str, Any]] = []
+    trace = None
+
+    if inference == "score":
+        score_context = {
+            "domain": context["domain"],
+            # Loại thương mại chỉ được tính khi chọn chế độ business
+            "trade": context["trade"] if mode == "business" else None,
+        }
+        score_context.update({c: _numeric_pref(v) for c, v in numeric_prefs.items()})
+        for i, score in rank_countries(table, score_context, weights, top_k):
             result.append(
                 {
-                    "name": name,
-                    "summary": describe_country(name, info),
+                    "name": table["names"][i],
+                    "summary": country_summary(table, i),
+                    "score": round(score * 100),
+                }
+            )
+    else:
+        trace = start_rule_trace("work", inference, context) if RULE_TRACE_ALL or request.form.get("trace") else None
+        for i in select_countries(table, context, inference, "work", trace):
+            result.append(
+                {
+                    "name": table["names"][i],
+                    "summary": country_summary(table, i),
                 }
             )
 
@@ -837,23 +3494,24 @@ def expert_work():
         domain=domain_raw,
         budget=None,
         place_type=None,
+        inference=inference,
+        top_k=top_k,
+        weights=weights,
+        numeric_prefs=numeric_prefs,
+        trace=rule_trace_view(trace) if trace and request.form.get("trace") else None,
     )
 
 
 @app.post("/expert/travel")
 def expert_travel():
-    tourism = load_tourism_data()
+    table = get_tourism_table()
     budget_raw = request.form.get("budget") or ""
     place_type = request.form.get("place_type")
 
-    # Chuyển số tiền VND người dùng nhập thành 3 khoảng ngân sách
-    amount = None
-    try:
-        amount = float(budget_raw.replace(",", "").strip())
-    except ValueError:
-        amount = None
+    # Số tiền VND người dùng nhập (chấp nhận cả "40.000.000" lẫn "40,000,000")
+    amount = _parse_amount(budget_raw) if budget_raw.strip() else None
 
-    bucket = None  # 'under' | 'mid' | 'over'
+    bucket = None  # 'under' | 'mid' | 'over' – chỉ dùng để chọn nhãn hiển thị
     if amount is not None:
         if amount < 30_000_000:
             bucket = "under"
@@ -862,31 +3520,15 @@ def expert_travel():
         else:
             bucket = "over"
 
-    budget_label_map = {
-        "under": "Dưới 30.000.000",
-        "mid": "30–60 triệu",
-        "over": "Trên 60.000.000",
-    }
-    target_label_norm = _norm(budget_label_map.get(bucket))
-
     result: List[Dict[str, str]] = []
-    if target_label_norm:
-        for place, info in tourism.items():
-            info_place = normalize_place_type(get_field(info, "type of place", "loại địa điểm"))
-            if info_place != normalize_place_type(place_type):
-                continue
-
-            raw_budget = get_field(info, "budget", "ngân sách")
-            if _norm(raw_budget) != target_label_norm:
-                continue
-
-            # Truyền giá trị số tượng trưng vào describe_place chỉ để chọn label hiển thị
-            numeric_hint = {"under": 0.5, "mid": 1.5, "over": 2.5}.get(bucket, 0.0)
-
+    if amount is not None:
+        # Truyền giá trị số tượng trưng vào describe_place chỉ để chọn label hiển thị
+        numeric_hint = {"under": 0.5, "mid": 1.5, "over": 2.5}.get(bucket, 0.0)
+        for i in places_for_budget(table, term_id("place", place_type), amount):
             result.append(
                 {
-                    "name": place,
-                    "summary": describe_place(place, info, numeric_hint, place_type),
+                    "name": table["names"][i],
+                    "summary": place_summary(table, i, numeric_hint, place_type),
                 }
             )
 
@@ -903,6 +3545,62 @@ def expert_travel():
         domain=None,
         budget=budget_raw,
         place_type=place_type,
+        inference=None,
+        top_k=None,
+        weights=None,
+        numeric_prefs=None,
+        trace=None,
+    )
+
+
+@app.get("/expert/trace/<int:trace_id>")
+@login_required
+@role_required("manager")
+def expert_trace(trace_id: int):
+    """Bản ghi vết của một request suy diễn (JSON), nếu còn trong vòng đệm."""
+    trace = get_rule_trace(trace_id)
+    if trace is None:
+        return jsonify({"error": "Trace not found (expired from the ring buffer)."}), 404
+    return jsonify(rule_trace_view(trace))
+
+
+@app.get("/expert/trace/stats")
+@login_required
+@role_required("manager")
+def expert_trace_stats():
+    """Thống kê cộng dồn theo luật từ các request đã ghi vết, cùng thứ tự điều kiện đang dùng."""
+    return jsonify(
+        {
+            "order": RULE_ORDER,
+            "traces": len(_RULE_TRACES),
+            "rules": rule_stats_snapshot(),
+            "plans": {
+                advisor: order_by_rule_stats(goals({"mode": "business"}), advisor)
+                for advisor, (_, goals, _) in ADVISOR_RULESETS.items()
+            },
+        }
+    )
+
+
+@app.get("/expert/range")
+def expert_range():
+    """Truy vấn khoảng trên cột số, ví dụ /expert/range?gdp_min=1000&density_max=100.
+
+    Cận là mở (GDP > gdp_min, mật độ < density_max); kết quả theo thứ tự trong countries.csv.
+    """
+    table = get_country_table()
+    ranges: Dict[str, Tuple[float | None, float | None]] = {}
+    for column in SCORE_NUMERIC:
+        low = parse_number(request.args.get(f"{column}_min"))
+        high = parse_number(request.args.get(f"{column}_max"))
+        if low is not None or high is not None:
+            ranges[column] = (low, high)
+    rows = range_query(table, ranges)
+    return jsonify(
+        [
+            {"name": table["names"][i], **{c: table["num"][c][i] for c in SCORE_NUMERIC}}
+            for i in rows
+        ]
     )
 
 
@@ -940,70 +3638,392 @@ def _map_header(header: List[str], mapping: Dict[str, str]) -> List[str]:
     return new
 
 
+def _map_term(attribute: str, value: str) -> str:
+    # Đổi sang cách viết VI qua từ vựng; ô trống và giá trị lạ giữ nguyên
+    if not _norm(value):
+        return value
+    term = term_id(attribute, value)
+    return term_vi(attribute, term) if is_known_term(attribute, term) else value
+
+
 def _map_value(col_name_vi_or_en: str, value: str) -> str:
-    c = _norm(col_name_vi_or_en)
-    v = _norm(value)
-    # Values mapping depending on semantic columns
-    if c in {"type of government", "hình thức chính phủ"}:
-        return GOV_MAP.get(v, GOV_MAP.get(GOV_REV.get(v, ""), value)) if v else value
-    if c in {"field domain", "lĩnh vực"}:
-        return FIELD_MAP.get(v, FIELD_MAP.get(FIELD_REV.get(v, ""), value)) if v else value
-    if c in {"major religion", "tôn giáo chính"}:
-        return RELIGION_MAP.get(v, RELIGION_MAP.get(RELIGION_REV.get(v, ""), value)) if v else value
-    if c in {"average weather", "khí hậu trung bình"}:
-        return CLIMATE_MAP.get(v, CLIMATE_MAP.get(CLIMATE_REV.get(v, ""), value)) if v else value
-    if c in {"trade type", "loại thương mại"}:
-        return TRADE_MAP.get(v, TRADE_MAP.get(TRADE_REV.get(v, ""), value)) if v else value
-    if c in {"type of place", "loại địa điểm"}:
-        return PLACE_MAP.get(v, PLACE_MAP.get(PLACE_REV.get(v, ""), value)) if v else value
-    return value
+    attribute = COLUMN_ATTRIBUTES.get(_norm(col_name_vi_or_en))
+    return value if attribute is None else _map_term(attribute, value)
+
+
+MIGRATE_CHUNK_ROWS = 10000
+MIGRATE_DIFF_LIMIT = 200
+MIGRATE_MEMO_SIZE = 4096
+
+
+def _column_mappers(header: List[str], mapping: Dict[str, str]) -> List[Callable[[str], str] | None]:
+    """Chọn hàm chuyển đổi cho từng cột một lần theo header (None = giữ nguyên ô).
+
+    - Mỗi cột phân loại có bảng nhớ riêng vì số giá trị khác nhau trong một cột rất ít.
+    """
+
+    def memoized(attribute: str) -> Callable[[str], str]:
+        memo: Dict[str, str] = {}
+
+        def mapper(value: str) -> str:
+            out = memo.get(value)
+            if out is None:
+                out = _map_term(attribute, value)
+                if len(memo) < MIGRATE_MEMO_SIZE:
+                    memo[value] = out
+            return out
+
+        return mapper
+
+    attributes = [COLUMN_ATTRIBUTES.get(_norm(mapping.get(col_en, col_en))) for col_en in header]
+    return [None if attribute is None else memoized(attribute) for attribute in attributes]
+
+
+def migrate_csv_vi(
+    path: str, mapping: Dict[str, str], dry_run: bool = False, chunk_rows: int = MIGRATE_CHUNK_ROWS
+) -> Dict[str, Any]:
+    """Chuyển header và giá trị phân loại của một file CSV sang tiếng Việt, đọc và ghi theo từng khối dòng.
+
+    - Bộ nhớ không phụ thuộc kích thước file: mỗi lần chỉ giữ chunk_rows dòng.
+    - Ghi vào file tạm rồi os.replace; nếu không có gì thay đổi thì file gốc được giữ nguyên
+      (chạy lại lần hai không ghi gì). dry_run chỉ đếm và trả về tối đa MIGRATE_DIFF_LIMIT thay đổi.
+    """
+    report: Dict[str, Any] = {
+        "file": os.path.basename(path),
+        "rows": 0,
+        "changed_rows": 0,
+        "changed_cells": 0,
+        "header": [],
+        "diff": [],
+        "applied": False,
+    }
+    header = _read_csv_header(path)
+    if not header:
+        return report
+    # Bỏ các cột không có tên (dấu phẩy thừa cuối header); dòng được cắt/đệm theo số cột còn lại
+    header = [h for h in header if h]
+    new_header = _map_header(header, mapping)
+    width = len(new_header)
+    mappers = _column_mappers(header, mapping)
+    report["header"] = [{"old": old, "new": new} for old, new in zip(header, new_header) if old != new]
+
+    def record(line_no: int, column: str, old: str, new: str) -> None:
+        if len(report["diff"]) < MIGRATE_DIFF_LIMIT:
+            report["diff"].append({"line": line_no, "column": column, "old": old, "new": new})
+
+    def transform(rows: Iterable[List[str]]) -> Iterable[List[List[str]]]:
+        line_no = 1
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                return
+            out: List[List[str]] = []
+            for raw in chunk:
+                line_no += 1
+                row = (raw + [""] * width)[:width]
+                changed = len(raw) != width
+                for idx, mapper in enumerate(mappers):
+                    if mapper is None:
+                        continue
+                    old = row[idx]
+                    new = mapper(old)
+                    if new != old:
+                        row[idx] = new
+                        changed = True
+                        report["changed_cells"] += 1
+                        record(line_no, new_header[idx], old, new)
+                report["rows"] += 1
+                report["changed_rows"] += changed
+                out.append(row)
+            yield out
+
+    with _CSV_WRITE_LOCK:
+        if dry_run:
+            for _ in transform(_iter_csv_rows(path)):
+                pass
+            return report
+        tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open(tmp, "w", encoding="utf-8", newline="") as fh:
+                writer = csv.writer(fh)
+                writer.writerow(new_header)
+                for chunk in transform(_iter_csv_rows(path)):
+                    writer.writerows(chunk)
+            if report["header"] or report["changed_rows"]:
+                inc_metric("csv_writes_total", endpoint=_current_endpoint(), file=report["file"])
+                os.replace(tmp, path)
+                report["applied"] = True
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return report
 
 
 @app.post("/admin/migrate_vi")
 @login_required
 @role_required("manager")
 def admin_migrate_vi():
-    # Countries.csv
-    h, rows = read_csv_file("countries.csv")
-    if h:
-        # clean out empty trailing headers
-        h = [x for x in h if x]
-        new_h = _map_header(h, COUNTRIES_HEADER_MAP)
-        new_rows: List[List[str]] = []
-        for r in rows:
-            # truncate/extend to header length
-            r = (r + [""] * len(new_h))[: len(new_h)]
-            mapped = []
-            for idx, val in enumerate(r):
-                col_en = h[idx] if idx < len(h) else ""
-                col_vi = COUNTRIES_HEADER_MAP.get(col_en, col_en)
-                mapped.append(_map_value(col_vi, val))
-            new_rows.append(mapped)
-        write_csv_file("countries.csv", new_h, new_rows)
-
-    # Tourism.csv
-    h2, rows2 = read_csv_file("Tourism.csv")
-    if h2:
-        new_h2 = _map_header(h2, TOURISM_HEADER_MAP)
-        new_rows2: List[List[str]] = []
-        for r in rows2:
-            r = (r + [""] * len(new_h2))[: len(new_h2)]
-            mapped = []
-            for idx, val in enumerate(r):
-                col_en = h2[idx] if idx < len(h2) else ""
-                col_vi = TOURISM_HEADER_MAP.get(col_en, col_en)
-                mapped.append(_map_value(col_vi, val))
-            new_rows2.append(mapped)
-        write_csv_file("Tourism.csv", new_h2, new_rows2)
-
-    flash("Đã chuyển đổi tiêu đề và một số giá trị sang tiếng Việt.")
+    """Chuyển countries.csv và Tourism.csv sang tiếng Việt; dry_run=1 chỉ xem trước, ?format=json trả báo cáo."""
+    dry_run = (request.values.get("dry_run") or "") in {"1", "true", "on"}
+    reports = [
+        migrate_csv_vi(ADMIN_DATASETS[name], ADMIN_HEADER_MAPS[name], dry_run=dry_run) for name in ADMIN_DATASETS
+    ]
+    if request.args.get("format") == "json":
+        return jsonify({"dry_run": dry_run, "files": reports})
+
+    summary = ", ".join(
+        f"{r['file']}: {len(r['header'])} tiêu đề, {r['changed_cells']} ô trên {r['changed_rows']}/{r['rows']} dòng"
+        for r in reports
+    )
+    if dry_run:
+        flash(f"Xem trước (chưa ghi): {summary}.")
+    elif any(r["applied"] for r in reports):
+        flash(f"Đã chuyển đổi tiêu đề và một số giá trị sang tiếng Việt ({summary}).")
+    else:
+        flash("Dữ liệu đã ở dạng tiếng Việt, không có gì thay đổi.")
     return redirect(url_for("admin_dashboard"))
 
 
+# ----------------------
+# Nhập / xuất hàng loạt (CSV), xử lý theo luồng
+# ----------------------
+
+ADMIN_HEADER_MAPS = {"countries": COUNTRIES_HEADER_MAP, "tourism": TOURISM_HEADER_MAP}
+
+BULK_NUMERIC = {"gdp", "mật độ dân số", "nhập khẩu", "xuất khẩu"}
+BULK_BUDGET = {"ngân sách"}
+# Khí hậu được lưu chữ thường trong countries.csv, các cột phân loại khác viết hoa chữ đầu
+BULK_LOWERCASE = {"khí hậu trung bình"}
+BULK_MAX_ERRORS = 1000
+
+_CSV_WRITE_LOCK = threading.Lock()
+
+
+def csv_write_locked(view_func):
+    """Chạy cả chu trình đọc - sửa - ghi CSV của một route dưới _CSV_WRITE_LOCK.
+
+    Hai admin lưu cùng lúc sẽ không ghi đè thay đổi của nhau (mỗi request đọc lại file sau khi có khóa).
+    """
+
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with _CSV_WRITE_LOCK:
+            return view_func(*args, **kwargs)
+
+    return wrapper
+
+
+def _column_vi(name: str, mapping: Dict[str, str]) -> str:
+    name = (name or "").strip()
+    return _norm(mapping.get(name, name))
+
+
+def normalize_bulk_value(column: str, value: str, mapping: Dict[str, str]) -> str:
+    """Kiểm tra và chuẩn hóa một ô theo cột; ValueError nếu không hợp lệ.
+
+    - Giá trị phân loại nhận cả EN lẫn VI và được ghi theo ngôn ngữ của header trong file.
+    """
+    value = (value or "").strip()
+    col_vi = _column_vi(column, mapping)
+    if not value:
+        return value
+    attribute = COLUMN_ATTRIBUTES.get(col_vi)
+    if attribute is not None:
+        term = term_id(attribute, value)
+        if not is_known_term(attribute, term):
+            raise ValueError(f"{column}: giá trị không hợp lệ '{value}'")
+        out = term_en(attribute, term) if column.strip() in mapping else term_vi(attribute, term)
+        return out if col_vi in BULK_LOWERCASE else out[:1].upper() + out[1:]
+    if col_vi in BULK_NUMERIC and parse_number(value) is None:
+        raise ValueError(f"{column}: không phải số '{value}'")
+    if col_vi in BULK_BUDGET and parse_budget_range(value) is None:
+        raise ValueError(f"{column}: không đọc được khoảng ngân sách '{value}'")
+    return value
+
+
+def _read_csv_header(path: str) -> List[str]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8", newline="") as fh:
+        return next(csv.reader(fh), [])
+
+
+def _iter_csv_rows(path: str) -> Iterable[List[str]]:
+    """Đọc dần các dòng dữ liệu (bỏ header, bỏ dòng trống) mà không nạp cả file vào bộ nhớ."""
+    with open(path, "r", encoding="utf-8", newline="") as fh:
+        reader = csv.reader(fh)
+        next(reader, None)
+        for row in reader:
+            if row:
+                yield row
+
+
+def _unreadable_upload(report: Dict[str, Any], reader: Any, exc: Exception) -> Dict[str, Any]:
+    """File tải lên không đọc tiếp được (không phải UTF-8, CSV hỏng): ghi lỗi, không nhập gì kể cả khi skip_invalid."""
+    if isinstance(exc, UnicodeDecodeError):
+        # Dòng lỗi chưa được reader đếm
+        line_no, error = reader.line_num + 1, "file không phải UTF-8"
+    else:
+        line_no, error = max(1, reader.line_num), f"CSV không hợp lệ: {exc}"
+    report["errors"].append({"line": line_no, "error": error})
+    report["error_count"] = report.get("error_count", 0) + 1
+    return report
+
+
+def bulk_import(
+    path: str, mapping: Dict[str, str], lines: Iterable[str], mode: str = "upsert", skip_invalid: bool = False
+) -> Dict[str, Any]:
+    """Nhập một CSV tải lên vào `path` thành một lô duy nhất (ghi một lần, thay file nguyên tử).
+
+    - mode "upsert": cập nhật theo khóa chính (cột đầu), thêm dòng mới; cột không có trong file tải lên
+      hoặc ô để trống giữ nguyên giá trị cũ. mode "replace": file chỉ còn các dòng tải lên.
+    - Có dòng lỗi thì không ghi gì, trừ khi skip_invalid (bỏ qua các dòng lỗi).
+    """
+    report: Dict[str, Any] = {"rows": 0, "inserted": 0, "updated": 0, "errors": [], "applied": False}
+    with _CSV_WRITE_LOCK:
+        header = _read_csv_header(path)
+        reader = csv.reader(lines)
+        try:
+            upload_header = next(reader, [])
+        except (UnicodeDecodeError, csv.Error) as exc:
+            return _unreadable_upload(report, reader, exc)
+        if not header or not upload_header:
+            report["errors"].append({"line": 1, "error": "thiếu header"})
+            return report
+
+        # Ghép cột tải lên với cột của file (chấp nhận tên EN hoặc VI)
+        positions = {_column_vi(h, mapping): i for i, h in enumerate(header)}
+        columns: List[int | None] = [positions.get(_column_vi(h, mapping)) for h in upload_header]
+        unknown = [h for h, col in zip(upload_header, columns) if col is None and h.strip()]
+        if unknown or columns[:1] != [0]:
+            error = f"cột không hợp lệ: {', '.join(unknown)}" if unknown else f"cột đầu phải là khóa chính {header[0]}"
+            report["errors"].append({"line": 1, "error": error})
+            return report
+
+        pending: Dict[str, Dict[int, str]] = {}
+        try:
+            for line_no, raw in enumerate(reader, start=2):
+                if not any(cell.strip() for cell in raw):
+                    continue
+                report["rows"] += 1
+                values: Dict[int, str] = {}
+                try:
+                    for col, cell in zip(columns, raw):
+                        if col is not None:
+                            values[col] = normalize_bulk_value(header[col], cell, mapping)
+                    key = values.get(0, "").lower()
+                    if not key:
+                        raise ValueError(f"thiếu khóa chính {header[0]}")
+                    if key in pending:
+                        raise ValueError(f"trùng khóa chính '{values[0]}' trong file tải lên")
+                except ValueError as exc:
+                    if len(report["errors"]) < BULK_MAX_ERRORS:
+                        report["errors"].append({"line": line_no, "key": (raw[:1] or [""])[0], "error": str(exc)})
+                    report["error_count"] = report.get("error_count", 0) + 1
+                    continue
+                pending[key] = values
+        except (UnicodeDecodeError, csv.Error) as exc:
+            return _unreadable_upload(report, reader, exc)
+
+        if report["errors"] and not skip_invalid:
+            return report
+
+        def row_from(values: Dict[int, str], base: List[str]) -> List[str]:
+            row = (base + [""] * len(header))[: len(header)]
+            for col, value in values.items():
+                if value or not base:
+                    row[col] = value
+            return row
+
+        def merged() -> Iterable[List[str]]:
+            if mode != "replace":
+                for row in _iter_csv_rows(path):
+                    values = pending.pop(row[0].strip().lower(), None)
+                    if values is None:
+                        yield row
+                    else:
+                        report["updated"] += 1
+                        yield row_from(values, row)
+            for values in pending.values():
+                report["inserted"] += 1
+                yield row_from(values, [])
+
+        write_csv_file(path, header, merged())
+        report["applied"] = True
+    return report
+
+
+@app.post("/admin/<name>/import")
+@login_required
+@role_required("manager")
+def admin_import(name: str):
+    """Nhập hàng loạt từ file CSV (UTF-8); ?format=json trả về báo cáo chi tiết từng dòng lỗi."""
+    if name not in ADMIN_DATASETS:
+        return jsonify({"error": "unknown dataset"}), 404
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        report: Dict[str, Any] = {"rows": 0, "errors": [{"line": 0, "error": "chưa chọn file"}], "applied": False}
+    else:
+        # Giải mã từng dòng: lỗi UTF-8 được báo đúng dòng trong báo cáo thay vì lỗi 500
+        lines = codecs.iterdecode(upload.stream, "utf-8-sig")
+        report = bulk_import(
+            ADMIN_DATASETS[name],
+            ADMIN_HEADER_MAPS[name],
+            lines,
+            mode="replace" if request.form.get("mode") == "replace" else "upsert",
+            skip_invalid=request.form.get("skip_invalid") == "1",
+        )
+    if request.args.get("format") == "json":
+        return jsonify(report), (200 if report["applied"] else 400)
+
+    if report["applied"]:
+        flash(
+            f"Đã nhập {report['rows']} dòng: thêm {report['inserted']}, cập nhật {report['updated']}"
+            + (f", bỏ qua {report.get('error_count', len(report['errors']))} dòng lỗi." if report["errors"] else ".")
+        )
+    else:
+        details = "; ".join(f"dòng {e['line']}: {e['error']}" for e in report["errors"][:5])
+        flash(f"Không nhập dữ liệu ({report.get('error_count', len(report['errors']))} lỗi). {details}")
+    return redirect(url_for(f"admin_{name}"))
+
+
+@app.get("/admin/<name>/export")
+@login_required
+@role_required("manager")
+def admin_export(name: str):
+    """Tải file CSV theo từng khối; file được thay bằng os.replace nên luồng đang đọc luôn thấy một bản trọn vẹn."""
+    if name not in ADMIN_DATASETS:
+        return jsonify({"error": "unknown dataset"}), 404
+    path = ADMIN_DATASETS[name]
+    if not os.path.exists(path):
+        return jsonify({"error": f"{path} not found"}), 404
+
+    def generate():
+        # Mở file khi body bắt đầu được đọc: response không bao giờ được đọc thì cũng không giữ file
+        with open(path, "rb") as fh:
+            while True:
+                chunk = fh.read(64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+
+    response = Response(generate(), mimetype="text/csv")
+    response.headers["Content-Disposition"] = f'attachment; filename="{os.path.basename(path)}"'
+    return response
+
+
 # ----------------------
 # Admin endpoints
 # ----------------------
 
+@app.get("/metrics")
+@login_required
+@role_required("manager")
+def metrics():
+    return Response(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/admin")
 @login_required
 @role_required("manager")
@@ -1015,27 +4035,46 @@ def admin_dashboard():
 @login_required
 @role_required("manager")
 def admin_countries():
-    header, rows = read_csv_file("countries.csv")
-    countries_list = load_country_list()
-    key = request.args.get("key")
-    existing = None
-    if key and header:
-        for r in rows:
-            if r and r[0].lower() == key.lower():
-                existing = dict(zip(header, r))
-                break
+    # Chỉ render một trang; các trang khác được tải qua /admin/countries/rows
+    page = admin_page("countries", request.args)
     return render_template(
         "admin_countries.html",
-        header=header,
-        rows=rows,
-        existing=existing,
-        countries=countries_list,
+        header=page["header"],
+        rows_html=page["rows_html"],
+        pager_html=page["pager_html"],
+        total=page["total"],
+        params=page["params"],
+        existing=admin_lookup(page["dataset"], request.args.get("key")),
+        countries=load_country_list(),
+    )
+
+
+@app.get("/admin/<name>/rows")
+@login_required
+@role_required("manager")
+def admin_rows(name: str):
+    """Một trang dữ liệu quản trị dạng JSON (phân trang, sắp xếp, lọc phía server)."""
+    if name not in ADMIN_DATASETS:
+        return jsonify({"error": "unknown dataset"}), 404
+    page = admin_page(name, request.args)
+    return jsonify(
+        {
+            "header": page["header"],
+            "rows": page["rows"],
+            "total": page["total"],
+            "pages": page["pages"],
+            "page": page["params"]["page"],
+            "per_page": page["params"]["per_page"],
+            "html": str(page["rows_html"]),
+            "pager": str(page["pager_html"]),
+        }
     )
 
 
 @app.post("/admin/countries/delete")
 @login_required
 @role_required("manager")
+@csv_write_locked
 def admin_countries_delete():
     header, rows = read_csv_file("countries.csv")
     if not header:
@@ -1059,6 +4098,7 @@ def admin_countries_delete():
 @app.post("/admin/countries")
 @login_required
 @role_required("manager")
+@csv_write_locked
 def admin_countries_save():
     header, rows = read_csv_file("countries.csv")
     if not header:
@@ -1110,27 +4150,24 @@ def admin_countries_save():
 @login_required
 @role_required("manager")
 def admin_tourism():
-    header, rows = read_csv_file("Tourism.csv")
-    countries_list = load_country_list()
-    key = request.args.get("key")
-    existing = None
-    if key and header:
-        for r in rows:
-            if r and r[0].lower() == key.lower():
-                existing = dict(zip(header, r))
-                break
+    # Chỉ render một trang; các trang khác được tải qua /admin/tourism/rows
+    page = admin_page("tourism", request.args)
     return render_template(
         "admin_tourism.html",
-        header=header,
-        rows=rows,
-        existing=existing,
-        countries=countries_list,
+        header=page["header"],
+        rows_html=page["rows_html"],
+        pager_html=page["pager_html"],
+        total=page["total"],
+        params=page["params"],
+        existing=admin_lookup(page["dataset"], request.args.get("key")),
+        countries=load_country_list(),
     )
 
 
 @app.post("/admin/tourism/delete")
 @login_required
 @role_required("manager")
+@csv_write_locked
 def admin_tourism_delete():
     header, rows = read_csv_file("Tourism.csv")
     if not header:
@@ -1154,6 +4191,7 @@ def admin_tourism_delete():
 @app.post("/admin/tourism")
 @login_required
 @role_required("manager")
+@csv_write_locked
 def admin_tourism_save():
     header, rows = read_csv_file("Tourism.csv")
     if not header: